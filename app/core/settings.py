@@ -69,6 +69,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'tasks.middleware.AuditBufferMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -149,8 +150,42 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'tasks.tasks.check_deadlines', # Путь к задаче
         'schedule': timedelta(minutes=5),
     },
+    'flush-task-events-every-minute': {
+        'task': 'tasks.tasks.flush_task_events',
+        'schedule': timedelta(minutes=1),
+    },
+    'purge-task-events-daily': {
+        'task': 'tasks.tasks.purge_task_events',
+        'schedule': timedelta(days=1),
+    },
+    # Страховка для правок в обход save(); обычный путь — пересборка дня при завершении задачи
+    'rebuild-task-rollups-hourly': {
+        'task': 'tasks.tasks.rebuild_task_rollups',
+        'schedule': timedelta(hours=1),
+    },
+    'rebuild-task-rollups-daily': {
+        'task': 'tasks.tasks.rebuild_task_rollups',
+        'schedule': timedelta(days=1),
+        'kwargs': {'days_back': 31},
+    },
+    'refresh-task-stats-overdue-every-5-minutes': {
+        'task': 'tasks.tasks.refresh_task_stats_overdue',
+        'schedule': timedelta(minutes=5),
+    },
 }
 
+# Окно склейки частых правок задачи: первая правка уходит сразу, следующие в пределах окна —
+# одним уведомлением в его конце (0 — каждая правка сразу)
+TASK_NOTIFICATION_COALESCE_SECONDS = int(os.environ.get('TASK_NOTIFICATION_COALESCE_SECONDS', '5'))
+
+# Журнал изменений задач (/api/v1/tasks/changes/): срок хранения событий. Запас на транзакции,
+# закоммиченные позже сохранения, — для next_updated_since реестра личных ботов
+TASK_EVENT_RETENTION_DAYS = int(os.environ.get('TASK_EVENT_RETENTION_DAYS', '7'))
+TASK_CHANGES_SETTLE_SECONDS = int(os.environ.get('TASK_CHANGES_SETTLE_SECONDS', '5'))
+
+# TTL списков Bot API в кэше; актуальность обеспечивается сбросом версий по сигналам
+BOT_LIST_CACHE_TTL = int(os.environ.get('BOT_LIST_CACHE_TTL', '3600'))
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
@@ -239,6 +274,27 @@ if not WEB_BASE_URL:
         WEB_BASE_URL = 'http://localhost:8005'
 TELEGRAM_LOGIN_TOKEN_TTL_SECONDS = int(os.environ.get('TELEGRAM_LOGIN_TOKEN_TTL_SECONDS', '300'))
 
+# --- Telegram Bot API client (общий пул соединений для Django и Celery) ---
+TELEGRAM_API_BASE_URL = os.environ.get('TELEGRAM_API_BASE_URL', 'https://api.telegram.org')
+TELEGRAM_HTTP_TIMEOUT = float(os.environ.get('TELEGRAM_HTTP_TIMEOUT', '5'))
+TELEGRAM_HTTP_MAX_CONNECTIONS = int(os.environ.get('TELEGRAM_HTTP_MAX_CONNECTIONS', '20'))
+TELEGRAM_HTTP_MAX_KEEPALIVE = int(os.environ.get('TELEGRAM_HTTP_MAX_KEEPALIVE', '10'))
+TELEGRAM_HTTP_KEEPALIVE_EXPIRY = float(os.environ.get('TELEGRAM_HTTP_KEEPALIVE_EXPIRY', '60'))
+TELEGRAM_HTTP2 = os.environ.get('TELEGRAM_HTTP2', 'True') == 'True'
+# Лимиты Bot API: ~30 сообщений/сек на бота и ~1 сообщение/сек в один чат
+TELEGRAM_RATE_PER_SECOND = int(os.environ.get('TELEGRAM_RATE_PER_SECOND', '30'))
+TELEGRAM_RATE_PER_CHAT_SECONDS = int(os.environ.get('TELEGRAM_RATE_PER_CHAT_SECONDS', '1'))
+
+# Поток событий Django -> процесс бота (Redis Stream): смена личных ботов, сообщения в чаты.
+# TELEGRAM_DELIVERY='bot' — уведомления отправляет процесс бота (склеивая пачки), 'api' — Celery напрямую
+BOT_EVENTS_ENABLED = os.environ.get('BOT_EVENTS_ENABLED', 'True') == 'True'
+BOT_EVENTS_STREAM = os.environ.get('BOT_EVENTS_STREAM', 'taskflow:bot-events')
+BOT_EVENTS_MAXLEN = int(os.environ.get('BOT_EVENTS_MAXLEN', '10000'))
+TELEGRAM_DELIVERY = os.environ.get('TELEGRAM_DELIVERY', 'api')
+
+# Аудит задач пишется пачкой после коммита; AUDIT_ASYNC=True — запись в Celery (сбои — в AuditDeadLetter)
+AUDIT_ASYNC = os.environ.get('AUDIT_ASYNC', 'False') == 'True'
+
 # This is often redundant if CSRF_TRUSTED_ORIGINS is set correctly, 
 # but useful for completeness if using local CORS requests.
 CORS_ALLOWED_ORIGINS = [
@@ -273,4 +329,10 @@ LOGGING = {
         'handlers': ['console'],
         'level': LOG_LEVEL,
     },
+    'loggers': {
+        # httpx пишет полный URL запроса, а в URL Bot API содержится токен бота
+        'httpx': {
+            'level': 'WARNING',
+        },
+    },
 }
@@ -1,6 +1,15 @@
 from django.contrib import admin
 
-from .models import Client, ConversationMessage, ProjectMember, Task, TaskComment, TeamList, TaskAuditLog
+from .models import (
+    AuditDeadLetter,
+    Client,
+    ConversationMessage,
+    ProjectMember,
+    Task,
+    TaskAuditLog,
+    TaskComment,
+    TeamList,
+)
 
 # --- Русификация django_celery_beat в админке (proxy модели, без миграций) ---
 try:
@@ -168,3 +177,10 @@ class TaskAuditLogAdmin(admin.ModelAdmin):
     list_filter = ('action', 'created_at')
     search_fields = ('task__title', 'actor__username')
     readonly_fields = ('task', 'action', 'actor', 'details', 'created_at')
+
+
+@admin.register(AuditDeadLetter)
+class AuditDeadLetterAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created_at', 'replayed_at', 'error')
+    list_filter = ('created_at', 'replayed_at')
+    readonly_fields = ('entries', 'error', 'created_at', 'replayed_at')
@@ -1,18 +1,47 @@
 import json
 import logging
+from collections import deque
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from .models import ProjectMember
+from .services.notifications import project_group_name, user_group_name
+
 logger = logging.getLogger(__name__)
 
+# Сколько последних delivery_id помнит соединение (копии одной рассылки приходят подряд)
+RECENT_DELIVERIES = 64
+
+
 class TaskConsumer(AsyncWebsocketConsumer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.recent_deliveries = deque(maxlen=RECENT_DELIVERIES)
+
+    def _is_duplicate(self, event) -> bool:
+        """Повтор рассылки: канал в нескольких группах (user_ и project_) без Redis-пайплайна."""
+        delivery_id = event.get('delivery_id')
+        if delivery_id is None:
+            return False
+        if delivery_id in self.recent_deliveries:
+            return True
+        self.recent_deliveries.append(delivery_id)
+        return False
+
     async def connect(self):
         if self.scope["user"].is_authenticated:
             self.user = self.scope["user"]
-            self.user_group_name = f'user_{self.user.id}'
+            self.user_group_name = user_group_name(self.user.id)
             await self.channel_layer.group_add(
                 self.user_group_name,
                 self.channel_name
             )
+            # Задачи проектов приходят один раз на группу проекта, а не копией каждому участнику
+            self.project_group_names = {
+                project_group_name(project_id) for project_id in await self._get_project_ids()
+            }
+            for group_name in self.project_group_names:
+                await self.channel_layer.group_add(group_name, self.channel_name)
             await self.accept()
             logger.info("WS connected for user: %s", self.user.username)
         else:
@@ -25,10 +54,42 @@ class TaskConsumer(AsyncWebsocketConsumer):
                 self.user_group_name,
                 self.channel_name
             )
+            for group_name in getattr(self, 'project_group_names', ()):
+                await self.channel_layer.group_discard(group_name, self.channel_name)
             logger.info("WS disconnected for user: %s", self.user.username)
+
+    @database_sync_to_async
+    def _get_project_ids(self):
+        return list(
+            ProjectMember.objects.filter(user=self.user, is_active=True).values_list('project_id', flat=True)
+        )
+
     async def task_update(self, event):
+        if self._is_duplicate(event):
+            return
         message = event['message']
         await self.send(text_data=json.dumps({
             'type': 'task_update',
             'task': message
         }))
+
+    async def task_delete(self, event):
+        if self._is_duplicate(event):
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'task_delete',
+            'id': event['task_id'],
+        }))
+
+    async def project_membership(self, event):
+        """Синхронизация подписок при изменении ProjectMember (приходит в группу user_<id>)."""
+        if self._is_duplicate(event):
+            return
+        group_name = project_group_name(event['project_id'])
+        if event.get('active'):
+            if group_name not in self.project_group_names:
+                self.project_group_names.add(group_name)
+                await self.channel_layer.group_add(group_name, self.channel_name)
+        elif group_name in self.project_group_names:
+            self.project_group_names.discard(group_name)
+            await self.channel_layer.group_discard(group_name, self.channel_name)
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.services.analytics import rebuild_day
+
+
+class Command(BaseCommand):
+    help = "Пересобрать дневные сводки аналитики задач за последние N дней (заполнение истории)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help="Сколько дней назад, включая сегодня")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        rows = 0
+        for offset in range(options['days']):
+            rows += rebuild_day(today - timedelta(days=offset))
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} rollups for {options['days']} days."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tasks.services.stats import reconcile_task_stats
+
+
+class Command(BaseCommand):
+    help = "Пересобрать счётчики /stats (TaskStats) по текущим задачам"
+
+    def handle(self, *args, **options):
+        count = reconcile_task_stats()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled task stats for {count} scopes."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.models import AuditDeadLetter
+from tasks.services.audit import audit_entries, audit_payload, save_audit_entries
+
+
+class Command(BaseCommand):
+    help = "Повторно записать записи аудита из AuditDeadLetter (например, после сбоя БД)"
+
+    def handle(self, *args, **options):
+        replayed = failed = 0
+        for letter in AuditDeadLetter.objects.filter(replayed_at__isnull=True).order_by('id'):
+            try:
+                rejected = save_audit_entries(audit_entries(letter.entries), resolve_refs=True)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Dead letter {letter.pk}: {e!r}")
+                continue
+            if rejected:
+                # Записанные убираем из письма: при следующем запуске повторяются только отклонённые
+                letter.entries = audit_payload([entry for entry, _ in rejected])
+                letter.error = repr(rejected[0][1])
+                letter.save(update_fields=['entries', 'error'])
+                failed += 1
+                self.stderr.write(f"Dead letter {letter.pk}: {letter.error}")
+                continue
+            letter.replayed_at = timezone.now()
+            letter.save(update_fields=['replayed_at'])
+            replayed += 1
+        self.stdout.write(self.style.SUCCESS(f"Replayed {replayed} dead letters, {failed} failed."))
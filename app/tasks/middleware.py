@@ -0,0 +1,12 @@
+from .services.audit import audit_buffer
+
+
+class AuditBufferMiddleware:
+    """Записи аудита, сделанные за запрос, пишутся одной пачкой после ответа view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit_buffer():
+            return self.get_response(request)
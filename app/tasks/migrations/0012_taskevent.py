@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_task_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField(verbose_name='Задача')),
+                ('list_id', models.BigIntegerField(blank=True, null=True, verbose_name='Проект')),
+                ('kind', models.CharField(choices=[('created', 'Создана'), ('updated', 'Обновлена')], max_length=16, verbose_name='Тип')),
+                ('changed_fields', models.JSONField(blank=True, null=True, verbose_name='Изменённые поля')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Обработано')),
+            ],
+            options={
+                'verbose_name': 'Событие задачи',
+                'verbose_name_plural': 'События задач',
+                'ordering': ('id',),
+                'indexes': [models.Index(fields=['task_id'], name='task_event_task_idx'), models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['created_at'], name='task_event_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0012_taskevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tier', models.CharField(choices=[('due_soon', 'Срок истекает'), ('overdue', 'Просрочена'), ('overdue_1d', 'Просрочена более суток')], max_length=16, verbose_name='Уровень')),
+                ('due_date', models.DateTimeField(verbose_name='Срок')),
+                ('sent_at', models.DateTimeField(auto_now_add=True, verbose_name='Отправлено')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='tasks.task', verbose_name='Задача')),
+            ],
+            options={
+                'verbose_name': 'Напоминание о сроке',
+                'verbose_name_plural': 'Напоминания о сроках',
+                'constraints': [models.UniqueConstraint(fields=('task', 'tier', 'due_date'), name='unique_task_reminder')],
+            },
+        ),
+    ]
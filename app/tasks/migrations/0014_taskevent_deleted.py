@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0013_taskreminder'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='taskevent',
+            name='kind',
+            field=models.CharField(choices=[('created', 'Создана'), ('updated', 'Обновлена'), ('deleted', 'Удалена')], max_length=16, verbose_name='Тип'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0014_taskevent_deleted'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_completed', False)), fields=['due_date', 'assigned_to'], name='task_open_due_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0015_task_open_due_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0, verbose_name='Всего')),
+                ('status_new', models.IntegerField(default=0, verbose_name='Новые')),
+                ('status_in_progress', models.IntegerField(default=0, verbose_name='В работе')),
+                ('status_review', models.IntegerField(default=0, verbose_name='На проверке')),
+                ('status_done', models.IntegerField(default=0, verbose_name='Готово')),
+                ('priority_low', models.IntegerField(default=0, verbose_name='Низкий приоритет')),
+                ('priority_medium', models.IntegerField(default=0, verbose_name='Средний приоритет')),
+                ('priority_high', models.IntegerField(default=0, verbose_name='Высокий приоритет')),
+                ('priority_critical', models.IntegerField(default=0, verbose_name='Критичный приоритет')),
+                ('overdue', models.IntegerField(default=0, verbose_name='Просрочено')),
+                ('project', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to='tasks.teamlist', verbose_name='Проект')),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Статистика задач',
+                'verbose_name_plural': 'Статистика задач',
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('project__isnull', True), ('user__isnull', False)), models.Q(('project__isnull', False), ('user__isnull', True)), _connector='OR'), name='task_stats_single_scope')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0016_taskstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('completed_count', models.IntegerField(default=0, verbose_name='Завершено')),
+                ('cycle_time_samples', models.IntegerField(default=0, verbose_name='Задач со временем цикла')),
+                ('cycle_time_total_hours', models.FloatField(default=0, verbose_name='Сумма времени цикла, ч')),
+                ('cycle_time_median_hours', models.FloatField(blank=True, null=True, verbose_name='Медиана времени цикла, ч')),
+                ('estimated_count', models.IntegerField(default=0, verbose_name='Задач с оценкой и фактом')),
+                ('estimate_hours', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Оценка, ч')),
+                ('actual_hours', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Факт, ч')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Дневная сводка задач',
+                'verbose_name_plural': 'Дневные сводки задач',
+                'ordering': ('day',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('completed_at__isnull', False)), fields=['completed_at'], name='task_completed_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='taskdailyrollup',
+            name='assignee',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL, verbose_name='Исполнитель'),
+        ),
+        migrations.AddField(
+            model_name='taskdailyrollup',
+            name='project',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='tasks.teamlist', verbose_name='Проект'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskdailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('project__isnull', False)), fields=('project', 'day'), name='unique_project_rollup_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskdailyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('assignee__isnull', False)), fields=('assignee', 'day'), name='unique_assignee_rollup_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskdailyrollup',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('assignee__isnull', True), ('project__isnull', False)), models.Q(('assignee__isnull', False), ('project__isnull', True)), _connector='OR'), name='task_rollup_single_scope'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:37
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0017_taskdailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditDeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entries', models.JSONField(verbose_name='Записи')),
+                ('error', models.TextField(verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('replayed_at', models.DateTimeField(blank=True, null=True, verbose_name='Записано повторно')),
+            ],
+            options={
+                'verbose_name': 'Неудачная запись аудита',
+                'verbose_name_plural': 'Неудачные записи аудита',
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.AlterField(
+            model_name='taskauditlog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Создано'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:50
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+import tasks.models
+
+
+def backfill_event_scope(apps, schema_editor):
+    # Уже записанным событиям — текущие автор и исполнитель задачи (удалённые остаются видны по проекту)
+    Task = apps.get_model('tasks', 'Task')
+    TaskEvent = apps.get_model('tasks', 'TaskEvent')
+    source = Task.objects.filter(pk=OuterRef('task_id'))
+    TaskEvent.objects.update(
+        assigned_to_id=Subquery(source.values('assigned_to_id')[:1]),
+        created_by_id=Subquery(source.values('created_by_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0018_auditdeadletter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskevent',
+            name='assigned_to_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Исполнитель'),
+        ),
+        migrations.AddField(
+            model_name='taskevent',
+            name='created_by_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Автор'),
+        ),
+        migrations.AddField(
+            model_name='taskevent',
+            name='previous_assigned_to_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Прежний исполнитель'),
+        ),
+        migrations.AddField(
+            model_name='taskevent',
+            name='previous_list_id',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Прежний проект'),
+        ),
+        migrations.AddField(
+            model_name='taskevent',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Взято в рассылку'),
+        ),
+        migrations.AddField(
+            model_name='taskevent',
+            name='txid',
+            field=models.BigIntegerField(db_default=tasks.models.CurrentTransactionId(), editable=False, verbose_name='Транзакция'),
+        ),
+        migrations.RemoveIndex(
+            model_name='taskevent',
+            name='task_event_pending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='taskevent',
+            index=models.Index(condition=models.Q(('processed_at__isnull', True)), fields=['task_id', 'created_at'], name='task_event_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskevent',
+            index=models.Index(fields=['created_at', 'id'], name='task_event_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskevent',
+            index=models.Index(fields=['txid', 'id'], name='task_event_txid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskevent',
+            index=models.Index(fields=['list_id', 'txid', 'id'], name='task_event_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskevent',
+            index=models.Index(fields=['assigned_to_id', 'txid', 'id'], name='task_event_assignee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskevent',
+            index=models.Index(fields=['created_by_id', 'txid', 'id'], name='task_event_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskevent',
+            index=models.Index(condition=models.Q(('previous_list_id__isnull', False)), fields=['previous_list_id', 'txid', 'id'], name='task_event_prev_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskevent',
+            index=models.Index(condition=models.Q(('previous_assigned_to_id__isnull', False)), fields=['previous_assigned_to_id', 'txid', 'id'], name='task_event_prev_assignee_idx'),
+        ),
+        migrations.RunPython(backfill_event_scope, migrations.RunPython.noop),
+    ]
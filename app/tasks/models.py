@@ -107,6 +107,25 @@ class TeamList(models.Model):
         return f"{self.name}"
 
 
+class ProjectMemberQuerySet(models.QuerySet):
+    """Массовые операции тоже сбрасывают кэш прав (сигналы для них не вызываются)."""
+
+    def update(self, **kwargs):
+        from .services.permissions import invalidate_access_snapshot
+
+        user_ids = list(self.values_list('user_id', flat=True))
+        rows = super().update(**kwargs)
+        invalidate_access_snapshot(*user_ids)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from .services.permissions import invalidate_access_snapshot
+
+        created = super().bulk_create(objs, *args, **kwargs)
+        invalidate_access_snapshot(*[obj.user_id for obj in created])
+        return created
+
+
 class ProjectMember(models.Model):
     class Role(models.TextChoices):
         MANAGER = 'manager', _('Менеджер')
@@ -129,6 +148,8 @@ class ProjectMember(models.Model):
     is_active = models.BooleanField(default=True, verbose_name=_('Активен'))
     added_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Добавлен'))
 
+    objects = ProjectMemberQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Участник проекта')
         verbose_name_plural = _('Участники проекта')
@@ -232,16 +253,59 @@ class Task(models.Model):
             models.Index(fields=['due_date'], name='task_due_date_idx'),
             models.Index(fields=['assigned_to'], name='task_assigned_idx'),
             models.Index(fields=['list'], name='task_list_idx'),
+            models.Index(
+                fields=['completed_at'],
+                name='task_completed_at_idx',
+                condition=models.Q(completed_at__isnull=False),
+            ),
+            # Сканер дедлайнов читает только открытые задачи: выполненная история в индекс не попадает
+            models.Index(
+                fields=['due_date', 'assigned_to'],
+                name='task_open_due_idx',
+                condition=models.Q(is_completed=False),
+            ),
         ]
 
+    # Поля, изменения которых отслеживаются для уведомлений («что изменилось»)
+    TRACKED_FIELDS = (
+        'title', 'description', 'list', 'assigned_to', 'due_date', 'status',
+        'priority', 'is_completed', 'estimate_hours', 'actual_hours',
+    )
+
     def __str__(self):
         return f"{self.title}"
 
-    def save(self, *args, **kwargs):
-        update_fields = kwargs.get('update_fields')
-        changed_fields = set(update_fields) if update_fields is not None else None
-
-        # Двусторонняя синхронизация: статус <-> is_completed
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+
+    def _remember_loaded_values(self):
+        self._loaded_values = {
+            name: self.__dict__[self._meta.get_field(name).attname]
+            for name in self.TRACKED_FIELDS
+            if self._meta.get_field(name).attname in self.__dict__
+        }
+        # Не входит в TRACKED_FIELDS (не «изменение» для уведомлений), но нужно сводкам аналитики
+        self._loaded_completed_at = self.__dict__.get('completed_at')
+
+    def get_changed_fields(self):
+        """Отслеживаемые поля, изменённые с момента загрузки из БД (None — если неизвестно)."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return sorted(
+            name for name, value in loaded.items()
+            if getattr(self, self._meta.get_field(name).attname) != value
+        )
+
+    def sync_status_fields(self, changed_fields: set | None = None) -> None:
+        """Двусторонняя синхронизация: статус <-> is_completed (и даты начала/завершения).
+
+        changed_fields — поля, изменённые вызывающим (как update_fields), дополняется
+        синхронизированными; None — полное сохранение, ведущим считается статус.
+        """
         status_changed = changed_fields is not None and 'status' in changed_fields
         completed_changed = changed_fields is not None and 'is_completed' in changed_fields
 
@@ -303,10 +367,16 @@ class Task(models.Model):
             if changed_fields is not None:
                 changed_fields.add('started_at')
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        changed_fields = set(update_fields) if update_fields is not None else None
+        self.sync_status_fields(changed_fields)
+
         if changed_fields is not None:
             kwargs['update_fields'] = list(changed_fields)
 
         super().save(*args, **kwargs)
+        self._remember_loaded_values()
 
 
 class TaskComment(models.Model):
@@ -344,7 +414,8 @@ class TaskAuditLog(models.Model):
     actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='task_audit_logs', verbose_name=_('Пользователь'))
     action = models.CharField(max_length=32, choices=Action.choices, verbose_name=_('Действие'))
     details = models.JSONField(blank=True, null=True, verbose_name=_('Детали'))
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создано'))
+    # Время действия, а не записи: записи пишутся пачками после коммита (или в Celery)
+    created_at = models.DateTimeField(default=timezone.now, verbose_name=_('Создано'))
 
     class Meta:
         verbose_name = _('Аудит задачи')
@@ -353,3 +424,247 @@ class TaskAuditLog(models.Model):
 
     def __str__(self):
         return f"{self.task_id}: {self.action}"
+
+
+class TaskReminder(models.Model):
+    """Журнал отправленных напоминаний о сроке: одно напоминание на задачу, уровень и срок."""
+
+    class Tier(models.TextChoices):
+        DUE_SOON = 'due_soon', _('Срок истекает')
+        OVERDUE = 'overdue', _('Просрочена')
+        OVERDUE_DAY = 'overdue_1d', _('Просрочена более суток')
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='reminders', verbose_name=_('Задача'))
+    tier = models.CharField(max_length=16, choices=Tier.choices, verbose_name=_('Уровень'))
+    due_date = models.DateTimeField(verbose_name=_('Срок'))
+    sent_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Отправлено'))
+
+    class Meta:
+        verbose_name = _('Напоминание о сроке')
+        verbose_name_plural = _('Напоминания о сроках')
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'tier', 'due_date'], name='unique_task_reminder')
+        ]
+
+    def __str__(self):
+        return f"{self.task_id}: {self.tier}"
+
+
+class CurrentTransactionId(models.Func):
+    """Id транзакции PostgreSQL (txid_current()); в SQLite писатели последовательны — всегда 0."""
+
+    function = 'txid_current'
+    template = '%(function)s()'
+    output_field = models.BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return '0', []
+
+
+class TaskEvent(models.Model):
+    """Outbox: компактная запись об изменении задачи, которую рассылает Celery после коммита.
+
+    (txid, id) служит и журналом изменений для инкрементальной синхронизации клиентов:
+    id выдаются при вставке, а не при коммите, поэтому порядок журнала задаёт транзакция.
+    """
+
+    class Kind(models.TextChoices):
+        CREATED = 'created', _('Создана')
+        UPDATED = 'updated', _('Обновлена')
+        DELETED = 'deleted', _('Удалена')
+
+    task_id = models.BigIntegerField(verbose_name=_('Задача'))
+    list_id = models.BigIntegerField(blank=True, null=True, verbose_name=_('Проект'))
+    # Кому видна задача до и после изменения: по ним журнал фильтруется для пользователя
+    assigned_to_id = models.BigIntegerField(blank=True, null=True, verbose_name=_('Исполнитель'))
+    created_by_id = models.BigIntegerField(blank=True, null=True, verbose_name=_('Автор'))
+    previous_list_id = models.BigIntegerField(blank=True, null=True, verbose_name=_('Прежний проект'))
+    previous_assigned_to_id = models.BigIntegerField(
+        blank=True, null=True, verbose_name=_('Прежний исполнитель'),
+    )
+    kind = models.CharField(max_length=16, choices=Kind.choices, verbose_name=_('Тип'))
+    changed_fields = models.JSONField(blank=True, null=True, verbose_name=_('Изменённые поля'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создано'))
+    claimed_at = models.DateTimeField(blank=True, null=True, verbose_name=_('Взято в рассылку'))
+    processed_at = models.DateTimeField(blank=True, null=True, verbose_name=_('Обработано'))
+    txid = models.BigIntegerField(db_default=CurrentTransactionId(), editable=False, verbose_name=_('Транзакция'))
+
+    class Meta:
+        verbose_name = _('Событие задачи')
+        verbose_name_plural = _('События задач')
+        ordering = ('id',)
+        # Необработанные (рассылка и sweep), (created_at, id) для очистки, (txid, id) для головы
+        # журнала и по индексу на каждое условие области журнала изменений в его порядке:
+        # чтение пользователя не сканирует чужие события и события до токена
+        indexes = [
+            models.Index(fields=['task_id'], name='task_event_task_idx'),
+            models.Index(
+                fields=['task_id', 'created_at'],
+                name='task_event_pending_idx',
+                condition=models.Q(processed_at__isnull=True),
+            ),
+            models.Index(fields=['created_at', 'id'], name='task_event_created_idx'),
+            models.Index(fields=['txid', 'id'], name='task_event_txid_idx'),
+            models.Index(fields=['list_id', 'txid', 'id'], name='task_event_list_idx'),
+            models.Index(fields=['assigned_to_id', 'txid', 'id'], name='task_event_assignee_idx'),
+            models.Index(fields=['created_by_id', 'txid', 'id'], name='task_event_author_idx'),
+            models.Index(
+                fields=['previous_list_id', 'txid', 'id'],
+                name='task_event_prev_list_idx',
+                condition=models.Q(previous_list_id__isnull=False),
+            ),
+            models.Index(
+                fields=['previous_assigned_to_id', 'txid', 'id'],
+                name='task_event_prev_assignee_idx',
+                condition=models.Q(previous_assigned_to_id__isnull=False),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id}: {self.kind}"
+
+    @classmethod
+    def for_task(cls, task, kind, **kwargs):
+        """Событие задачи с её проектом/исполнителем до и после изменения (прежние — только если менялись)."""
+        loaded = getattr(task, '_loaded_values', None) or {}
+        previous_list_id = loaded.get('list', task.list_id)
+        previous_assigned_to_id = loaded.get('assigned_to', task.assigned_to_id)
+        return cls(
+            task_id=task.pk,
+            list_id=task.list_id,
+            assigned_to_id=task.assigned_to_id,
+            created_by_id=task.created_by_id,
+            previous_list_id=previous_list_id if previous_list_id != task.list_id else None,
+            previous_assigned_to_id=(
+                previous_assigned_to_id if previous_assigned_to_id != task.assigned_to_id else None
+            ),
+            kind=kind,
+            **kwargs,
+        )
+
+
+class TaskStats(models.Model):
+    """Счётчики задач пользователя (исполнитель или автор) либо проекта для /stats.
+
+    Статусы и приоритеты обновляются инкрементально при сохранении/удалении задачи,
+    просрочка зависит от времени и пересчитывается периодически.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='task_stats',
+        verbose_name=_('Пользователь'),
+    )
+    project = models.OneToOneField(
+        TeamList,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='task_stats',
+        verbose_name=_('Проект'),
+    )
+    total = models.IntegerField(default=0, verbose_name=_('Всего'))
+    status_new = models.IntegerField(default=0, verbose_name=_('Новые'))
+    status_in_progress = models.IntegerField(default=0, verbose_name=_('В работе'))
+    status_review = models.IntegerField(default=0, verbose_name=_('На проверке'))
+    status_done = models.IntegerField(default=0, verbose_name=_('Готово'))
+    priority_low = models.IntegerField(default=0, verbose_name=_('Низкий приоритет'))
+    priority_medium = models.IntegerField(default=0, verbose_name=_('Средний приоритет'))
+    priority_high = models.IntegerField(default=0, verbose_name=_('Высокий приоритет'))
+    priority_critical = models.IntegerField(default=0, verbose_name=_('Критичный приоритет'))
+    overdue = models.IntegerField(default=0, verbose_name=_('Просрочено'))
+
+    class Meta:
+        verbose_name = _('Статистика задач')
+        verbose_name_plural = _('Статистика задач')
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(user__isnull=False, project__isnull=True)
+                | models.Q(user__isnull=True, project__isnull=False),
+                name='task_stats_single_scope',
+            )
+        ]
+
+    def __str__(self):
+        return f"user={self.user_id}" if self.user_id else f"project={self.project_id}"
+
+
+class TaskDailyRollup(models.Model):
+    """Дневная сводка завершённых задач проекта или исполнителя (для аналитики).
+
+    Медиана хранится по дню; суммы позволяют складывать дни в средние и отношения за период.
+    """
+
+    day = models.DateField(verbose_name=_('День'))
+    project = models.ForeignKey(
+        TeamList,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='daily_rollups',
+        verbose_name=_('Проект'),
+    )
+    assignee = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='daily_rollups',
+        verbose_name=_('Исполнитель'),
+    )
+    completed_count = models.IntegerField(default=0, verbose_name=_('Завершено'))
+    # Время цикла (started_at -> completed_at) по задачам, которые брали в работу
+    cycle_time_samples = models.IntegerField(default=0, verbose_name=_('Задач со временем цикла'))
+    cycle_time_total_hours = models.FloatField(default=0, verbose_name=_('Сумма времени цикла, ч'))
+    cycle_time_median_hours = models.FloatField(blank=True, null=True, verbose_name=_('Медиана времени цикла, ч'))
+    # Точность оценки — только по задачам, где заданы и оценка, и факт
+    estimated_count = models.IntegerField(default=0, verbose_name=_('Задач с оценкой и фактом'))
+    estimate_hours = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name=_('Оценка, ч'))
+    actual_hours = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name=_('Факт, ч'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Обновлено'))
+
+    class Meta:
+        verbose_name = _('Дневная сводка задач')
+        verbose_name_plural = _('Дневные сводки задач')
+        ordering = ('day',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['project', 'day'],
+                condition=models.Q(project__isnull=False),
+                name='unique_project_rollup_day',
+            ),
+            models.UniqueConstraint(
+                fields=['assignee', 'day'],
+                condition=models.Q(assignee__isnull=False),
+                name='unique_assignee_rollup_day',
+            ),
+            models.CheckConstraint(
+                condition=models.Q(project__isnull=False, assignee__isnull=True)
+                | models.Q(project__isnull=True, assignee__isnull=False),
+                name='task_rollup_single_scope',
+            ),
+        ]
+
+    def __str__(self):
+        scope = f"project={self.project_id}" if self.project_id else f"assignee={self.assignee_id}"
+        return f"{self.day} {scope}"
+
+
+class AuditDeadLetter(models.Model):
+    """Записи аудита, которые не удалось сохранить: хранятся для разбора и повторной записи."""
+
+    entries = models.JSONField(verbose_name=_('Записи'))
+    error = models.TextField(verbose_name=_('Ошибка'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создано'))
+    replayed_at = models.DateTimeField(blank=True, null=True, verbose_name=_('Записано повторно'))
+
+    class Meta:
+        verbose_name = _('Неудачная запись аудита')
+        verbose_name_plural = _('Неудачные записи аудита')
+        ordering = ('-created_at',)
+
+    def __str__(self):
+        return f"{len(self.entries)} entries: {self.error[:60]}"
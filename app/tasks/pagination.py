@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Keyset-пагинация: страница — это «строки после последней показанной» по ключу сортировки.
+
+    В отличие от PageNumberPagination не выполняет COUNT(*) и не использует OFFSET, поэтому
+    стоимость страницы не растёт с глубиной. Курсор непрозрачный (base64 от значений ключа).
+    Сортировка берётся из queryset (например, ?ordering= во view) или `ordering` по умолчанию;
+    `id` добавляется в конец, чтобы порядок был строгим. NULL — как в Postgres: в конце при
+    возрастании и в начале при убывании.
+    """
+
+    ordering = ('due_date', '-created_at', 'id')
+    page_size = None
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.keys = self.get_keys(queryset)
+
+        queryset = queryset.order_by(*[self._order_expression(key) for key in self.keys])
+        values = self.decode_cursor(request)
+        if values is not None:
+            queryset = queryset.filter(self._after_q(values))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request) -> int:
+        default = self.page_size or getattr(settings, 'REST_FRAMEWORK', {}).get('PAGE_SIZE') or 20
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, default))
+        except (TypeError, ValueError):
+            size = default
+        return max(1, min(size, self.max_page_size))
+
+    def get_keys(self, queryset) -> list[tuple]:
+        """[(field, descending), ...] по сортировке queryset; неизвестные выражения игнорируются."""
+        model = queryset.model
+        names = [name for name in queryset.query.order_by if isinstance(name, str)] or list(self.ordering)
+        keys = []
+        for name in names:
+            descending = name.startswith('-')
+            field_name = name.lstrip('-')
+            if field_name == 'pk':
+                field_name = model._meta.pk.name
+            try:
+                field = model._meta.get_field(field_name)
+            except FieldDoesNotExist:
+                continue
+            if not field.concrete or field.is_relation or any(key[0] is field for key in keys):
+                continue
+            keys.append((field, descending))
+        if not any(field.primary_key for field, _ in keys):
+            keys.append((model._meta.pk, False))
+        return keys
+
+    @staticmethod
+    def _order_expression(key):
+        field, descending = key
+        if not field.null:
+            return f"-{field.attname}" if descending else field.attname
+        if descending:
+            return F(field.attname).desc(nulls_first=True)
+        return F(field.attname).asc(nulls_last=True)
+
+    def _after_q(self, values) -> Q:
+        # (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... с учётом направления и NULL
+        result = Q(pk__in=[])
+        equal = Q()
+        for (field, descending), value in zip(self.keys, values):
+            name = field.attname
+            if value is None:
+                # NULL в конце (asc) — после него по этому полю ничего нет; в начале (desc) — все не-NULL
+                after = Q(**{f"{name}__isnull": False}) if descending else None
+                same = Q(**{f"{name}__isnull": True})
+            else:
+                after = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+                if field.null and not descending:
+                    after |= Q(**{f"{name}__isnull": True})
+                same = Q(**{name: value})
+            if after is not None:
+                result |= equal & after
+            equal &= same
+        return result
+
+    def encode_cursor(self, obj) -> str:
+        values = []
+        for field, _ in self.keys:
+            value = getattr(obj, field.attname)
+            values.append(None if value is None else field.value_to_string(obj))
+        payload = json.dumps({'o': self._ordering_signature(), 'v': values}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if payload.get('o') != self._ordering_signature() or len(payload['v']) != len(self.keys):
+                raise ValueError
+            return [
+                None if value is None else field.to_python(value)
+                for (field, _), value in zip(self.keys, payload['v'])
+            ]
+        except (TypeError, ValueError, KeyError, AttributeError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _ordering_signature(self) -> list[str]:
+        return [f"-{field.name}" if descending else field.name for field, descending in self.keys]
+
+    def get_next_cursor(self) -> str | None:
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_next_link(self) -> str | None:
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('next_cursor', self.get_next_cursor()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class RosterPagination(KeysetPagination):
+    """Реестр личных ботов для процесса бота: крупные страницы, порядок по id."""
+
+    ordering = ('id',)
+    page_size = 200
+    max_page_size = 1000
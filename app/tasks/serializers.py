@@ -52,7 +52,9 @@ class UserProfileSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = UserProfile
-        fields = ['username', 'telegram_chat_id', 'personal_bot_token', 'personal_bot_username']
+        fields = [
+            'username', 'telegram_chat_id', 'personal_bot_token', 'personal_bot_username', 'personal_bot_updated_at',
+        ]
 
 class PersonalBotSerializer(serializers.Serializer):
     token = serializers.CharField(required=True)
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import logging
+import statistics
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from ..models import Task, TaskDailyRollup
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_DEFAULT_DAYS = 30
+ANALYTICS_MAX_DAYS = 365
+
+
+def _day_start(day: date) -> datetime:
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def completion_day(value) -> date | None:
+    return timezone.localdate(value) if value else None
+
+
+def _rollup(day: date, rows: list, **scope) -> TaskDailyRollup:
+    cycle_hours = [
+        (completed_at - started_at).total_seconds() / 3600
+        for started_at, completed_at, _, _ in rows
+        if started_at and started_at <= completed_at
+    ]
+    estimated = [(estimate, actual) for _, _, estimate, actual in rows if estimate and actual is not None]
+    return TaskDailyRollup(
+        day=day,
+        completed_count=len(rows),
+        cycle_time_samples=len(cycle_hours),
+        cycle_time_total_hours=sum(cycle_hours),
+        cycle_time_median_hours=statistics.median(cycle_hours) if cycle_hours else None,
+        estimated_count=len(estimated),
+        estimate_hours=sum((estimate for estimate, _ in estimated), Decimal(0)),
+        actual_hours=sum((actual for _, actual in estimated), Decimal(0)),
+        **scope,
+    )
+
+
+ROLLUP_REBUILD_ATTEMPTS = 3
+ROLLUP_FIELDS = (
+    'completed_count', 'cycle_time_samples', 'cycle_time_total_hours', 'cycle_time_median_hours',
+    'estimated_count', 'estimate_hours', 'actual_hours',
+)
+
+# Строка сводки: (день, 'project' | 'assignee', id)
+RollupScope = tuple[date, str, int]
+
+
+def _rollup_scope(rollup: TaskDailyRollup) -> tuple[str, int]:
+    return ('project', rollup.project_id) if rollup.project_id else ('assignee', rollup.assignee_id)
+
+
+def _rebuild_rollups(day: date, project_ids: set | None, assignee_ids: set | None) -> int:
+    full = project_ids is None and assignee_ids is None
+    project_ids, assignee_ids = set(project_ids or ()), set(assignee_ids or ())
+
+    # Сначала блокируем строки (в порядке id — без взаимоблокировок), потом читаем задачи:
+    # пересборка, дождавшаяся блокировки, видит всё, что закоммитила предыдущая
+    locked = TaskDailyRollup.objects.select_for_update().filter(day=day).order_by('pk')
+    tasks = Task.objects.filter(
+        completed_at__gte=_day_start(day),
+        completed_at__lt=_day_start(day + timedelta(days=1)),
+    )
+    if not full:
+        locked = locked.filter(Q(project_id__in=project_ids) | Q(assignee_id__in=assignee_ids))
+        tasks = tasks.filter(Q(list_id__in=project_ids) | Q(assigned_to_id__in=assignee_ids))
+    existing = {_rollup_scope(rollup): rollup for rollup in locked}
+
+    samples: dict[tuple, list] = defaultdict(list)
+    rows = tasks.values_list(
+        'list_id', 'assigned_to_id', 'started_at', 'completed_at', 'estimate_hours', 'actual_hours',
+    )
+    for project_id, assignee_id, *sample in rows:
+        if full or project_id in project_ids:
+            samples[('project', project_id)].append(sample)
+        if assignee_id is not None and (full or assignee_id in assignee_ids):
+            samples[('assignee', assignee_id)].append(sample)
+
+    fresh = {scope: _rollup(day, rows, **{f'{scope[0]}_id': scope[1]}) for scope, rows in samples.items()}
+    stale = [rollup.pk for scope, rollup in existing.items() if scope not in fresh]
+    if stale:
+        TaskDailyRollup.objects.filter(pk__in=stale).delete()
+    updated = []
+    for scope, rollup in fresh.items():
+        if scope in existing:
+            rollup.pk = existing[scope].pk
+            updated.append(rollup)
+    if updated:
+        TaskDailyRollup.objects.bulk_update(updated, ROLLUP_FIELDS)
+    TaskDailyRollup.objects.bulk_create([rollup for scope, rollup in fresh.items() if scope not in existing])
+    return len(fresh)
+
+
+def rebuild_rollups(day: date, project_ids=None, assignee_ids=None) -> int:
+    """Пересобрать сводки дня: все (без аргументов) или только указанных проектов и исполнителей.
+
+    Параллельные пересборки одних строк идут по очереди (блокировка строк сводки). Если новую
+    строку одновременно создал другой воркер, пересборка повторяется уже под его блокировкой.
+    Возвращает число строк сводки.
+    """
+    for attempt in range(ROLLUP_REBUILD_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return _rebuild_rollups(day, project_ids, assignee_ids)
+        except IntegrityError:
+            if attempt == ROLLUP_REBUILD_ATTEMPTS - 1:
+                raise
+            logger.info("Rollup for %s was created concurrently, retrying", day)
+
+
+def rebuild_day(day: date) -> int:
+    """Пересобрать все сводки дня (по частичному индексу completed_at)."""
+    return rebuild_rollups(day)
+
+
+def rebuild_rollup_scopes(scopes) -> int:
+    """Пересобрать только указанные строки сводок (по дням: один запрос задач на день)."""
+    by_day: dict[date, tuple[set, set]] = defaultdict(lambda: (set(), set()))
+    for day, kind, pk in scopes:
+        by_day[day][0 if kind == 'project' else 1].add(pk)
+    return sum(
+        rebuild_rollups(day, project_ids, assignee_ids)
+        for day, (project_ids, assignee_ids) in sorted(by_day.items())
+    )
+
+
+def _task_scopes(day: date | None, project_id, assignee_id) -> set[RollupScope]:
+    if day is None:
+        return set()
+    scopes = {(day, 'project', project_id)}
+    if assignee_id is not None:
+        scopes.add((day, 'assignee', assignee_id))
+    return scopes
+
+
+def rollup_scopes_for_task(task: Task, created: bool) -> set[RollupScope]:
+    """Строки сводок, которые затрагивает сохранение задачи: день завершения × проект и исполнитель,
+    прежние и новые. Пусто, если завершение, проект, исполнитель и часы не менялись."""
+    new_scopes = _task_scopes(completion_day(task.completed_at), task.list_id, task.assigned_to_id)
+    loaded = getattr(task, '_loaded_values', None)
+    if created or loaded is None:
+        return new_scopes
+    old_scopes = _task_scopes(
+        completion_day(getattr(task, '_loaded_completed_at', None)),
+        loaded.get('list', task.list_id),
+        loaded.get('assigned_to', task.assigned_to_id),
+    )
+    if old_scopes != new_scopes:
+        return old_scopes | new_scopes
+    hours_changed = any(
+        name in loaded and loaded[name] != getattr(task, name) for name in ('estimate_hours', 'actual_hours')
+    )
+    if new_scopes and (hours_changed or getattr(task, '_loaded_completed_at', None) != task.completed_at):
+        return new_scopes
+    return set()
+
+
+def rollup_scopes_for_deleted_task(task: Task) -> set[RollupScope]:
+    loaded = getattr(task, '_loaded_values', None) or {}
+    return _task_scopes(
+        completion_day(getattr(task, '_loaded_completed_at', task.completed_at)),
+        loaded.get('list', task.list_id),
+        loaded.get('assigned_to', task.assigned_to_id),
+    )
+
+
+def rollup_scopes_payload(scopes) -> list[list]:
+    return [[day.isoformat(), kind, pk] for day, kind, pk in sorted(scopes)]
+
+
+def analytics_period(days) -> tuple[date, date]:
+    try:
+        days = int(days)
+    except (TypeError, ValueError):
+        days = ANALYTICS_DEFAULT_DAYS
+    days = min(max(days, 1), ANALYTICS_MAX_DAYS)
+    today = timezone.localdate()
+    return today - timedelta(days=days - 1), today
+
+
+def _ratio(actual, estimate) -> float | None:
+    return round(float(actual) / float(estimate), 2) if estimate else None
+
+
+def _avg(total, samples) -> float | None:
+    return round(total / samples, 2) if samples else None
+
+
+def summarize(rollups) -> dict:
+    """Итог за период: суммы по дням (медиана не складывается — она есть в дневном ряду)."""
+    totals = rollups.aggregate(
+        completed=Sum('completed_count'),
+        samples=Sum('cycle_time_samples'),
+        cycle_hours=Sum('cycle_time_total_hours'),
+        estimate=Sum('estimate_hours'),
+        actual=Sum('actual_hours'),
+    )
+    return {
+        'completed': totals['completed'] or 0,
+        'cycle_time_avg_hours': _avg(totals['cycle_hours'] or 0, totals['samples'] or 0),
+        'estimate_ratio': _ratio(totals['actual'] or 0, totals['estimate'] or 0),
+    }
+
+
+def daily_series(rollups) -> list[dict]:
+    return [
+        {
+            'day': rollup.day.isoformat(),
+            'completed': rollup.completed_count,
+            'cycle_time_median_hours': (
+                round(rollup.cycle_time_median_hours, 2) if rollup.cycle_time_median_hours is not None else None
+            ),
+            'cycle_time_avg_hours': _avg(rollup.cycle_time_total_hours, rollup.cycle_time_samples),
+            'estimate_ratio': _ratio(rollup.actual_hours, rollup.estimate_hours),
+        }
+        for rollup in rollups.order_by('day')
+    ]
+
+
+def project_summaries(project_ids, since: date) -> list[dict]:
+    """Итоги по нескольким проектам одним сгруппированным запросом (по убыванию завершённых)."""
+    rows = (
+        TaskDailyRollup.objects.filter(project_id__in=project_ids, day__gte=since)
+        .values('project_id', 'project__name')
+        .annotate(
+            completed=Sum('completed_count'),
+            samples=Sum('cycle_time_samples'),
+            cycle_hours=Sum('cycle_time_total_hours'),
+            estimate=Sum('estimate_hours'),
+            actual=Sum('actual_hours'),
+        )
+        .order_by('-completed', 'project_id')
+    )
+    return [
+        {
+            'project_id': row['project_id'],
+            'project_name': row['project__name'],
+            'completed': row['completed'],
+            'cycle_time_avg_hours': _avg(row['cycle_hours'], row['samples']),
+            'estimate_ratio': _ratio(row['actual'], row['estimate']),
+        }
+        for row in rows
+    ]
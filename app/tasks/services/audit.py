@@ -1,16 +1,175 @@
 from __future__ import annotations
 
-from ..models import TaskAuditLog
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-def log_task_action(task, actor, action, details=None) -> None:
-    try:
-        TaskAuditLog.objects.create(
-            task=task,
-            actor=actor,
-            action=action,
-            details=details or {},
+from ..models import AuditDeadLetter, Task, TaskAuditLog
+
+logger = logging.getLogger(__name__)
+
+AUDIT_WRITE_BATCH = 500
+
+# Закоммиченные записи текущего запроса (буфер ставит AuditBufferMiddleware)
+_buffer: ContextVar[list | None] = ContextVar('task_audit_buffer', default=None)
+
+
+def audit_payload(entries) -> list[dict]:
+    return [
+        {
+            'task_id': entry.task_id,
+            'actor_id': entry.actor_id,
+            'action': entry.action,
+            'details': entry.details,
+            'created_at': entry.created_at.isoformat(),
+        }
+        for entry in entries
+    ]
+
+
+def audit_entries(payload) -> list[TaskAuditLog]:
+    return [
+        TaskAuditLog(
+            task_id=item['task_id'],
+            actor_id=item['actor_id'],
+            action=item['action'],
+            details=item['details'],
+            created_at=parse_datetime(item['created_at']),
         )
+        for item in payload
+    ]
+
+
+def _resolve_deleted_refs(entries) -> list[TaskAuditLog]:
+    """Ссылки на удалённые после коммита объекты — как при удалении: записи задачи не нужны (CASCADE),
+    пользователь обнуляется (SET_NULL)."""
+    task_ids = set(Task.objects.filter(pk__in={entry.task_id for entry in entries}).values_list('pk', flat=True))
+    actor_ids = {entry.actor_id for entry in entries} - {None}
+    if actor_ids:
+        actor_ids = set(get_user_model().objects.filter(pk__in=actor_ids).values_list('pk', flat=True))
+    kept = []
+    for entry in entries:
+        if entry.task_id not in task_ids:
+            continue
+        if entry.actor_id is not None and entry.actor_id not in actor_ids:
+            entry.actor = None
+        # bulk_create мог успеть проставить id до отката
+        entry.pk = None
+        entry._state.adding = True
+        kept.append(entry)
+    return kept
+
+
+def save_audit_entries(entries, resolve_refs=False) -> list[tuple[TaskAuditLog, Exception]]:
+    """Пачка одним bulk_create; возвращает записи, которые сохранить не удалось, с ошибками.
+
+    resolve_refs — сначала отбросить ссылки на удалённые задачи и пользователей (для отложенной записи:
+    Celery, повтор из AuditDeadLetter). Сразу после коммита удаления редки, поэтому там пишем без
+    проверок, а при IntegrityError ссылки разрешаются и остальное пишется по одной. Прочие ошибки
+    БД пробрасываются. Пачка и каждая запись — в atomic: сбой не ломает внешнюю транзакцию.
+    """
+    if resolve_refs:
+        entries = _resolve_deleted_refs(entries)
+    try:
+        with transaction.atomic():
+            TaskAuditLog.objects.bulk_create(entries, batch_size=AUDIT_WRITE_BATCH)
+        return []
+    except IntegrityError:
+        logger.warning("Audit batch of %s entries failed integrity checks, writing one by one", len(entries))
+    failed = []
+    for entry in _resolve_deleted_refs(entries):
+        try:
+            with transaction.atomic():
+                entry.save(force_insert=True)
+        except IntegrityError as e:
+            failed.append((entry, e))
+    return failed
+
+
+def dead_letter_audit(payload: list[dict], error) -> None:
+    """Сохранить непрошедшие записи для разбора; если не удалось и это — записи остаются в логе."""
+    try:
+        with transaction.atomic():
+            AuditDeadLetter.objects.create(entries=payload, error=repr(error))
     except Exception:
-        # Avoid breaking main flow for audit failures
-        pass
+        logger.exception("Audit entries lost: %s", json.dumps(payload, ensure_ascii=False))
+
+
+def dead_letter_failed(failed) -> None:
+    logger.error("Failed to write %s audit entries: %r", len(failed), failed[0][1])
+    dead_letter_audit(audit_payload([entry for entry, _ in failed]), failed[0][1])
+
+
+def write_audit_entries(entries) -> None:
+    """Пачка записей одним bulk_create; при ошибке — в AuditDeadLetter (только непрошедшие), а не молча."""
+    if not entries:
+        return
+    try:
+        failed = save_audit_entries(entries)
+    except Exception as e:
+        logger.exception("Failed to write %s audit entries", len(entries))
+        dead_letter_audit(audit_payload(entries), e)
+        return
+    if failed:
+        dead_letter_failed(failed)
+
+
+def flush_audit_entries(entries) -> None:
+    if not entries:
+        return
+    if getattr(settings, 'AUDIT_ASYNC', False):
+        from ..tasks import write_task_audit
+
+        try:
+            write_task_audit.delay(audit_payload(entries))
+            return
+        except Exception as e:
+            # Брокер недоступен — пишем сами, чтобы не потерять записи
+            logger.warning("Audit queue unavailable, writing synchronously: %s", e)
+    write_audit_entries(entries)
+
+
+def _committed(entries) -> None:
+    buffer = _buffer.get()
+    if buffer is not None:
+        buffer.extend(entries)
+    else:
+        flush_audit_entries(entries)
+
+
+def record_audit_entries(entries) -> None:
+    """Записи аудита попадают в журнал после коммита текущей транзакции (при откате — не попадают).
+
+    В запросе они копятся до конца запроса и пишутся одной пачкой, вне запроса — пачкой на транзакцию.
+    """
+    entries = list(entries)
+    if entries:
+        transaction.on_commit(lambda: _committed(entries))
+
+
+def log_task_action(task, actor, action, details=None) -> None:
+    record_audit_entries([
+        TaskAuditLog(task=task, actor=actor, action=action, details=details or {}, created_at=timezone.now())
+    ])
+
+
+@contextmanager
+def audit_buffer():
+    """Копит закоммиченные записи аудита и пишет их одной пачкой на выходе (вложенные — в общий буфер)."""
+    if _buffer.get() is not None:
+        yield
+        return
+    token = _buffer.set([])
+    try:
+        yield
+    finally:
+        entries = _buffer.get()
+        _buffer.reset(token)
+        flush_audit_entries(entries)
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+
+from .permissions import get_access_version
+from .versioning import bump_version, get_version
+
+BOT_TASKS = 'tasks'
+BOT_PROJECTS = 'projects'
+
+
+def bot_list_cache_ttl() -> int:
+    # Свежесть обеспечивают версии, TTL лишь ограничивает память под редко читаемые ключи
+    return getattr(settings, 'BOT_LIST_CACHE_TTL', 60 * 60)
+
+
+def _list_version_key(scope: str, user_id) -> str:
+    return f"bot_list_version:{scope}:{user_id}"
+
+
+def invalidate_bot_lists(*user_ids, scopes=(BOT_TASKS, BOT_PROJECTS)) -> None:
+    """Сбрасывает закэшированные списки Bot API (get_user_tasks / projects) пользователей."""
+    bump_version(*[
+        _list_version_key(scope, user_id)
+        for scope in scopes
+        for user_id in user_ids
+        if user_id is not None
+    ])
+
+
+def bot_list_cache_key(scope: str, user_id, query_params) -> str:
+    """Ключ кэша страницы списка: версия пользователя + нормализованный запрос.
+
+    chat_id и пустые параметры не учитываются, порядок параметров не важен. Список проектов
+    зависит ещё и от членства в проектах, поэтому включает версию прав пользователя.
+    """
+    params = sorted(
+        (name, value)
+        for name in query_params
+        if name != 'chat_id'
+        for value in query_params.getlist(name)
+        if value != ''
+    )
+    digest = hashlib.md5(urlencode(params).encode()).hexdigest()
+    version = get_version(_list_version_key(scope, user_id))
+    if scope == BOT_PROJECTS:
+        version = f"{version}.{get_access_version(user_id)}"
+    return f"bot_{scope}:{user_id}:{version}:{digest}"
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Типы событий для процесса бота
+BOT_EVENT_PERSONAL_BOT = 'personal_bot'  # токен личного бота задан/сброшен — бот перезапускает polling
+BOT_EVENT_NOTIFY = 'notify'  # сообщение в чат (бот склеивает пачку сообщений в один send)
+
+_redis = None
+_redis_pid: int | None = None
+_redis_lock = threading.Lock()
+
+
+def bot_events_stream() -> str:
+    return getattr(settings, 'BOT_EVENTS_STREAM', 'taskflow:bot-events')
+
+
+def _get_redis():
+    # Как и HTTP-клиент Telegram: один клиент на процесс, пересоздаётся после fork
+    global _redis, _redis_pid
+    pid = os.getpid()
+    if _redis is None or _redis_pid != pid:
+        with _redis_lock:
+            if _redis is None or _redis_pid != pid:
+                import redis
+
+                _redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+                _redis_pid = pid
+    return _redis
+
+
+def publish_bot_event(event_type: str, **data) -> bool:
+    """Кладёт событие в Redis Stream процесса бота (consumer group — доставка хотя бы раз).
+
+    Поток ограничен BOT_EVENTS_MAXLEN записями. False — событие не записано (ошибка логируется),
+    вызывающий код решает, нужен ли запасной путь.
+    """
+    if not getattr(settings, 'BOT_EVENTS_ENABLED', True):
+        return False
+    try:
+        _get_redis().xadd(
+            bot_events_stream(),
+            {'type': event_type, 'data': json.dumps(data)},
+            maxlen=getattr(settings, 'BOT_EVENTS_MAXLEN', 10000),
+            approximate=True,
+        )
+        return True
+    except Exception as e:
+        logger.warning("Failed to publish bot event %s: %s", event_type, e)
+        return False
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Task, TaskAuditLog, TaskEvent, TeamList
+from ..tasks import dispatch_bulk_task_notifications, rebuild_task_rollups
+from .analytics import rollup_scopes_for_task, rollup_scopes_payload
+from .audit import record_audit_entries
+from .etags import invalidate_task_views
+from .permissions import can_edit_task, user_can_access_project
+from .stats import record_tasks_saved
+
+BULK_MAX_OPERATIONS = 500
+BULK_WRITE_BATCH = 200
+
+# status: {"status"}, assign: {"assigned_to": id|null}, move: {"list": id}, complete/uncomplete — без значения
+BULK_ACTIONS = ('status', 'assign', 'move', 'complete', 'uncomplete')
+
+
+class BulkOperationError(Exception):
+    """Пачка отклонена целиком: errors — [{'index': n, 'error': '...'}]."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _parse_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse(operations) -> tuple[list[tuple], list[dict]]:
+    parsed, errors = [], []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            errors.append({'index': index, 'error': "Operation must be an object"})
+            continue
+        action = operation.get('action')
+        task_id = _parse_id(operation.get('id'))
+        if task_id is None or action not in BULK_ACTIONS:
+            errors.append({'index': index, 'error': "Missing id or unknown action"})
+            continue
+        value = None
+        if action == 'status':
+            value = operation.get('status')
+            if value not in Task.Status.values:
+                errors.append({'index': index, 'error': "Invalid status"})
+                continue
+        elif action == 'assign':
+            value = operation.get('assigned_to')
+            if value is not None and _parse_id(value) is None:
+                errors.append({'index': index, 'error': "Invalid assigned_to"})
+                continue
+            value = _parse_id(value)
+        elif action == 'move':
+            value = _parse_id(operation.get('list'))
+            if value is None:
+                errors.append({'index': index, 'error': "Invalid list"})
+                continue
+        parsed.append((index, task_id, action, value))
+    return parsed, errors
+
+
+def _apply_operation(task: Task, action: str, value, projects, users) -> tuple[set, tuple]:
+    """Меняет задачу в памяти; возвращает изменённые поля (с синхронизацией статуса) и запись аудита."""
+    if action == 'status':
+        previous = task.status
+        task.status = value
+        fields = {'status'}
+        audit = (TaskAuditLog.Action.STATUS_CHANGED, {'from': previous, 'to': value})
+    elif action == 'complete':
+        task.is_completed = True
+        fields = {'is_completed'}
+        audit = (TaskAuditLog.Action.COMPLETED, {})
+    elif action == 'uncomplete':
+        task.is_completed = False
+        fields = {'is_completed'}
+        audit = (TaskAuditLog.Action.UNCOMPLETED, {})
+    elif action == 'assign':
+        task.assigned_to = users.get(value) if value is not None else None
+        fields = {'assigned_to'}
+        audit = (TaskAuditLog.Action.UPDATED, {'assigned_to_id': value})
+    else:
+        task.list = projects[value]
+        fields = {'list'}
+        audit = (TaskAuditLog.Action.UPDATED, {'list_id': value})
+    # Те же правила, что и в Task.save(update_fields=...) одиночных endpoint'ов
+    task.sync_status_fields(fields)
+    return fields, audit
+
+
+def apply_bulk_operations(user, operations) -> list[Task]:
+    """Применяет пачку операций над задачами в одной транзакции.
+
+    Задачи читаются под блокировкой строк (select_for_update), права проверяются по всей пачке
+    заранее (несколько запросов + снимок прав); при любой ошибке ничего не меняется. Запись —
+    bulk_update по группам задач с одинаковым набором изменённых полей (чужие поля не
+    перезаписываются), bulk_create аудита и событий журнала; уведомления уходят после коммита
+    одним сообщением на получателя.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BulkOperationError([{'index': None, 'error': "operations must be a non-empty list"}])
+    if len(operations) > BULK_MAX_OPERATIONS:
+        raise BulkOperationError([{'index': None, 'error': f"Too many operations (max {BULK_MAX_OPERATIONS})"}])
+
+    parsed, errors = _parse(operations)
+    with transaction.atomic():
+        # of=('self',): блокируем только задачи (исполнитель — nullable JOIN, его блокировать нельзя)
+        tasks = (
+            Task.objects.select_related('list', 'assigned_to').select_for_update(of=('self',))
+            .in_bulk({task_id for _, task_id, _, _ in parsed})
+        )
+        projects = TeamList.objects.in_bulk({value for _, _, action, value in parsed if action == 'move'})
+        users = get_user_model().objects.in_bulk(
+            {value for _, _, action, value in parsed if action == 'assign' and value is not None}
+        )
+        for index, task_id, action, value in parsed:
+            task = tasks.get(task_id)
+            if task is None:
+                errors.append({'index': index, 'error': "Task not found"})
+            elif not can_edit_task(user, task):
+                errors.append({'index': index, 'error': "Permission denied"})
+            elif action == 'move' and not (value in projects and user_can_access_project(user, projects[value])):
+                errors.append({'index': index, 'error': "Project not found or not accessible"})
+            elif action == 'assign' and value is not None and value not in users:
+                errors.append({'index': index, 'error': "User not found"})
+        if errors:
+            raise BulkOperationError(sorted(errors, key=lambda error: error['index']))
+
+        # Прежние проекты и исполнители нужны для сброса кэшей списков
+        owner_ids = {task.created_by_id for task in tasks.values()} | {task.assigned_to_id for task in tasks.values()}
+        project_ids = {task.list_id for task in tasks.values()}
+
+        task_fields: dict = defaultdict(set)
+        audit_rows = []
+        for _, task_id, action, value in parsed:
+            task = tasks[task_id]
+            fields, (audit_action, details) = _apply_operation(task, action, value, projects, users)
+            task_fields[task_id] |= fields
+            audit_rows.append(TaskAuditLog(
+                task=task, actor=user, action=audit_action, details=details, created_at=timezone.now(),
+            ))
+
+        changes = {}
+        for task in tasks.values():
+            changed_fields = task.get_changed_fields()
+            if changed_fields:
+                changes[task.pk] = changed_fields
+        changed = [tasks[task_id] for task_id in changes]
+        owner_ids |= {task.assigned_to_id for task in changed}
+        project_ids |= {task.list_id for task in changed}
+
+        now = timezone.now()
+        if changed:
+            groups: dict = defaultdict(list)
+            for task in changed:
+                # bulk_update не вызывает save(): auto_now проставляем сами
+                task.updated_at = now
+                groups[frozenset(task_fields[task.pk])].append(task)
+            # Каждой задаче — только её поля: правки, не входящие в операции, не затираются
+            for fields, group in groups.items():
+                Task.objects.bulk_update(group, sorted(fields | {'updated_at'}), batch_size=BULK_WRITE_BATCH)
+            # Outbox и журнал изменений: рассылает их bulk-уведомление ниже, при сбое — flush_task_events
+            TaskEvent.objects.bulk_create([
+                TaskEvent.for_task(task, TaskEvent.Kind.UPDATED, changed_fields=changes[task.pk])
+                for task in changed
+            ], batch_size=BULK_WRITE_BATCH)
+            record_tasks_saved(changed)
+        record_audit_entries(audit_rows)
+        scopes = set().union(*(rollup_scopes_for_task(task, created=False) for task in changed))
+        transaction.on_commit(
+            lambda: _after_commit(changes, owner_ids - {None}, project_ids, scopes), robust=True,
+        )
+
+    for task in changed:
+        task._remember_loaded_values()
+    return list(tasks.values())
+
+
+def _after_commit(changes: dict, owner_ids: set, project_ids: set, scopes: set) -> None:
+    invalidate_task_views(owner_ids, project_ids)
+    if scopes:
+        rebuild_task_rollups.delay(scopes=rollup_scopes_payload(scopes))
+    if changes:
+        dispatch_bulk_task_notifications.delay(sorted(changes))
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+from ..models import Task, TaskEvent
+from .permissions import accessible_project_ids, get_access_version, visible_tasks_q
+
+CHANGES_BATCH = 500
+# Позиция (txid, id) последнего события, удалённого очисткой журнала (purge_task_events)
+TASK_EVENTS_PURGED_KEY = 'task_events:purged_through'
+
+
+def _commit_horizon() -> int | None:
+    """Граница завершённых транзакций: все события с txid ниже неё уже закоммичены (или откатились).
+
+    Журнал упорядочен по (txid, id), и отдаются только события ниже границы — транзакция,
+    которая коммитится позже, получит позицию после токена и не будет пропущена. Долгая
+    транзакция лишь задерживает журнал. В SQLite писатели последовательны (txid = 0),
+    порядок id совпадает с порядком коммита — граница не нужна.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def make_change_token(position: tuple[int, int], access_version: int) -> str:
+    txid, event_id = position
+    return f"{txid}-{event_id}.{access_version}"
+
+
+def parse_change_token(token) -> tuple[tuple[int, int], int] | None:
+    try:
+        position, access_version = str(token).split('.', 1)
+        txid, event_id = position.split('-', 1)
+        return (int(txid), int(event_id)), int(access_version)
+    except (TypeError, ValueError):
+        return None
+
+
+def _after(position: tuple[int, int]) -> Q:
+    txid, event_id = position
+    return Q(txid__gt=txid) | Q(txid=txid, id__gt=event_id)
+
+
+def _committed(horizon: int | None) -> Q:
+    return Q(txid__lt=horizon) if horizon is not None else Q()
+
+
+def _head(horizon: int | None) -> tuple[int, int]:
+    return (
+        TaskEvent.objects.filter(_committed(horizon))
+        .order_by('-txid', '-id').values_list('txid', 'id').first()
+    ) or (0, 0)
+
+
+def current_change_token(user) -> str:
+    """Токен «на сейчас»: последнее закоммиченное событие журнала + версия прав пользователя."""
+    return make_change_token(_head(_commit_horizon()), get_access_version(user.pk))
+
+
+def mark_task_events_purged(position: tuple[int, int]) -> None:
+    """Запомнить границу очистки журнала: токены до неё требуют полной перезагрузки."""
+    if tuple(position) > tuple(cache.get(TASK_EVENTS_PURGED_KEY) or (0, 0)):
+        cache.set(TASK_EVENTS_PURGED_KEY, tuple(position), timeout=None)
+
+
+def _token_is_valid(user, parsed) -> bool:
+    if parsed is None:
+        return False
+    position, access_version = parsed
+    if access_version != get_access_version(user.pk):
+        # Изменилось членство в проектах: старые задачи новых проектов в журнале не появятся
+        return False
+    if position < tuple(cache.get(TASK_EVENTS_PURGED_KEY) or (0, 0)):
+        # Часть журнала после токена удалена очисткой — пропущенные изменения восстановить нельзя
+        return False
+    txid, event_id = position
+    return event_id == 0 or TaskEvent.objects.filter(pk=event_id, txid=txid).exists()
+
+
+def _event_scope_q(user) -> Q:
+    """События задач, видимых пользователю до или после изменения (те же условия, что visible_tasks_q)."""
+    project_ids = accessible_project_ids(user)
+    return (
+        Q(list_id__in=project_ids) | Q(previous_list_id__in=project_ids)
+        | Q(assigned_to_id=user.pk) | Q(previous_assigned_to_id=user.pk)
+        | Q(created_by_id=user.pk)
+    )
+
+
+def task_changes(user, since, serialize) -> dict:
+    """Изменения задач пользователя после токена since.
+
+    Читаются только события задач, которые пользователь видел до изменения или видит после
+    (при неизменной версии прав), по индексам области в порядке журнала, так что стоимость
+    зависит от его событий после токена, а не от всего журнала.
+    changed — актуальные видимые задачи (создания и правки), removed — id удалённых задач и задач,
+    к которым пропал доступ. reset — токен недействителен, нужна полная перезагрузка списка.
+    Журнал упорядочен по транзакциям и отдаёт только закоммиченное, поэтому правки не теряются
+    и при коммите не в порядке id.
+    """
+    parsed = parse_change_token(since) if since else None
+    if not _token_is_valid(user, parsed):
+        return {'token': current_change_token(user), 'reset': True, 'changed': [], 'removed': [], 'has_more': False}
+
+    since_position, access_version = parsed
+    horizon = _commit_horizon()
+    # Голову журнала читаем до выборки: более поздние события в неё не попадут и не будут пропущены
+    head = _head(horizon)
+    rows = list(
+        TaskEvent.objects.filter(_event_scope_q(user), _after(since_position), _committed(horizon))
+        .order_by('txid', 'id').values_list('txid', 'id', 'task_id')[:CHANGES_BATCH + 1]
+    )
+    has_more = len(rows) > CHANGES_BATCH
+    rows = rows[:CHANGES_BATCH]
+
+    next_position = rows[-1][:2] if rows else since_position
+    if not has_more:
+        # Событий пользователя больше нет — сдвигаем токен к голове журнала, чтобы не сканировать чужие
+        next_position = max(next_position, head)
+
+    task_ids = list(dict.fromkeys(task_id for _, _, task_id in rows))
+    visible = list(
+        Task.objects.filter(visible_tasks_q(user), id__in=task_ids).select_related('list', 'assigned_to')
+    )
+    visible_ids = {task.id for task in visible}
+    return {
+        'token': make_change_token(next_position, access_version),
+        'reset': False,
+        'changed': serialize(visible),
+        'removed': [task_id for task_id in task_ids if task_id not in visible_ids],
+        'has_more': has_more,
+    }
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import hashlib
+
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from ..models import ProjectMember
+from .bot_cache import BOT_TASKS, invalidate_bot_lists
+from .permissions import get_access_version
+from .versioning import bump_version, get_version
+
+
+def make_etag(*parts) -> str:
+    """Слабый ETag из «версии» данных (даты изменений, счётчики, параметры запроса)."""
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _task_list_version_key(user_id) -> str:
+    return f"task_list_version:{user_id}"
+
+
+def invalidate_task_lists(*user_ids) -> None:
+    """Меняет ETag списка задач (/api/v1/tasks/) у пользователей, которым видны изменения."""
+    bump_version(*[_task_list_version_key(user_id) for user_id in user_ids if user_id is not None])
+
+
+def invalidate_task_views(owner_ids, project_ids) -> None:
+    """Списки задач после их изменения: в боте — исполнители и авторы, в вебе — ещё участники проектов."""
+    invalidate_bot_lists(*owner_ids, scopes=(BOT_TASKS,))
+    member_ids = ProjectMember.objects.filter(
+        project_id__in=project_ids, is_active=True,
+    ).values_list('user_id', flat=True)
+    invalidate_task_lists(*owner_ids, *member_ids)
+
+
+def task_list_etag(user, query_params) -> str:
+    # Версия списка + версия прав (членство в проектах меняет видимость) + запрос; без обращений к БД
+    return make_etag(
+        'tasks', user.pk, sorted(query_params.lists()),
+        get_version(_task_list_version_key(user.pk)), get_access_version(user.pk),
+    )
+
+
+def _opaque(etag: str) -> str:
+    return etag.removeprefix('W/').strip('"')
+
+
+def combine_etags(outer: str, inner: str) -> str:
+    """ETag составного ответа: своя часть + ETag вложенного (его можно проверить отдельно)."""
+    return f'W/"{_opaque(outer)}.{_opaque(inner)}"'
+
+
+def forward_inner_etag(request, outer: str) -> None:
+    """Передаёт вложенному endpoint его часть If-None-Match, если своя часть составного ETag совпала."""
+    for tag in parse_etags(request.headers.get('If-None-Match') or ''):
+        prefix, _, inner = _opaque(tag).partition('.')
+        if inner and prefix == _opaque(outer):
+            request.forwarded_if_none_match = f'W/"{inner}"'
+            return
+
+
+def etag_matches(request, etag: str) -> bool:
+    header = getattr(request, 'forwarded_if_none_match', None) or request.headers.get('If-None-Match')
+    if not header:
+        return False
+    # Слабое сравнение (RFC 9110): префикс W/ не учитывается
+    tags = parse_etags(header)
+    return '*' in tags or etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in tags}
+
+
+def conditional_response(request, etag: str, build_data) -> Response:
+    """Ответ на GET с ETag: 304 без сериализации, если у клиента та же версия данных.
+
+    build_data вызывается только при несовпадении. Cache-Control: private, no-cache —
+    ответ можно хранить только у клиента и только с обязательной перепроверкой.
+    """
+    if etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(build_data())
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -1,76 +1,264 @@
 from __future__ import annotations
 
+import asyncio
+import time
+import uuid
+from collections import defaultdict
+
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-import httpx
+
+try:
+    import channels_redis
+except ImportError:  # pragma: no cover - Redis-слой не установлен
+    channels_redis = None
 
 from ..serializers import TaskSerializer
 from ..tasks import send_telegram_notification
-from ..models import ProjectMember
 
+# Сколько строк показывать в сводном Telegram-сообщении (дедлайны, массовые операции)
+DIGEST_MAX_LINES = 30
 
-def notify_channels(task) -> None:
-    """Отправляет уведомление через Channels (Websocket)."""
-    try:
-        channel_layer = get_channel_layer()
-        task_data = TaskSerializer(task).data
-
-        recipient_ids = set()
-        if task.assigned_to_id:
-            recipient_ids.add(task.assigned_to_id)
-        if task.created_by_id:
-            recipient_ids.add(task.created_by_id)
-
-        member_ids = ProjectMember.objects.filter(
-            project=task.list,
-            is_active=True,
-        ).values_list('user_id', flat=True)
-        recipient_ids.update(member_ids)
-
-        for user_id in recipient_ids:
-            group_name = f"user_{user_id}"
-            async_to_sync(channel_layer.group_send)(
-                group_name,
-                {
-                    "type": "task_update",
-                    "message": task_data,
-                }
-            )
-    except Exception:
-        # Don't crash main flow on websocket errors
-        pass
 
+# Доставка одного сообщения в пачку каналов за один EVAL на Redis-соединение
+# (аналог скрипта из channels_redis.RedisChannelLayer.group_send, плюс чистка протухших сообщений).
+_GROUP_SEND_MANY_LUA = """
+    local over_capacity = 0
+    local current_time = ARGV[#ARGV - 1]
+    local expiry = ARGV[#ARGV]
+    for i=1,#KEYS do
+        redis.call('ZREMRANGEBYSCORE', KEYS[i], 0, current_time - expiry)
+        if redis.call('ZCOUNT', KEYS[i], '-inf', '+inf') < tonumber(ARGV[i + #KEYS]) then
+            redis.call('ZADD', KEYS[i], current_time, ARGV[i])
+            redis.call('EXPIRE', KEYS[i], expiry)
+        else
+            over_capacity = over_capacity + 1
+        end
+    end
+    return over_capacity
+"""
+
+
+# Пайплайн опирается на внутренние методы RedisChannelLayer — проверены на channels_redis 4.x;
+# на другой версии или другом слое — публичный group_send
+_REDIS_LAYER_VERSIONS = ('4.',)
+_REDIS_LAYER_API = ('consistent_hash', '_group_key', 'connection', '_map_channel_keys_to_connection')
+
+
+def _supports_redis_group_send_many(channel_layer) -> bool:
+    if channels_redis is None or not getattr(channels_redis, '__version__', '').startswith(_REDIS_LAYER_VERSIONS):
+        return False
+    return (
+        all(callable(getattr(channel_layer, name, None)) for name in _REDIS_LAYER_API)
+        and hasattr(channel_layer, 'group_expiry') and hasattr(channel_layer, 'expiry')
+    )
+
+
+async def _redis_group_send_many(channel_layer, group_names, message: dict) -> None:
+    """Пайплайн для RedisChannelLayer: участники всех групп читаются одним pipeline
+    на соединение, сообщение доставляется одним EVAL на соединение."""
+    group_keys_by_connection = defaultdict(list)
+    for group in group_names:
+        group_keys_by_connection[channel_layer.consistent_hash(group)].append(channel_layer._group_key(group))
+
+    expired_before = int(time.time()) - channel_layer.group_expiry
+    channel_names = set()
+    for index, group_keys in group_keys_by_connection.items():
+        pipe = channel_layer.connection(index).pipeline()
+        for key in group_keys:
+            pipe.zremrangebyscore(key, min=0, max=expired_before)
+            pipe.zrange(key, 0, -1)
+        results = await pipe.execute()
+        for members in results[1::2]:
+            channel_names.update(member.decode('utf8') for member in members)
+
+    if not channel_names:
+        return
 
-def _send_personal_telegram_notification_sync(bot_token: str, chat_id: str, message: str) -> bool:
-    """Синхронная отправка уведомления через личного бота."""
+    connection_to_keys, key_to_message, key_to_capacity = channel_layer._map_channel_keys_to_connection(
+        sorted(channel_names), message,
+    )
+    now = time.time()
+    await asyncio.gather(*(
+        channel_layer.connection(index).eval(
+            _GROUP_SEND_MANY_LUA,
+            len(keys),
+            *keys,
+            *[key_to_message[key] for key in keys],
+            *[key_to_capacity[key] for key in keys],
+            now,
+            channel_layer.expiry,
+        )
+        for index, keys in connection_to_keys.items()
+    ))
+
+
+def group_send_many(group_names, message: dict) -> None:
+    """Отправляет одно сообщение во множество групп Channels за один переход в event loop.
+
+    Для Redis-слоя участники групп читаются и сообщения пишутся пайплайном; канал,
+    состоящий в нескольких группах, получает сообщение один раз. Для остальных слоёв
+    group_send выполняются конкурентно, и такой канал получает копию на каждую группу —
+    общий delivery_id позволяет потребителю отбросить повторы.
+    """
+    group_names = list(dict.fromkeys(group_names))
+    if not group_names:
+        return
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    message = {**message, 'delivery_id': uuid.uuid4().hex}
+
+    async def _send_all():
+        if _supports_redis_group_send_many(channel_layer):
+            await _redis_group_send_many(channel_layer, group_names, message)
+        else:
+            await asyncio.gather(*(channel_layer.group_send(name, message) for name in group_names))
+
+    async_to_sync(_send_all)()
+
+
+def user_group_name(user_id) -> str:
+    return f"user_{user_id}"
+
+
+def project_group_name(project_id) -> str:
+    return f"project_{project_id}"
+
+
+def notify_membership_changed(user_id, project_id, active: bool) -> None:
+    """Просит WS-соединения пользователя подписаться/отписаться от группы проекта."""
     try:
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        response = httpx.post(
-            url,
-            json={
-                "chat_id": chat_id,
-                "text": message,
+        group_send_many(
+            [user_group_name(user_id)],
+            {
+                "type": "project_membership",
+                "project_id": project_id,
+                "active": bool(active),
             },
-            timeout=5,
         )
-        response.raise_for_status()
-        return True
     except Exception:
-        return False
+        pass
+
+
+def notify_channels(task) -> None:
+    """Отправляет уведомление через Channels (Websocket).
+
+    Участники проекта подписаны на project_<id>, поэтому задача публикуется один раз
+    в группу проекта и дополнительно исполнителю/автору (они могут не быть участниками).
+    Вызывается из рассылки outbox: ошибка пробрасывается, и события будут разосланы повторно.
+    """
+    task_data = TaskSerializer(task).data
+
+    group_names = [project_group_name(task.list_id)]
+    if task.assigned_to_id:
+        group_names.append(user_group_name(task.assigned_to_id))
+    if task.created_by_id:
+        group_names.append(user_group_name(task.created_by_id))
+
+    group_send_many(
+        group_names,
+        {
+            "type": "task_update",
+            "message": task_data,
+        },
+    )
+
+
+def notify_task_deleted(task_id, list_id) -> None:
+    """WS-уведомление об удалении задачи участникам проекта (остальные узнают при синхронизации)."""
+    if not list_id:
+        return
+    group_send_many([project_group_name(list_id)], {"type": "task_delete", "task_id": task_id})
+
+
+def _field_labels(field_names) -> str:
+    from ..models import Task
+
+    labels = []
+    for name in field_names:
+        try:
+            labels.append(str(Task._meta.get_field(name).verbose_name).lower())
+        except Exception:
+            labels.append(name)
+    return ', '.join(labels)
+
+
+def build_telegram_message(task, created: bool, changed_fields=None) -> str | None:
+    """Текст Telegram-уведомления по событию задачи (None — уведомлять не нужно).
+
+    changed_fields: список изменённых полей, None — неизвестно (полное сохранение).
+    """
+    due = task.due_date.strftime('%d.%m %H:%M') if task.due_date else 'Не установлен'
+    if created:
+        return f"🚨 Новая задача назначена вам: '{task.title}'! Срок: {due}"
+    if changed_fields is not None and not changed_fields:
+        # Сохранение без изменений
+        return None
+    if task.is_completed and set(changed_fields or []).issubset({'is_completed', 'status', 'completed_at'}):
+        # Завершение задачи (или синхронизация статуса/даты завершения) не уведомляем
+        return None
+    visible_fields = [
+        name for name in (changed_fields or [])
+        if name not in {'updated_at', 'completed_at', 'started_at'}
+    ]
+    if visible_fields:
+        return f"🔄 Задача изменена: '{task.title}' ({_field_labels(visible_fields)}). Срок: {due}"
+    return f"🔄 Задача изменена: '{task.title}'. Срок: {due}"
+
+
+def merge_task_events(events):
+    """Склеивает пачку событий одной задачи: (создана ли, объединённый список полей или None)."""
+    created = any(event.kind == event.Kind.CREATED for event in events)
+    changed_fields = set()
+    for event in events:
+        if event.kind == event.Kind.CREATED:
+            continue
+        if event.changed_fields is None:
+            return created, None
+        changed_fields.update(event.changed_fields)
+    return created, sorted(changed_fields)
+
+
+def notify_task_events(task, events) -> None:
+    """Рендер и рассылка одного уведомления по склеенным событиям outbox (вызывается из Celery)."""
+    notify_channels(task)
+    created, changed_fields = merge_task_events(events)
+    message = build_telegram_message(task, created=created, changed_fields=changed_fields)
+    if message:
+        notify_telegram(task, message)
+
+
+def format_digest(header: str, lines, single_prefix: str = '') -> str:
+    """Одно сообщение на несколько строк: заголовок и первые DIGEST_MAX_LINES пунктов; одна строка — как есть."""
+    if len(lines) == 1:
+        return f"{single_prefix}{lines[0]}"
+    shown = lines[:DIGEST_MAX_LINES]
+    text = f"{header}\n" + "\n".join(f"• {line}" for line in shown)
+    if len(lines) > len(shown):
+        text += f"\n… и ещё {len(lines) - len(shown)}"
+    return text
+
+
+def deadline_digest(lines) -> str:
+    return format_digest("🔴 Крайние сроки:", lines, single_prefix="🔴 Крайний срок! ")
+
+
+def notify_task_batch(tasks, changes: dict) -> None:
+    """Рассылка по массовой операции: WS по каждой задаче, в Telegram — одно сообщение на исполнителя."""
+    lines_by_user = defaultdict(list)
+    for task in tasks:
+        notify_channels(task)
+        message = build_telegram_message(task, created=False, changed_fields=changes.get(task.pk))
+        if message and task.assigned_to_id and not task.is_completed:
+            lines_by_user[task.assigned_to_id].append(message)
+
+    for user_id, lines in lines_by_user.items():
+        text = format_digest(f"🔄 Изменено задач: {len(lines)}", lines)
+        send_telegram_notification.delay(user_id, text, prefer_personal_bot=True)
 
 
 def notify_telegram(task, message: str) -> None:
     """Отправляет уведомление через личного бота или системного (Celery)."""
-    try:
-        if task.assigned_to and not task.is_completed:
-            profile = task.assigned_to.profile
-            if profile.personal_bot_token and profile.telegram_chat_id:
-                _send_personal_telegram_notification_sync(
-                    profile.personal_bot_token,
-                    profile.telegram_chat_id,
-                    message,
-                )
-            else:
-                send_telegram_notification.delay(task.assigned_to.id, message)
-    except Exception:
-        pass
+    if task.assigned_to_id and not task.is_completed:
+        send_telegram_notification.delay(task.assigned_to_id, message, prefer_personal_bot=True)
@@ -1,6 +1,96 @@
 from __future__ import annotations
 
+import itertools
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
 from ..models import ProjectMember, TeamList, Task
+from .versioning import bump_version, get_version
+
+ADMIN_GROUP_NAMES = ['Администраторы', 'Admins', 'admin', 'admins']
+ACCESS_SNAPSHOT_TTL = 60 * 60
+
+# Поколение сбросов прав в этом процессе: мемо на объекте пользователя действительно, пока оно
+# не сменилось (иначе запрос, изменивший своё членство, читал бы старые права до конца запроса)
+_memo_generations = itertools.count(1)
+_memo_generation = 0
+
+
+def _access_version_key(user_id) -> str:
+    return f"access_version:{user_id}"
+
+
+def get_access_version(user_id) -> int:
+    return get_version(_access_version_key(user_id))
+
+
+def invalidate_access_snapshot(*user_ids) -> None:
+    """Сбрасывает кэшированные права пользователей (ProjectMember, группы, флаги пользователя).
+
+    Версия поднимается сразу (текущая транзакция видит свои изменения) и ещё раз после коммита:
+    параллельный запрос мог собрать снимок из незакоммиченного состояния под промежуточной версией.
+    """
+    global _memo_generation
+    keys = [_access_version_key(user_id) for user_id in user_ids if user_id is not None]
+    if not keys:
+        return
+    _memo_generation = next(_memo_generations)
+    bump_version(*keys)
+    transaction.on_commit(lambda: bump_version(*keys), robust=True)
+
+
+def _build_access_snapshot(user) -> dict:
+    try:
+        in_admin_group = user.groups.filter(name__in=ADMIN_GROUP_NAMES).exists()
+    except Exception:
+        in_admin_group = False
+    return {
+        'in_admin_group': in_admin_group,
+        'projects': dict(
+            ProjectMember.objects.filter(user_id=user.id, is_active=True).values_list('project_id', 'role')
+        ),
+    }
+
+
+def get_access_snapshot(user) -> dict:
+    """Снимок прав пользователя: членство в админ-группах и роли в проектах {project_id: role}.
+
+    Хранится в кэше (Redis) под версионированным ключом и мемоизируется на объекте
+    пользователя, так что в пределах запроса права читаются один раз (до сброса прав в процессе).
+    """
+    generation, snapshot = getattr(user, '_access_snapshot', (None, None))
+    if snapshot is not None and generation == _memo_generation:
+        return snapshot
+    generation = _memo_generation
+    key = f"access_snapshot:{user.id}:{get_access_version(user.id)}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = _build_access_snapshot(user)
+        cache.set(key, snapshot, timeout=ACCESS_SNAPSHOT_TTL)
+    user._access_snapshot = (generation, snapshot)
+    return snapshot
+
+
+def accessible_project_ids(user) -> list[int]:
+    """Проекты, где пользователь — активный участник (из снимка прав, без запроса)."""
+    if not getattr(user, 'pk', None):
+        return []
+    return list(get_access_snapshot(user)['projects'])
+
+
+def visible_tasks_q(user) -> Q:
+    """Фильтр задач, видимых пользователю.
+
+    Вместо JOIN на участников проекта с DISTINCT — IN по заранее известным id проектов:
+    каждое условие OR покрывается своим индексом (assigned_to, created_by, list), дублей нет.
+    """
+    return Q(assigned_to=user) | Q(created_by=user) | Q(list_id__in=accessible_project_ids(user))
+
+
+def visible_projects_q(user) -> Q:
+    return Q(created_by=user) | Q(id__in=accessible_project_ids(user))
 
 
 def is_admin_user(user) -> bool:
@@ -8,10 +98,9 @@ def is_admin_user(user) -> bool:
         return False
     if getattr(user, 'is_superuser', False) or getattr(user, 'is_staff', False):
         return True
-    try:
-        return user.groups.filter(name__in=['Администраторы', 'Admins', 'admin', 'admins']).exists()
-    except Exception:
+    if not getattr(user, 'pk', None):
         return False
+    return get_access_snapshot(user)['in_admin_group']
 
 
 def user_can_access_project(user, project: TeamList) -> bool:
@@ -19,7 +108,7 @@ def user_can_access_project(user, project: TeamList) -> bool:
         return False
     if project.created_by_id == user.id:
         return True
-    return ProjectMember.objects.filter(project=project, user=user, is_active=True).exists()
+    return project.id in get_access_snapshot(user)['projects']
 
 
 def user_is_project_manager(user, project: TeamList) -> bool:
@@ -27,12 +116,7 @@ def user_is_project_manager(user, project: TeamList) -> bool:
         return False
     if project.created_by_id == user.id:
         return True
-    return ProjectMember.objects.filter(
-        project=project,
-        user=user,
-        is_active=True,
-        role=ProjectMember.Role.MANAGER,
-    ).exists()
+    return get_access_snapshot(user)['projects'].get(project.id) == ProjectMember.Role.MANAGER
 
 
 def can_edit_task(user, task: Task) -> bool:
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from ..models import Task, TaskStats
+from .permissions import accessible_project_ids
+
+STATUS_FIELDS = {value: f'status_{value}' for value in Task.Status.values}
+PRIORITY_FIELDS = {value: f'priority_{value}' for value in Task.Priority.values}
+COUNTER_FIELDS = ('total', *STATUS_FIELDS.values(), *PRIORITY_FIELDS.values())
+
+# Область счётчиков: ('user', id) или ('project', id)
+Scope = tuple[str, int]
+
+
+def _state(values: dict) -> tuple | None:
+    """(users, project, status, priority) задачи из значений по имени поля."""
+    if any(name not in values for name in ('list', 'assigned_to', 'status', 'priority')):
+        return None
+    users = frozenset({values['assigned_to'], values.get('created_by')} - {None})
+    return users, values['list'], values['status'], values['priority']
+
+
+def _task_fields(task: Task) -> dict:
+    return {
+        'list': task.list_id,
+        'assigned_to': task.assigned_to_id,
+        'created_by': task.created_by_id,
+        'status': task.status,
+        'priority': task.priority,
+    }
+
+
+def _scopes(state: tuple) -> list[Scope]:
+    users, project_id, _, _ = state
+    return [('user', user_id) for user_id in sorted(users)] + [('project', project_id)]
+
+
+def _add_state(deltas: dict, state: tuple, sign: int) -> None:
+    _, _, task_status, priority = state
+    for scope in _scopes(state):
+        counters = deltas[scope]
+        counters['total'] += sign
+        counters[STATUS_FIELDS[task_status]] += sign
+        counters[PRIORITY_FIELDS[priority]] += sign
+
+
+def _scope_filter(scope: Scope) -> Q:
+    kind, pk = scope
+    if kind == 'user':
+        return Q(assigned_to_id=pk) | Q(created_by_id=pk)
+    return Q(list_id=pk)
+
+
+def compute_counts(task_filter: Q, now=None) -> dict:
+    """Счётчики задач по фильтру одним сгруппированным запросом."""
+    now = now or timezone.now()
+    counts = dict.fromkeys(COUNTER_FIELDS, 0)
+    counts['overdue'] = 0
+    rows = (
+        Task.objects.filter(task_filter)
+        .values('status', 'priority')
+        .annotate(
+            count=Count('id'),
+            overdue=Count('id', filter=Q(is_completed=False, due_date__lt=now)),
+        )
+        .order_by()
+    )
+    for row in rows:
+        counts['total'] += row['count']
+        counts[STATUS_FIELDS[row['status']]] += row['count']
+        counts[PRIORITY_FIELDS[row['priority']]] += row['count']
+        counts['overdue'] += row['overdue']
+    return counts
+
+
+def compute_scope_counts(scope: Scope, now=None) -> dict:
+    """Полный пересчёт счётчиков области."""
+    return compute_counts(_scope_filter(scope), now)
+
+
+def _scope_kwargs(scope: Scope) -> dict:
+    kind, pk = scope
+    return {'user_id': pk} if kind == 'user' else {'project_id': pk}
+
+
+def _delta_updates(counters) -> dict:
+    return {name: F(name) + delta for name, delta in counters.items() if delta}
+
+
+def rebuild_scope(scope: Scope, delta=None) -> TaskStats:
+    """Пересчитать область целиком (первое изменение в области или прежнее состояние неизвестно).
+
+    delta — правка текущей транзакции, уже вошедшая в пересчёт. Если строку одновременно создал
+    другой запрос, его пересчёт эту (незакоммиченную) правку не видел — она применяется к его
+    строке через F(); без delta область пересчитывается заново под блокировкой строки.
+    """
+    kwargs = _scope_kwargs(scope)
+    counts = compute_scope_counts(scope)
+    try:
+        with transaction.atomic():
+            stats, _ = TaskStats.objects.update_or_create(**kwargs, defaults=counts)
+        return stats
+    except IntegrityError:
+        pass
+    changes = _delta_updates(delta or {})
+    if changes:
+        TaskStats.objects.filter(**kwargs).update(**changes)
+        return TaskStats.objects.get(**kwargs)
+    with transaction.atomic():
+        stats = TaskStats.objects.select_for_update().get(**kwargs)
+        # После блокировки пересчёт видит и закоммиченное другим запросом, и правки этой транзакции
+        for name, value in compute_scope_counts(scope).items():
+            setattr(stats, name, value)
+        stats.save(update_fields=list(counts))
+    return stats
+
+
+def _apply(deltas: dict, rebuild_missing: bool = True) -> None:
+    for scope, counters in deltas.items():
+        changes = _delta_updates(counters)
+        if not changes:
+            continue
+        updated = TaskStats.objects.filter(**_scope_kwargs(scope)).update(**changes)
+        if not updated and rebuild_missing:
+            # Строки ещё нет (первое изменение в области) — считаем её целиком, уже с этой правкой
+            rebuild_scope(scope, counters)
+
+
+def _collect_saved(task: Task, created: bool, deltas: dict) -> list[Scope]:
+    """Добавить в deltas разницу состояний задачи; вернуть области, которые нужно пересчитать целиком."""
+    new_state = _state(_task_fields(task))
+    old_state = None
+    if not created:
+        loaded = getattr(task, '_loaded_values', None)
+        old_state = _state({**loaded, 'created_by': task.created_by_id}) if loaded is not None else None
+        if old_state is None:
+            # Прежнее состояние неизвестно — пересчитываем затронутые области целиком
+            return _scopes(new_state)
+        if old_state == new_state:
+            return []
+        _add_state(deltas, old_state, -1)
+    _add_state(deltas, new_state, 1)
+    return []
+
+
+def record_task_saved(task: Task, created: bool) -> None:
+    """Сдвинуть счётчики на разницу между загруженным и сохранённым состоянием задачи."""
+    record_tasks_saved([task], created=created)
+
+
+def record_tasks_saved(tasks, created: bool = False) -> None:
+    """То же для пачки задач (массовые операции): одно UPDATE на область вместо одного на задачу."""
+    deltas: dict = defaultdict(Counter)
+    rebuild: set = set()
+    for task in tasks:
+        rebuild.update(_collect_saved(task, created, deltas))
+    _apply({scope: counters for scope, counters in deltas.items() if scope not in rebuild})
+    for scope in sorted(rebuild):
+        rebuild_scope(scope)
+
+
+def record_task_deleted(task: Task) -> None:
+    loaded = getattr(task, '_loaded_values', None)
+    values = {**_task_fields(task), **(loaded or {}), 'created_by': task.created_by_id}
+    deltas: dict = defaultdict(Counter)
+    _add_state(deltas, _state(values), -1)
+    # При каскадном удалении проекта/пользователя строка счётчиков может быть уже удалена —
+    # не создаём её заново (иначе она будет ссылаться на удаляемый объект)
+    _apply(deltas, rebuild_missing=False)
+
+
+def get_scope_stats(scope: Scope) -> TaskStats:
+    """Счётчики области: одна выборка по уникальному ключу (при первом обращении — пересчёт)."""
+    stats = TaskStats.objects.filter(**_scope_kwargs(scope)).first()
+    return stats if stats is not None else rebuild_scope(scope)
+
+
+def get_task_stats(user) -> TaskStats:
+    return get_scope_stats(('user', user.pk))
+
+
+def get_project_stats(project) -> TaskStats:
+    return get_scope_stats(('project', project.pk))
+
+
+def _row_counts(stats: TaskStats) -> dict:
+    return {name: getattr(stats, name) for name in (*COUNTER_FIELDS, 'overdue')}
+
+
+def get_visible_counts(user) -> dict:
+    """Счётчики видимых задач (как в списке) из строк TaskStats, без агрегата по видимым задачам.
+
+    Строки проектов пользователя плюс его собственная минус пересечение — его задачи в этих
+    же проектах; пересечение считается запросом только по задачам пользователя (индексы
+    assigned_to/created_by), а не по задачам проектов.
+    """
+    project_ids = accessible_project_ids(user)
+    counts = _row_counts(get_task_stats(user))
+    if not project_ids:
+        return counts
+    rows = {stats.project_id: stats for stats in TaskStats.objects.filter(project_id__in=project_ids)}
+    for project_id in project_ids:
+        stats = rows.get(project_id) or rebuild_scope(('project', project_id))
+        for name, value in _row_counts(stats).items():
+            counts[name] += value
+    overlap = compute_counts((Q(assigned_to=user) | Q(created_by=user)) & Q(list_id__in=project_ids))
+    # Просрочка строк обновляется по расписанию, а пересечение — на сейчас: не уходим ниже нуля
+    return {name: max(value - overlap[name], 0) for name, value in counts.items()}
+
+
+def counts_payload(counts: dict) -> dict:
+    """Ответ /stats из счётчиков (и сохранённых, и посчитанных запросом — форма одна)."""
+    return {
+        'total': counts['total'],
+        'by_status': [
+            {'status': value, 'count': counts[field]}
+            for value, field in STATUS_FIELDS.items()
+            if counts[field]
+        ],
+        'by_priority': [
+            {'priority': value, 'count': counts[field]}
+            for value, field in PRIORITY_FIELDS.items()
+            if counts[field]
+        ],
+        'overdue': counts['overdue'],
+    }
+
+
+def stats_payload(stats: TaskStats) -> dict:
+    return counts_payload(_row_counts(stats))
+
+
+def refresh_overdue_counts(now=None) -> int:
+    """Пересчитать просрочку всех областей по частичному индексу открытых задач.
+
+    Возвращает число обновлённых строк счётчиков.
+    """
+    now = now or timezone.now()
+    overdue: Counter = Counter()
+    open_overdue = Task.objects.filter(is_completed=False, due_date__lt=now).order_by()
+    # Подсчёт в БД: по проекту, исполнителю и автору; задача, где исполнитель и автор совпадают,
+    # учитывается у пользователя один раз
+    for project_id, count in open_overdue.values_list('list_id').annotate(count=Count('id')):
+        overdue[('project', project_id)] = count
+    for user_id, count in open_overdue.exclude(assigned_to=None).values_list('assigned_to_id').annotate(count=Count('id')):
+        overdue[('user', user_id)] += count
+    created = open_overdue.exclude(assigned_to_id=F('created_by_id')).values_list('created_by_id').annotate(count=Count('id'))
+    for user_id, count in created:
+        overdue[('user', user_id)] += count
+
+    current = {
+        (('user', user_id) if user_id else ('project', project_id)): (pk, value)
+        for pk, user_id, project_id, value in TaskStats.objects.filter(
+            Q(overdue__gt=0) | Q(user_id__in=[pk for kind, pk in overdue if kind == 'user'])
+            | Q(project_id__in=[pk for kind, pk in overdue if kind == 'project'])
+        ).values_list('id', 'user_id', 'project_id', 'overdue')
+    }
+    updated = 0
+    by_value: dict[int, list[int]] = defaultdict(list)
+    for scope, (pk, value) in current.items():
+        if overdue.get(scope, 0) != value:
+            by_value[overdue.get(scope, 0)].append(pk)
+    for value, ids in by_value.items():
+        updated += TaskStats.objects.filter(id__in=ids).update(overdue=value)
+    missing = [scope for scope in overdue if scope not in current]
+    for scope in missing:
+        rebuild_scope(scope)
+    return updated + len(missing)
+
+
+def reconcile_task_stats() -> int:
+    """Полная сверка: пересобрать счётчики всех пользователей и проектов с задачами.
+
+    Строки областей без задач удаляются. Возвращает число пересчитанных областей.
+    """
+    user_ids = set(Task.objects.exclude(assigned_to=None).values_list('assigned_to_id', flat=True).distinct())
+    user_ids.update(Task.objects.values_list('created_by_id', flat=True).distinct())
+    project_ids = set(Task.objects.values_list('list_id', flat=True).distinct())
+    scopes = [('user', pk) for pk in sorted(user_ids)] + [('project', pk) for pk in sorted(project_ids)]
+    for scope in scopes:
+        rebuild_scope(scope)
+    TaskStats.objects.filter(
+        Q(user__isnull=False) & ~Q(user_id__in=user_ids)
+        | Q(project__isnull=False) & ~Q(project_id__in=project_ids)
+    ).delete()
+    return len(scopes)
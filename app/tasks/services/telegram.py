@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import math
+import os
+import threading
+import time
+
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+
+_client: httpx.Client | None = None
+_client_pid: int | None = None
+_client_lock = threading.Lock()
+
+
+def _build_client() -> httpx.Client:
+    http2 = getattr(settings, 'TELEGRAM_HTTP2', True) and importlib.util.find_spec('h2') is not None
+    return httpx.Client(
+        timeout=getattr(settings, 'TELEGRAM_HTTP_TIMEOUT', 5),
+        limits=httpx.Limits(
+            max_connections=getattr(settings, 'TELEGRAM_HTTP_MAX_CONNECTIONS', 20),
+            max_keepalive_connections=getattr(settings, 'TELEGRAM_HTTP_MAX_KEEPALIVE', 10),
+            keepalive_expiry=getattr(settings, 'TELEGRAM_HTTP_KEEPALIVE_EXPIRY', 60),
+        ),
+        http2=http2,
+    )
+
+
+def get_telegram_client() -> httpx.Client:
+    """Общий для процесса клиент Bot API: keep-alive пул и HTTP/2 (если установлен h2).
+
+    Пересоздаётся после fork (prefork-воркеры Celery не делят сокеты с родителем).
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = _build_client()
+                _client_pid = pid
+    return _client
+
+
+def close_telegram_client() -> None:
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def bot_api_url(token: str, method: str) -> str:
+    base = getattr(settings, 'TELEGRAM_API_BASE_URL', 'https://api.telegram.org').rstrip('/')
+    return f"{base}/bot{token}/{method}"
+
+
+def call_bot_api(token: str, method: str, payload: dict | None = None) -> httpx.Response:
+    return get_telegram_client().post(bot_api_url(token, method), json=payload or {})
+
+
+class TelegramRetryAfter(Exception):
+    """Telegram ответил 429: повторить отправку не раньше чем через retry_after секунд."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Flood control, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _token_key(token: str) -> str:
+    # В ключах кэша не храним сам токен
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+# Резервирование слота отправки одним EVAL: у токена — «теоретическое время прибытия» (GCRA, пачка до
+# TELEGRAM_RATE_PER_SECOND сообщений, дальше равномерно), у чата — время следующего свободного слота.
+# Значения — миллисекунды; ключи живут, пока слот в будущем.
+_RESERVE_SLOT_LUA = """
+    local now = tonumber(ARGV[1])
+    local token_interval = tonumber(ARGV[2])
+    local token_burst = tonumber(ARGV[3])
+    local chat_interval = tonumber(ARGV[4])
+    local blocked = tonumber(redis.call('GET', KEYS[3]) or '0')
+    local token_tat = math.max(now, blocked, tonumber(redis.call('GET', KEYS[1]) or '0'))
+    local chat_next = tonumber(redis.call('GET', KEYS[2]) or '0')
+    local slot = math.max(now, blocked, token_tat - token_burst, chat_next)
+    -- Сообщение, отложенное паузой чата, занимает позицию токена в момент своего слота, а не раньше
+    local next_tat = math.max(token_tat, slot) + token_interval
+    redis.call('SET', KEYS[1], next_tat, 'PX', next_tat - now + 1000)
+    redis.call('SET', KEYS[2], slot + chat_interval, 'PX', slot + chat_interval - now + 1000)
+    return slot
+"""
+_reserve_lock = threading.Lock()
+
+
+def _slot_params() -> tuple[int, int, int]:
+    token_interval = math.ceil(1000 / getattr(settings, 'TELEGRAM_RATE_PER_SECOND', 30))
+    chat_interval = int(getattr(settings, 'TELEGRAM_RATE_PER_CHAT_SECONDS', 1) * 1000)
+    return token_interval, max(1000 - token_interval, 0), chat_interval
+
+
+def _reserve_slot_locally(keys: list[str], now: int) -> int:
+    # Не-Redis кэш (разработка, тесты): та же логика под блокировкой процесса
+    token_interval, token_burst, chat_interval = _slot_params()
+    token_key, chat_key, cooldown_key = keys
+    with _reserve_lock:
+        blocked = cache.get(cooldown_key) or 0
+        token_tat = max(now, blocked, cache.get(token_key) or 0)
+        slot = max(now, blocked, token_tat - token_burst, cache.get(chat_key) or 0)
+        next_tat = max(token_tat, slot) + token_interval
+        cache.set(token_key, next_tat, timeout=(next_tat - now) // 1000 + 1)
+        cache.set(chat_key, slot + chat_interval, timeout=(slot + chat_interval - now) // 1000 + 1)
+    return slot
+
+
+def reserve_send_slot(token: str, chat_id) -> float:
+    """Планировщик исходящих сообщений, общий для всех воркеров (через кэш/Redis).
+
+    Атомарно резервирует ближайший свободный слот и возвращает, через сколько секунд в него отправить
+    (0 — сейчас). Лимиты: пауза после 429 для токена, TELEGRAM_RATE_PER_SECOND сообщений в секунду на
+    токен и одно сообщение в TELEGRAM_RATE_PER_CHAT_SECONDS на чат. Конкурирующие отправители получают
+    разные слоты, а не одну общую задержку.
+    """
+    token_key = _token_key(token)
+    keys = [f"tg:next:{token_key}", f"tg:chat:{token_key}:{chat_id}", f"tg:cooldown:{token_key}"]
+    now = int(time.time() * 1000)
+    client_for = getattr(getattr(cache, '_cache', None), 'get_client', None)
+    if client_for is not None:
+        redis_keys = [cache.make_key(key) for key in keys]
+        slot = int(client_for(redis_keys[0], write=True).eval(
+            _RESERVE_SLOT_LUA, len(redis_keys), *redis_keys, now, *_slot_params(),
+        ))
+    else:
+        slot = _reserve_slot_locally(keys, now)
+    return (slot - now) / 1000
+
+
+def block_token(token: str, retry_after: float) -> None:
+    until = int((time.time() + retry_after) * 1000)
+    cache.set(f"tg:cooldown:{_token_key(token)}", until, timeout=int(retry_after) + 1)
+
+
+def send_message(token: str, chat_id: str, text: str) -> httpx.Response:
+    response = call_bot_api(token, 'sendMessage', {
+        'chat_id': chat_id,
+        'text': text,
+    })
+    if response.status_code == 429:
+        try:
+            retry_after = float((response.json().get('parameters') or {}).get('retry_after') or 1)
+        except ValueError:
+            retry_after = 1.0
+        block_token(token, retry_after)
+        raise TelegramRetryAfter(retry_after)
+    response.raise_for_status()
+    return response
+
+
+def get_me(token: str) -> httpx.Response:
+    return call_bot_api(token, 'getMe')
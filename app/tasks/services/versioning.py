@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import time
+
+from django.core.cache import cache
+
+
+def get_version(key: str) -> int:
+    """Текущая версия (счётчик в кэше) для версионированных ключей кэша."""
+    version = cache.get(key)
+    if version is None:
+        # Отсчёт от времени: после вытеснения ключа старые записи не переиспользуются
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key) or int(time.time() * 1000)
+    return version
+
+
+def bump_version(*keys: str) -> None:
+    """Делает устаревшими все записи, построенные на прежних версиях ключей."""
+    for key in set(keys):
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Версии ещё нет — следующая запись и так будет построена заново
+            pass
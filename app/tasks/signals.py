@@ -1,34 +1,199 @@
 # tasks/signals.py
 import logging
 
-from .services.notifications import notify_channels, notify_telegram
-from django.db.models.signals import post_save
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from .models import Task
+from users.models import UserProfile
+
+from .models import Client, ProjectMember, Task, TaskEvent, TeamList
+from .services.bot_cache import BOT_PROJECTS, invalidate_bot_lists
+from .services.bot_events import BOT_EVENT_PERSONAL_BOT, publish_bot_event
+from .services.etags import invalidate_task_lists, invalidate_task_views
+from .services.notifications import notify_membership_changed
+from .services.permissions import invalidate_access_snapshot
+from .services.analytics import (
+    rollup_scopes_for_deleted_task, rollup_scopes_for_task, rollup_scopes_payload,
+)
+from .services.stats import record_task_deleted, record_task_saved
+from .tasks import rebuild_task_rollups, schedule_task_notifications
 
 logger = logging.getLogger(__name__)
 
 @receiver(post_save, sender=Task)
 def task_post_save_handler(sender, instance, created, **kwargs):
-    """Обработчик, вызываемый после сохранения задачи."""
-
-    try:
-        # WS-уведомление (всегда)
-        notify_channels(instance)
-        
-        # Проверяем что update_fields не None
-        update_fields = set(kwargs.get('update_fields') or [])
-        
-        # Telegram-уведомление (только при создании/назначении)
-        if created:
-            message = f"🚨 Новая задача назначена вам: '{instance.title}'! Срок: {instance.due_date.strftime('%d.%m %H:%M') if instance.due_date else 'Не установлен'}"
-            notify_telegram(instance, message)
-        elif instance.is_completed and update_fields.issubset({'is_completed', 'status', 'completed_at'}):
-            # Если задача завершена (или синхронизация статуса/даты завершения), не отправляем уведомление
-            pass
-        else:
-            message = f"🔄 Задача изменена: '{instance.title}'. Срок: {instance.due_date.strftime('%d.%m %H:%M') if instance.due_date else 'Не установлен'}"
-            notify_telegram(instance, message)
-            
-    except Exception as e:
-        logger.exception("Error in task_post_save_handler: %s", e)
+    """Обработчик, вызываемый после сохранения задачи.
+
+    Пишет событие в outbox (одна вставка в той же транзакции), а рендер и рассылка
+    WS/Telegram выполняются в Celery после коммита (с окном склейки частых правок).
+    Ошибку вставки не глотаем: без события в outbox откатывается и сама задача.
+    """
+    update_fields = kwargs.get('update_fields')
+    if created:
+        changed_fields = None
+    elif update_fields:
+        changed_fields = sorted(update_fields)
+    else:
+        changed_fields = instance.get_changed_fields()
+    TaskEvent.for_task(
+        instance,
+        TaskEvent.Kind.CREATED if created else TaskEvent.Kind.UPDATED,
+        changed_fields=changed_fields,
+    ).save()
+    task_id = instance.pk
+    transaction.on_commit(lambda: schedule_task_notifications(task_id), robust=True)
+
+
+@receiver(post_save, sender=Task)
+def task_stats_save_handler(sender, instance, created, **kwargs):
+    # В той же транзакции: счётчики откатываются вместе с задачей
+    record_task_saved(instance, created)
+
+
+@receiver(post_delete, sender=Task)
+def task_stats_delete_handler(sender, instance, **kwargs):
+    record_task_deleted(instance)
+
+
+def _rebuild_rollups_on_commit(scopes):
+    if scopes:
+        payload = rollup_scopes_payload(scopes)
+        transaction.on_commit(lambda: rebuild_task_rollups.delay(scopes=payload), robust=True)
+
+
+@receiver(post_save, sender=Task)
+def task_rollups_save_handler(sender, instance, created, **kwargs):
+    # Сводки аналитики меняются только при завершении/переоткрытии (или правке завершённой задачи);
+    # пересобираются лишь строки её проекта и исполнителя за затронутые дни
+    _rebuild_rollups_on_commit(rollup_scopes_for_task(instance, created))
+
+
+@receiver(post_delete, sender=Task)
+def task_rollups_delete_handler(sender, instance, **kwargs):
+    _rebuild_rollups_on_commit(rollup_scopes_for_deleted_task(instance))
+
+
+def _invalidate_bot_lists_on_commit(user_ids, **kwargs):
+    # После коммита: иначе параллельный запрос успеет закэшировать старые данные под новой версией
+    user_ids = set(user_ids)
+    transaction.on_commit(lambda: invalidate_bot_lists(*user_ids, **kwargs), robust=True)
+
+
+def _project_user_ids(projects) -> set:
+    user_ids = {project.created_by_id for project in projects}
+    user_ids.update(
+        ProjectMember.objects.filter(project__in=projects).values_list('user_id', flat=True)
+    )
+    return user_ids
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def task_list_versions_handler(sender, instance, **kwargs):
+    """Списки задач: в боте — исполнитель (в т.ч. прежний) и автор, в вебе — ещё участники проекта."""
+    loaded = getattr(instance, '_loaded_values', {})
+    owner_ids = {instance.assigned_to_id, instance.created_by_id, loaded.get('assigned_to')}
+    project_ids = {instance.list_id, loaded.get('list')} - {None}
+
+    transaction.on_commit(lambda: invalidate_task_views(owner_ids, project_ids), robust=True)
+
+
+@receiver(post_save, sender=TeamList)
+def project_bot_lists_handler(sender, instance, created, **kwargs):
+    # Название проекта входит и в списки задач (list_name)
+    user_ids = {instance.created_by_id} if created else _project_user_ids([instance])
+    _invalidate_bot_lists_on_commit(user_ids)
+    if not created:
+        transaction.on_commit(lambda: invalidate_task_lists(*user_ids), robust=True)
+
+
+@receiver(post_delete, sender=TeamList)
+def project_delete_bot_lists_handler(sender, instance, **kwargs):
+    # Участники и задачи удаляются каскадом и сбрасывают свои кэши сами
+    _invalidate_bot_lists_on_commit({instance.created_by_id}, scopes=(BOT_PROJECTS,))
+
+
+@receiver(post_save, sender=Client)
+def client_bot_lists_handler(sender, instance, created, **kwargs):
+    if created:
+        return
+    projects = list(TeamList.objects.filter(client=instance).only('id', 'created_by_id'))
+    if projects:
+        _invalidate_bot_lists_on_commit(_project_user_ids(projects), scopes=(BOT_PROJECTS,))
+
+
+@receiver(post_delete, sender=Task)
+def task_post_delete_handler(sender, instance, **kwargs):
+    """Надгробие в журнале изменений и WS-уведомление об удалении."""
+    TaskEvent.for_task(instance, TaskEvent.Kind.DELETED).save()
+    task_id = instance.pk
+    transaction.on_commit(lambda: schedule_task_notifications(task_id), robust=True)
+
+
+@receiver(post_save, sender=ProjectMember)
+def project_member_post_save_handler(sender, instance, **kwargs):
+    """Держит WS-подписки участника на группу проекта и кэш прав в актуальном состоянии."""
+    invalidate_access_snapshot(instance.user_id)
+    transaction.on_commit(
+        lambda: notify_membership_changed(instance.user_id, instance.project_id, instance.is_active),
+        robust=True,
+    )
+
+
+@receiver(post_delete, sender=ProjectMember)
+def project_member_post_delete_handler(sender, instance, **kwargs):
+    invalidate_access_snapshot(instance.user_id)
+    transaction.on_commit(
+        lambda: notify_membership_changed(instance.user_id, instance.project_id, False),
+        robust=True,
+    )
+
+
+@receiver(post_save, sender=get_user_model())
+def user_post_save_handler(sender, instance, **kwargs):
+    # is_staff/is_superuser читаются с объекта, но новый пользователь не должен
+    # унаследовать снимок с тем же id (например, после отката в тестах)
+    invalidate_access_snapshot(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_personal_bot_handler(sender, instance, **kwargs):
+    """Сообщает процессу бота о заданном/сброшенном личном боте (запуск/остановка polling на лету)."""
+    old_chat_id, old_token = getattr(instance, '_loaded_bot_binding', (None, None))
+    instance.remember_bot_binding()
+    if (old_chat_id, old_token) == (instance.telegram_chat_id, instance.personal_bot_token):
+        return
+    if not (old_token or instance.personal_bot_token):
+        return
+    # Токен в событие не кладём: бот перечитает его через API
+    chat_ids = sorted({chat_id for chat_id in (old_chat_id, instance.telegram_chat_id) if chat_id})
+    if chat_ids:
+        transaction.on_commit(
+            lambda: publish_bot_event(BOT_EVENT_PERSONAL_BOT, chat_ids=chat_ids),
+            robust=True,
+        )
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def user_groups_changed_handler(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сбрасывает кэш прав при изменении групп пользователя (признак администратора)."""
+    if action == 'pre_clear' and reverse:
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_access_snapshot(instance.pk)
+    elif action == 'post_clear':
+        invalidate_access_snapshot(*getattr(instance, '_cleared_user_ids', []))
+    else:
+        invalidate_access_snapshot(*(pk_set or []))
+
+
+@receiver(post_save, sender=Group)
+def group_post_save_handler(sender, instance, created, **kwargs):
+    # Переименование группы может добавить/убрать права администратора
+    if not created:
+        invalidate_access_snapshot(*instance.user_set.values_list('pk', flat=True))
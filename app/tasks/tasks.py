@@ -1,69 +1,398 @@
 from core.celery import app
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, OperationalError, transaction
 from django.utils import timezone
+from collections import defaultdict
+from contextlib import contextmanager
 from datetime import timedelta
 import httpx
 import os
 from django.db.models import Q
 
+from .services.bot_events import BOT_EVENT_NOTIFY, publish_bot_event
+from .services.telegram import TelegramRetryAfter, reserve_send_slot, send_message
+
 User = get_user_model()
 TELEGRAM_BOT_TOKEN = os.environ.get('TELEGRAM_BOT_TOKEN')
+# Ключ лимита для системного бота процесса бота, если TELEGRAM_BOT_TOKEN в Django не задан
+SYSTEM_BOT_RATE_KEY = 'system-bot'
+TASK_EVENT_SWEEP_DELAY_SECONDS = 60
+TASK_EVENT_CLAIM_SECONDS = 300
+TASK_EVENT_SWEEP_BATCH = 500
+TASK_EVENT_PURGE_BATCH = 5000
+TELEGRAM_SEND_MAX_RETRIES = 20
+DEADLINE_SCAN_BATCH = 500
 
 
-@app.task
-def send_telegram_notification(user_id, message):
-    """Отправка уведомления в Telegram через Bot API."""
+@app.task(bind=True, max_retries=TELEGRAM_SEND_MAX_RETRIES)
+def send_telegram_notification(self, user_id, message, prefer_personal_bot=False, slot_reserved=False):
+    """Отправка уведомления в Telegram через Bot API.
+
+    Все исходящие сообщения проходят через общий планировщик (лимиты на токен и чат): задача
+    откладывается ровно до зарезервированного ей слота (slot_reserved — слот уже за ней), такая отсрочка
+    не расходует max_retries. Повторы с лимитом — только после ответа 429.
+    При TELEGRAM_DELIVERY='bot' сообщение после резервирования слота передаётся процессу бота
+    через поток событий (если поток недоступен — отправляется напрямую).
+    """
     try:
-        if not TELEGRAM_BOT_TOKEN:
+        user = User.objects.select_related('profile').get(id=user_id)
+        profile = user.profile
+        use_personal = bool(prefer_personal_bot and profile.personal_bot_token)
+        chat_id = profile.telegram_chat_id
+        bot_token = profile.personal_bot_token if use_personal else TELEGRAM_BOT_TOKEN
+        via_bot = getattr(settings, 'TELEGRAM_DELIVERY', 'api') == 'bot'
+        if not bot_token and not via_bot:
             return "Telegram bot token is not configured."
-        user = User.objects.get(id=user_id)
-        chat_id = user.profile.telegram_chat_id
-        
-        if chat_id:
-            url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-            payload = {
-                'chat_id': chat_id,
-                'text': message,
-            }
-            # Используем httpx для асинхронного запроса, хотя Celery синхронный worker
-            # В данном контексте это просто HTTP-запрос
-            response = httpx.post(url, data=payload, timeout=5)
-            response.raise_for_status()
-            return f"Telegram notification sent to {user.username}"
-        else:
+        if not chat_id:
             return f"User {user.username} has no linked Telegram chat ID."
+
+        # Лимит общий для обоих путей: процесс бота отправляет тем же токеном
+        if not slot_reserved:
+            delay = reserve_send_slot(bot_token or SYSTEM_BOT_RATE_KEY, chat_id)
+            if delay:
+                self.apply_async(
+                    (user_id, message),
+                    {'prefer_personal_bot': prefer_personal_bot, 'slot_reserved': True},
+                    countdown=delay,
+                    retries=self.request.retries,
+                )
+                return f"Telegram notification for {user.username} scheduled in {delay:.2f}s"
+        if via_bot and publish_bot_event(BOT_EVENT_NOTIFY, chat_id=chat_id, text=message, personal=use_personal):
+            return f"Telegram notification for {user.username} handed over to the bot process"
+        if not bot_token:
+            return "Telegram bot token is not configured."
+        send_message(bot_token, chat_id, message)
+        return f"Telegram notification sent to {user.username}"
     except User.DoesNotExist:
         return "User not found."
+    except TelegramRetryAfter as e:
+        # Слот потерян: после паузы резервируем новый
+        raise self.retry(args=(user_id, message), kwargs={'prefer_personal_bot': prefer_personal_bot}, countdown=e.retry_after)
     except httpx.HTTPError as e:
         return f"Telegram API error: {e}"
 
 
+def _notification_window_key(task_id) -> str:
+    return f"task_notify_window:{task_id}"
+
+
+def _notification_pending_key(task_id) -> str:
+    return f"task_notify_pending:{task_id}"
+
+
+def schedule_task_notifications(task_id) -> None:
+    """Планирует рассылку по задаче (вызывается после коммита).
+
+    Первое изменение после паузы рассылается сразу. Следующие изменения в течение
+    TASK_NOTIFICATION_COALESCE_SECONDS копятся и уходят одним WS-пушем и одним сообщением
+    в Telegram в конце окна — задерживается только хвост серии правок.
+    """
+    window = getattr(settings, 'TASK_NOTIFICATION_COALESCE_SECONDS', 5)
+    if window <= 0 or cache.add(_notification_window_key(task_id), 1, timeout=window):
+        flush_task_notifications.delay(task_id)
+        return
+    if cache.add(_notification_pending_key(task_id), 1, timeout=window):
+        flush_task_notifications.apply_async((task_id,), countdown=window)
+
+
+def _claim_task_events(**filters) -> list:
+    """Забирает необработанные события outbox: короткая транзакция под блокировкой только отмечает
+    захват (claimed_at), рассылка идёт уже после коммита — без блокировок и открытой транзакции.
+
+    Захват истекает через TASK_EVENT_CLAIM_SECONDS: если воркер упал посреди рассылки, события
+    снова заберёт flush_task_events.
+    """
+    from .models import TaskEvent
+
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            TaskEvent.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - timedelta(seconds=TASK_EVENT_CLAIM_SECONDS)),
+                processed_at__isnull=True,
+                **filters,
+            )
+            .order_by('id')
+        )
+        if events:
+            TaskEvent.objects.filter(pk__in=[event.pk for event in events]).update(claimed_at=now)
+    return events
+
+
+@contextmanager
+def _dispatching(events):
+    """Помечает захваченные события обработанными после рассылки; при ошибке снимает захват,
+    чтобы их сразу мог повторить следующий запуск."""
+    from .models import TaskEvent
+
+    event_ids = [event.pk for event in events]
+    try:
+        yield
+    except Exception:
+        TaskEvent.objects.filter(pk__in=event_ids).update(claimed_at=None)
+        raise
+    TaskEvent.objects.filter(pk__in=event_ids).update(processed_at=timezone.now())
+
+
+@app.task
+def flush_task_notifications(task_id):
+    """Рассылает уведомления (WS + Telegram) по всем необработанным событиям задачи из outbox.
+
+    События помечаются обработанными только после успешной рассылки; при ошибке их повторит
+    flush_task_events.
+    """
+    from .models import Task, TaskEvent
+    from .services.notifications import notify_task_deleted, notify_task_events
+
+    # Снимаем флаг до чтения событий: новые изменения запланируют следующую рассылку
+    cache.delete(_notification_pending_key(task_id))
+
+    # Захват под блокировкой, чтобы sweep и отложенная рассылка не разослали события дважды
+    events = _claim_task_events(task_id=task_id)
+    if not events:
+        return "No pending events."
+
+    with _dispatching(events):
+        task = Task.objects.select_related('list', 'assigned_to__profile').filter(pk=task_id).first()
+        if task is not None:
+            notify_task_events(task, events)
+            return f"Dispatched {len(events)} events for task {task_id}."
+        deleted = [event for event in events if event.kind == TaskEvent.Kind.DELETED]
+        if deleted:
+            notify_task_deleted(task_id, deleted[-1].list_id)
+        return f"Dispatched deletion of task {task_id}." if deleted else "Task not found."
+
+
+@app.task
+def dispatch_bulk_task_notifications(task_ids):
+    """Уведомления по массовой операции — одно сообщение в Telegram на получателя.
+
+    Как и flush_task_notifications, захватывает события outbox задач и помечает их обработанными
+    после рассылки; если она не удалась или не запустилась, события дошлёт flush_task_events
+    (уже по одной задаче).
+    """
+    from .models import Task, TaskEvent
+    from .services.notifications import merge_task_events, notify_task_batch, notify_task_deleted
+
+    events = _claim_task_events(task_id__in=[int(task_id) for task_id in task_ids])
+    if not events:
+        return "No pending events."
+    events_by_task = defaultdict(list)
+    for event in events:
+        events_by_task[event.task_id].append(event)
+
+    with _dispatching(events):
+        tasks = list(
+            Task.objects.select_related('list', 'assigned_to__profile').filter(pk__in=list(events_by_task))
+        )
+        changes = {task.pk: merge_task_events(events_by_task[task.pk])[1] for task in tasks}
+        notify_task_batch(tasks, changes)
+        for task_id in events_by_task.keys() - changes.keys():
+            deleted = [event for event in events_by_task[task_id] if event.kind == TaskEvent.Kind.DELETED]
+            if deleted:
+                notify_task_deleted(task_id, deleted[-1].list_id)
+        return f"Dispatched bulk update of {len(changes)} tasks."
+
+
+@app.task(bind=True, max_retries=3, default_retry_delay=30)
+def write_task_audit(self, entries):
+    """Асинхронная запись пачки аудита (AUDIT_ASYNC).
+
+    Записи, не прошедшие проверки целостности, сразу уходят в AuditDeadLetter (повтор их не исправит);
+    прочие ошибки повторяются, после исчерпания повторов пачка тоже уходит в AuditDeadLetter.
+    """
+    from .services.audit import audit_entries, dead_letter_audit, dead_letter_failed, save_audit_entries
+
+    try:
+        failed = save_audit_entries(audit_entries(entries), resolve_refs=True)
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+        dead_letter_audit(entries, e)
+        return f"Dead-lettered {len(entries)} audit entries."
+    if failed:
+        dead_letter_failed(failed)
+    return f"Wrote {len(entries) - len(failed)} audit entries."
+
+
+@app.task
+def flush_task_events():
+    """Досылает события outbox, для которых не сработал on_commit (например, брокер был недоступен)."""
+    from .models import TaskEvent
+
+    stale_before = timezone.now() - timedelta(seconds=TASK_EVENT_SWEEP_DELAY_SECONDS)
+    task_ids = list(
+        TaskEvent.objects.filter(
+            processed_at__isnull=True,
+            created_at__lte=stale_before,
+        ).order_by('created_at').values_list('task_id', flat=True)[:TASK_EVENT_SWEEP_BATCH]
+    )
+    task_ids = list(dict.fromkeys(task_ids))
+    for task_id in task_ids:
+        flush_task_notifications.delay(task_id)
+    return f"Requeued events for {len(task_ids)} tasks."
+
+
+@app.task
+def purge_task_events():
+    """Удаляет обработанные события старше TASK_EVENT_RETENTION_DAYS (журнал для синхронизации)."""
+    from .models import TaskEvent
+    from .services.changes import mark_task_events_purged
+
+    retention_days = getattr(settings, 'TASK_EVENT_RETENTION_DAYS', 7)
+    purge_before = timezone.now() - timedelta(days=retention_days)
+    deleted = 0
+    while True:
+        rows = list(
+            TaskEvent.objects.filter(processed_at__isnull=False, created_at__lt=purge_before)
+            .order_by('id').values_list('txid', 'id')[:TASK_EVENT_PURGE_BATCH]
+        )
+        if not rows:
+            break
+        deleted += TaskEvent.objects.filter(pk__in=[event_id for _, event_id in rows]).delete()[0]
+        # Токены синхронизации до удалённых событий больше не годятся (в т.ч. «с начала журнала»)
+        mark_task_events_purged(max(rows))
+    return f"Purged {deleted} task events."
+
+
+@app.task
+def refresh_task_stats_overdue():
+    """Пересчёт просроченных задач в счётчиках /stats (остальные счётчики ведутся при сохранении)."""
+    from .services.stats import refresh_overdue_counts
+
+    updated = refresh_overdue_counts()
+    return f"Refreshed overdue counters for {updated} scopes."
+
+
+@app.task(autoretry_for=(IntegrityError, OperationalError), retry_backoff=True, max_retries=5)
+def rebuild_task_rollups(days=None, scopes=None, days_back=2):
+    """Пересборка сводок аналитики.
+
+    scopes — строки [день ISO, 'project' | 'assignee', id]: так их передают сигналы и массовые
+    операции после завершения/переоткрытия задач. days — дни ISO целиком. Без аргументов —
+    последние days_back дней (по расписанию: ежечасно вчера и сегодня, раз в сутки — глубже,
+    чтобы залечить дни, пересборка которых после коммита не дошла).
+    """
+    from datetime import date
+
+    from .services.analytics import rebuild_day, rebuild_rollup_scopes
+
+    if scopes is not None:
+        rows = rebuild_rollup_scopes((date.fromisoformat(day), kind, pk) for day, kind, pk in scopes)
+        return f"Rebuilt {rows} rollups for {len(scopes)} scopes."
+    if days is None:
+        today = timezone.localdate()
+        days = [today - timedelta(days=offset) for offset in range(days_back)]
+    else:
+        days = [date.fromisoformat(day) for day in days]
+    rows = sum(rebuild_day(day) for day in days)
+    return f"Rebuilt {rows} rollups for {len(days)} days."
+
+
+def _deadline_tiers(due_date, now):
+    """Уровни напоминаний, которые уже наступили для срока (по возрастанию серьёзности)."""
+    from .models import TaskReminder
+
+    tiers = [TaskReminder.Tier.DUE_SOON]
+    if due_date <= now:
+        tiers.append(TaskReminder.Tier.OVERDUE)
+    if due_date <= now - timedelta(days=1):
+        tiers.append(TaskReminder.Tier.OVERDUE_DAY)
+    return tiers
+
+
+def _deadline_text(title, tier, due_date, now):
+    from .models import TaskReminder
+
+    if tier == TaskReminder.Tier.OVERDUE_DAY:
+        return f"Задача '{title}' просрочена более суток!"
+    if tier == TaskReminder.Tier.OVERDUE:
+        return f"Задача '{title}' просрочена!"
+    return f"Задача '{title}' истекает через {int((due_date - now).total_seconds() // 60)} минут."
+
+
+def _claim_reminder(task_id, tier, due_date) -> bool:
+    """Записать напоминание в журнал; False — строку уже вставил другой запуск (или задачи нет).
+
+    Отправляет только тот, чья вставка прошла: чтение журнала перед этим лишь отсекает
+    заведомо отправленное, а гонку двух запусков решает уникальный ключ.
+    """
+    from .models import TaskReminder
+
+    try:
+        _, created = TaskReminder.objects.get_or_create(task_id=task_id, tier=tier, due_date=due_date)
+    except IntegrityError:
+        return False
+    return created
+
+
 @app.task
 def check_deadlines():
-    """Проверяет задачи, срок выполнения которых истекает, и отправляет уведомления."""
-    from .models import Task
-    
+    """Проверяет задачи, срок выполнения которых истекает, и отправляет уведомления.
+
+    Каждое напоминание (T-1ч / просрочена / просрочена более суток) уходит один раз —
+    это фиксирует журнал TaskReminder. Задачи читаются keyset-пачками по индексу
+    due_date, а напоминания группируются в один дайджест на пользователя.
+    Запрос идёт по частичному индексу открытых задач и возвращает кортежи, без моделей.
+    """
+    from .models import Task, TaskReminder
+    from .services.notifications import deadline_digest
+
     now = timezone.now()
     one_hour_later = now + timedelta(hours=1)
-    
-    # Невыполненные задачи, срок которых наступил ИЛИ истекает в течение 1 часа
+
+    # Невыполненные задачи с исполнителем, срок которых наступил ИЛИ истекает в течение 1 часа
     tasks_due = Task.objects.filter(
-        is_completed=False
-    ).filter(
-        Q(due_date__lte=now) | Q(due_date__range=(now, one_hour_later))
-    ).select_related('assigned_to')
-
-    for task in tasks_due:
-        # Уведомление об истечении срока (можно добавить флаг, чтобы не спамить)
-        message = f"🔴 Крайний срок! Задача '{task.title}' "
-        if task.due_date <= now:
-             message += "просрочена!"
-        else:
-             message += f"истекает через {int((task.due_date - now).total_seconds() // 60)} минут."
-             
-        send_telegram_notification.delay(task.assigned_to.id, message)
-    
-    return f"Checked {tasks_due.count()} deadlines."
+        is_completed=False,
+        assigned_to__isnull=False,
+        due_date__lte=one_hour_later,
+    ).order_by('due_date', 'id').values_list('id', 'title', 'due_date', 'assigned_to_id')
+
+    checked = 0
+    digests = defaultdict(list)
+    last_key = None
+    while True:
+        batch_qs = tasks_due
+        if last_key is not None:
+            last_due, last_id = last_key
+            batch_qs = batch_qs.filter(Q(due_date__gt=last_due) | Q(due_date=last_due, id__gt=last_id))
+        batch = list(batch_qs[:DEADLINE_SCAN_BATCH])
+        if not batch:
+            break
+        checked += len(batch)
+        last_key = (batch[-1][2], batch[-1][0])
+
+        sent = set(
+            TaskReminder.objects.filter(task_id__in=[task_id for task_id, *_ in batch])
+            .values_list('task_id', 'tier', 'due_date')
+        )
+        skipped_tiers = []
+        for task_id, title, due_date, assigned_to_id in batch:
+            tiers = _deadline_tiers(due_date, now)
+            # Шлём только самый серьёзный уровень; пропущенные младшие уровни просто отмечаем
+            if (task_id, tiers[-1], due_date) in sent:
+                continue
+            if not _claim_reminder(task_id, tiers[-1], due_date):
+                # Напоминание уже записал параллельный запуск — он его и отправит
+                continue
+            skipped_tiers.extend(
+                TaskReminder(task_id=task_id, tier=tier, due_date=due_date)
+                for tier in tiers[:-1]
+                if (task_id, tier, due_date) not in sent
+            )
+            digests[assigned_to_id].append(_deadline_text(title, tiers[-1], due_date, now))
+        TaskReminder.objects.bulk_create(skipped_tiers, ignore_conflicts=True)
+
+        if len(batch) < DEADLINE_SCAN_BATCH:
+            break
+
+    for user_id, lines in digests.items():
+        send_telegram_notification.delay(user_id, deadline_digest(lines))
+
+    return f"Checked {checked} deadlines, notified {len(digests)} users."
 
 # Настройка Celery Beat в settings.py
 # INSTALLED_APPS = ['django_celery_beat', ...]
@@ -0,0 +1,94 @@
+"""Локальный фейковый Telegram Bot API для тестов (HTTP-сервер в отдельном потоке)."""
+
+import json
+import re
+import threading
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import override_settings
+
+from tasks.services.telegram import close_telegram_client
+
+_PATH_RE = re.compile(r'^/bot(?P<token>[^/]+)/(?P<method>\w+)$')
+
+
+class FakeBotAPI:
+    """Записывает вызовы Bot API и отвечает `ok`; для метода можно поставить в очередь свой ответ."""
+
+    def __init__(self):
+        self.calls = []
+        self._responses = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeBotAPI':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def enqueue(self, method: str, status: int, body: dict) -> None:
+        with self._lock:
+            self._responses[method].append((status, body))
+
+    def calls_for(self, method: str):
+        return [call for call in self.calls if call['method'] == method]
+
+    def _respond(self, token: str, method: str, payload: dict):
+        with self._lock:
+            self.calls.append({'token': token, 'method': method, 'payload': payload})
+            if self._responses[method]:
+                return self._responses[method].popleft()
+        if method == 'getMe':
+            return 200, {'ok': True, 'result': {'id': 1, 'is_bot': True, 'username': 'fake_bot'}}
+        return 200, {'ok': True, 'result': {'message_id': len(self.calls)}}
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                match = _PATH_RE.match(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                if not match:
+                    status, body = 404, {'ok': False, 'description': 'Not Found'}
+                else:
+                    payload = json.loads(raw) if raw else {}
+                    status, body = fake._respond(match['token'], match['method'], payload)
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class FakeBotAPIMixin:
+    """Поднимает FakeBotAPI на время теста и направляет на него TELEGRAM_API_BASE_URL."""
+
+    def setUp(self):
+        super().setUp()
+        self.bot_api = FakeBotAPI().start()
+        close_telegram_client()
+        settings_override = override_settings(TELEGRAM_API_BASE_URL=self.bot_api.base_url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(self.bot_api.stop)
+        self.addCleanup(close_telegram_client)
@@ -0,0 +1,125 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from users.models import User
+from tasks.models import Task, TaskDailyRollup, TeamList
+from tasks.services.analytics import rebuild_day, rebuild_rollup_scopes
+
+
+class TaskRollupTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.executor = User.objects.create_user(username='executor', password='pass12345')
+        self.project = TeamList.objects.create(name='P1', created_by=self.owner)
+
+    def _completed(self, title, cycle_hours, estimate=None, actual=None, assigned_to=None):
+        now = timezone.now()
+        task = Task.objects.create(
+            title=title, list=self.project, created_by=self.owner, assigned_to=assigned_to,
+            status=Task.Status.DONE, estimate_hours=estimate, actual_hours=actual,
+        )
+        Task.objects.filter(pk=task.pk).update(started_at=now - timedelta(hours=cycle_hours), completed_at=now)
+        return task
+
+    def test_rebuild_day_materializes_project_and_assignee_rollups(self):
+        self._completed('T1', 2, estimate=Decimal('4'), actual=Decimal('6'), assigned_to=self.executor)
+        self._completed('T2', 4, assigned_to=self.executor)
+        self._completed('T3', 9)
+
+        self.assertEqual(rebuild_day(timezone.localdate()), 2)
+        project = TaskDailyRollup.objects.get(project=self.project)
+        self.assertEqual(project.completed_count, 3)
+        self.assertAlmostEqual(project.cycle_time_median_hours, 4, places=2)
+        self.assertEqual((project.estimate_hours, project.actual_hours), (Decimal('4'), Decimal('6')))
+        assignee = TaskDailyRollup.objects.get(assignee=self.executor)
+        self.assertEqual(assignee.completed_count, 2)
+        self.assertAlmostEqual(assignee.cycle_time_median_hours, 3, places=2)
+
+    def test_completion_and_reopen_rebuild_the_day(self):
+        task = Task.objects.create(title='T1', list=self.project, created_by=self.owner, assigned_to=self.executor)
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.get(pk=task.pk)
+            task.status = Task.Status.DONE
+            task.save()
+        self.assertEqual(TaskDailyRollup.objects.get(assignee=self.executor).completed_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.get(pk=task.pk)
+            task.status = Task.Status.IN_PROGRESS
+            task.save()
+        self.assertFalse(TaskDailyRollup.objects.exists())
+
+    def test_completion_rebuilds_only_its_scopes(self):
+        other_project = TeamList.objects.create(name='P2', created_by=self.owner)
+        today = timezone.localdate()
+        untouched = TaskDailyRollup.objects.create(day=today, project=other_project, completed_count=7)
+        task = Task.objects.create(title='T1', list=self.project, created_by=self.owner, assigned_to=self.executor)
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.get(pk=task.pk)
+            task.status = Task.Status.DONE
+            task.save()
+
+        untouched.refresh_from_db()
+        self.assertEqual(untouched.completed_count, 7)
+        self.assertEqual(TaskDailyRollup.objects.get(project=self.project).completed_count, 1)
+
+        # Перенос завершённой задачи пересобирает и прежний, и новый проект
+        with self.captureOnCommitCallbacks(execute=True):
+            task.list = other_project
+            task.save()
+        self.assertFalse(TaskDailyRollup.objects.filter(project=self.project).exists())
+        self.assertEqual(TaskDailyRollup.objects.get(project=other_project).completed_count, 1)
+
+    def test_scope_rebuild_keeps_other_rows_of_the_day(self):
+        self._completed('T1', 2, assigned_to=self.executor)
+        rebuild_day(timezone.localdate())
+        TaskDailyRollup.objects.filter(assignee=self.executor).update(completed_count=5)
+
+        rebuild_rollup_scopes([(timezone.localdate(), 'project', self.project.pk)])
+        self.assertEqual(TaskDailyRollup.objects.get(assignee=self.executor).completed_count, 5)
+        self.assertEqual(TaskDailyRollup.objects.get(project=self.project).completed_count, 1)
+
+
+class TaskAnalyticsApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bot_user', password='pass12345')
+        self.user.profile.telegram_chat_id = '123456'
+        self.user.profile.save()
+        self.other = User.objects.create_user(username='other', password='pass12345')
+        self.project = TeamList.objects.create(name='P1', created_by=self.user)
+        self.private = TeamList.objects.create(name='P2', created_by=self.other)
+        today = timezone.localdate()
+        TaskDailyRollup.objects.create(
+            day=today, project=self.project, completed_count=2,
+            cycle_time_samples=2, cycle_time_total_hours=10, cycle_time_median_hours=5,
+            estimated_count=1, estimate_hours=Decimal('2'), actual_hours=Decimal('3'),
+        )
+        TaskDailyRollup.objects.create(day=today - timedelta(days=40), project=self.project, completed_count=7)
+        TaskDailyRollup.objects.create(day=today, project=self.private, completed_count=5)
+        TaskDailyRollup.objects.create(day=today, assignee=self.user, completed_count=1)
+
+    def test_web_project_analytics(self):
+        self.client.login(username='bot_user', password='pass12345')
+        r = self.client.get('/api/v1/tasks/analytics/', {'project': self.project.pk})
+        self.assertEqual(r.status_code, 200)
+        data = r.json()
+        self.assertEqual((data['completed'], data['cycle_time_avg_hours'], data['estimate_ratio']), (2, 5.0, 1.5))
+        self.assertEqual(len(data['daily']), 1)
+
+        r = self.client.get('/api/v1/tasks/analytics/', {'project': self.private.pk})
+        self.assertEqual(r.status_code, 403)
+
+        r = self.client.get('/api/v1/tasks/analytics/', {'project': 'abc'})
+        self.assertEqual(r.status_code, 400)
+
+    def test_bot_analytics_covers_own_and_visible_projects(self):
+        r = self.client.get('/api/bot/analytics/', {'chat_id': '123456', 'days': 7})
+        self.assertEqual(r.status_code, 200)
+        data = r.json()
+        self.assertEqual(data['own']['completed'], 1)
+        self.assertEqual([item['project_name'] for item in data['projects']], ['P1'])
@@ -1,7 +1,8 @@
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 
-from tasks.models import TeamList, Task
+from tasks.models import ProjectMember, TeamList, Task
 
 User = get_user_model()
 
@@ -44,3 +45,59 @@ class TaskApiPermissionsTests(APITestCase):
         self.client.login(username='owner', password='pass12345')
         r = self.client.post(f'/api/v1/tasks/{task.id}/complete/')
         self.assertEqual(r.status_code, 200)
+
+    def test_list_includes_project_tasks_once(self):
+        ProjectMember.objects.create(project=self.project, user=self.other)
+        Task.objects.create(
+            title='T1',
+            list=self.project,
+            assigned_to=self.other,
+            created_by=self.other,
+        )
+        Task.objects.create(title='T2', list=self.project, created_by=self.owner)
+        private = TeamList.objects.create(name='P2', created_by=self.owner)
+        Task.objects.create(title='T3', list=private, created_by=self.owner)
+
+        self.client.login(username='other', password='pass12345')
+        r = self.client.get('/api/v1/tasks/')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(sorted(t['title'] for t in r.data['results']), ['T1', 'T2'])
+
+        # Веб-статистика — по тем же видимым задачам, что и список (свои и задачи проектов)
+        r = self.client.get('/api/v1/tasks/stats/')
+        self.assertEqual(r.data['total'], 2)
+        self.assertEqual(set(r.data), {'total', 'by_status', 'by_priority', 'overdue'})
+
+        r = self.client.get('/api/v1/tasks/stats/', {'project': self.project.pk})
+        self.assertEqual(r.data['total'], 2)
+        self.assertEqual(self.client.get('/api/v1/tasks/stats/', {'project': private.pk}).status_code, 403)
+        self.assertEqual(self.client.get('/api/v1/tasks/stats/', {'project': 'x'}).status_code, 400)
+
+
+class TaskApiETagTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='owner', password='pass12345')
+        self.project = TeamList.objects.create(name='P1', created_by=self.user)
+        self.task = Task.objects.create(title='T1', list=self.project, assigned_to=self.user, created_by=self.user)
+        self.client.login(username='owner', password='pass12345')
+
+    def test_list_not_modified_until_task_changes(self):
+        r = self.client.get('/api/v1/tasks/')
+        etag = r['ETag']
+        self.assertEqual(r['Cache-Control'], 'private, no-cache')
+
+        r = self.client.get('/api/v1/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.title = 'T2'
+            self.task.save()
+        r = self.client.get('/api/v1/tasks/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r['ETag'], etag)
+
+    def test_retrieve_not_modified(self):
+        r = self.client.get(f'/api/v1/tasks/{self.task.id}/')
+        r = self.client.get(f'/api/v1/tasks/{self.task.id}/', HTTP_IF_NONE_MATCH=r['ETag'])
+        self.assertEqual(r.status_code, 304)
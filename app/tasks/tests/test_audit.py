@@ -0,0 +1,94 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from users.models import User
+from tasks.models import AuditDeadLetter, Task, TaskAuditLog, TeamList
+from tasks.services.audit import audit_buffer, audit_payload, log_task_action
+from tasks.tasks import write_task_audit
+
+
+class TaskAuditWriterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='u1', password='pass12345')
+        self.project = TeamList.objects.create(name='P1', created_by=self.user)
+        self.task = Task.objects.create(title='T1', list=self.project, created_by=self.user, assigned_to=self.user)
+
+    def test_buffer_writes_committed_entries_in_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            with audit_buffer():
+                with self.captureOnCommitCallbacks(execute=True):
+                    log_task_action(self.task, self.user, TaskAuditLog.Action.UPDATED)
+                    log_task_action(self.task, self.user, TaskAuditLog.Action.COMPLETED)
+                self.assertFalse(TaskAuditLog.objects.exists())
+                flushed_from = len(queries.captured_queries)
+
+        # Кроме точки сохранения — только сам INSERT, без проверок ссылок
+        statements = [
+            q['sql'] for q in queries.captured_queries[flushed_from:]
+            if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))
+        ]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('INSERT INTO "tasks_taskauditlog"'))
+        self.assertEqual(TaskAuditLog.objects.count(), 2)
+
+    def test_rolled_back_action_is_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    log_task_action(self.task, self.user, TaskAuditLog.Action.UPDATED)
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertFalse(TaskAuditLog.objects.exists())
+
+    def test_failed_write_goes_to_dead_letter_and_replays(self):
+        with mock.patch.object(TaskAuditLog.objects, 'bulk_create', side_effect=DatabaseError('db down')), \
+                self.captureOnCommitCallbacks(execute=True):
+            log_task_action(self.task, self.user, TaskAuditLog.Action.COMPLETED, {'via': 'test'})
+
+        letter = AuditDeadLetter.objects.get()
+        self.assertIn('db down', letter.error)
+        self.assertFalse(TaskAuditLog.objects.exists())
+
+        call_command('replay_audit_dead_letters', stdout=StringIO())
+        letter.refresh_from_db()
+        self.assertIsNotNone(letter.replayed_at)
+        self.assertEqual(TaskAuditLog.objects.get().details, {'via': 'test'})
+
+    def test_deleted_task_does_not_fail_the_batch(self):
+        other = Task.objects.create(title='T2', list=self.project, created_by=self.user)
+        entries = [
+            TaskAuditLog(task=self.task, actor=self.user, action=TaskAuditLog.Action.UPDATED, created_at=self.task.created_at),
+            TaskAuditLog(task=other, actor=self.user, action=TaskAuditLog.Action.UPDATED, created_at=other.created_at),
+        ]
+        payload = audit_payload(entries)
+        other.delete()
+
+        with mock.patch.object(write_task_audit, 'retry') as retry:
+            write_task_audit.run(payload)
+        retry.assert_not_called()
+        self.assertEqual(list(TaskAuditLog.objects.values_list('task_id', flat=True)), [self.task.pk])
+        self.assertFalse(AuditDeadLetter.objects.exists())
+
+    @override_settings(AUDIT_ASYNC=True)
+    def test_async_mode_writes_through_celery(self):
+        with mock.patch('tasks.tasks.write_task_audit.delay', wraps=lambda payload: None) as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            log_task_action(self.task, self.user, TaskAuditLog.Action.COMPLETED)
+
+        payload, = delay.call_args.args
+        self.assertEqual(payload[0]['task_id'], self.task.pk)
+        self.assertFalse(TaskAuditLog.objects.exists())
+
+    def test_bot_complete_task_is_audited(self):
+        self.user.profile.telegram_chat_id = '555'
+        self.user.profile.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self.client.post('/api/bot/complete_task/', {'chat_id': '555', 'task_id': self.task.pk})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(TaskAuditLog.objects.get().action, TaskAuditLog.Action.COMPLETED)
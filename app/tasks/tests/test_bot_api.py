@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import TestCase
 from django.utils import timezone
 
@@ -44,8 +45,9 @@ class BotApiEndpointsTests(TestCase):
         r = self.client.get('/api/bot/get_user_tasks/', {'chat_id': self.profile.telegram_chat_id})
         self.assertEqual(r.status_code, 200)
         data = r.json()
-        self.assertEqual(len(data), 1)
-        self.assertEqual(data[0]['id'], self.task.id)
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(data['results'][0]['id'], self.task.id)
+        self.assertIsNone(data['next_cursor'])
 
     def test_bot_task_comment(self):
         r = self.client.post('/api/bot/task-comment/', {
@@ -62,7 +64,7 @@ class BotApiEndpointsTests(TestCase):
         r = self.client.get('/api/bot/today/', {'chat_id': self.profile.telegram_chat_id})
         self.assertEqual(r.status_code, 200)
         data = r.json()
-        self.assertTrue(len(data) >= 1)
+        self.assertTrue(len(data['results']) >= 1)
 
     def test_bot_project_set_status_requires_manager(self):
         r = self.client.post('/api/bot/project-set-status/', {
@@ -82,3 +84,153 @@ class BotApiEndpointsTests(TestCase):
             'status': TeamList.ProjectStatus.DONE,
         })
         self.assertEqual(r.status_code, 200)
+
+
+class BotListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bot_user', password='pass12345')
+        self.profile = self.user.profile
+        self.profile.telegram_chat_id = '123456'
+        self.profile.save()
+        self.project = TeamList.objects.create(name='P1', created_by=self.user)
+        self.task = Task.objects.create(
+            title='T1',
+            list=self.project,
+            assigned_to=self.user,
+            created_by=self.user,
+        )
+
+    def get_tasks(self):
+        r = self.client.get('/api/bot/get_user_tasks/', {'chat_id': self.profile.telegram_chat_id})
+        self.assertEqual(r.status_code, 200)
+        return [task['title'] for task in r.json()['results']]
+
+    def test_task_changes_invalidate_cached_list(self):
+        self.assertEqual(self.get_tasks(), ['T1'])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_tasks(), ['T1'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.status = Task.Status.DONE
+            self.task.save()
+        self.assertEqual(self.get_tasks(), [])
+
+    def test_projects_cache_keys_on_query(self):
+        TeamList.objects.create(name='Other', created_by=self.user)
+        r = self.client.get('/api/bot/projects/', {'chat_id': self.profile.telegram_chat_id, 'q': 'Other'})
+        self.assertEqual([p['name'] for p in r.json()['results']], ['Other'])
+
+        r = self.client.get('/api/bot/projects/', {'chat_id': self.profile.telegram_chat_id})
+        self.assertEqual(len(r.json()['results']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.name = 'P1 renamed'
+            self.project.save()
+        r = self.client.get('/api/bot/projects/', {'chat_id': self.profile.telegram_chat_id})
+        self.assertIn('P1 renamed', [p['name'] for p in r.json()['results']])
+
+    def test_task_detail_etag_tracks_comments(self):
+        params = {'chat_id': self.profile.telegram_chat_id, 'task_id': self.task.id}
+        etag = self.client.get('/api/bot/task/', params)['ETag']
+        r = self.client.get('/api/bot/task/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+        self.client.post('/api/bot/task-comment/', {**params, 'text': 'Test comment'})
+        r = self.client.get('/api/bot/task/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(r.json()['comments']), 1)
+
+
+class BotSessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bot_user', password='pass12345')
+        self.profile = self.user.profile
+        self.profile.telegram_chat_id = '123456'
+        self.profile.save()
+        self.project = TeamList.objects.create(name='P1', created_by=self.user)
+        self.task = Task.objects.create(title='T1', list=self.project, assigned_to=self.user, created_by=self.user)
+
+    def test_session_with_payload(self):
+        r = self.client.get('/api/bot/session/', {'chat_id': '123456', 'include': 'tasks'})
+        self.assertEqual(r.status_code, 200)
+        data = r.json()
+        self.assertTrue(data['linked'])
+        self.assertFalse(data['is_admin'])
+        self.assertFalse(data['personal_bot'])
+        self.assertEqual(data['payload_status'], 200)
+        self.assertEqual([t['id'] for t in data['payload']['results']], [self.task.id])
+
+    def test_session_passes_params_to_payload(self):
+        r = self.client.get('/api/bot/session/', {'chat_id': '123456', 'include': 'task', 'task_id': self.task.id})
+        self.assertEqual(r.json()['payload']['task']['id'], self.task.id)
+
+        r = self.client.get('/api/bot/session/', {'chat_id': '123456', 'include': 'project', 'project_id': 999999})
+        self.assertEqual(r.json()['payload_status'], 404)
+
+    def test_session_unlinked(self):
+        r = self.client.get('/api/bot/session/', {'chat_id': '000', 'include': 'tasks'})
+        self.assertEqual(r.json(), {'linked': False})
+
+    def test_session_etag_covers_chat_state_and_payload(self):
+        params = {'chat_id': '123456', 'include': 'task', 'task_id': self.task.id}
+        etag = self.client.get('/api/bot/session/', params)['ETag']
+        r = self.client.get('/api/bot/session/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+        self.profile.personal_bot_token = '123:abc'
+        self.profile.save()
+        r = self.client.get('/api/bot/session/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.json()['personal_bot'])
+
+
+class PersonalBotRosterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.profiles = []
+        for i in range(3):
+            user = User.objects.create_user(username=f'u{i}', password='pass12345')
+            profile = user.profile
+            profile.telegram_chat_id = str(100 + i)
+            profile.personal_bot_token = f'{i}:token'
+            profile.save()
+            self.profiles.append(profile)
+        User.objects.create_user(username='no_bot', password='pass12345')
+
+    def test_full_roster_is_paginated_by_cursor(self):
+        r = self.client.get('/api/bot/personal-bots/', {'page_size': 2})
+        self.assertEqual(r.status_code, 200)
+        first = r.json()
+        self.assertEqual([row['telegram_chat_id'] for row in first['results']], ['100', '101'])
+        self.assertIn('next_updated_since', first)
+
+        r = self.client.get('/api/bot/personal-bots/', {'page_size': 2, 'cursor': first['next_cursor']})
+        second = r.json()
+        self.assertEqual([row['telegram_chat_id'] for row in second['results']], ['102'])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_updated_since_returns_changes_including_removed_bots(self):
+        since = self.client.get('/api/bot/personal-bots/').json()['next_updated_since']
+        profile = self.profiles[1]
+        profile.personal_bot_token = None
+        profile.save()
+
+        r = self.client.get('/api/bot/personal-bots/', {'updated_since': since})
+        rows = r.json()['results']
+        self.assertIn({'chat': '101', 'token': None}, [
+            {'chat': row['telegram_chat_id'], 'token': row['personal_bot_token']} for row in rows
+        ])
+
+        self.assertEqual(self.client.get('/api/bot/personal-bots/', {'updated_since': 'bad'}).status_code, 400)
+
+    def test_unrelated_profile_save_keeps_timestamp(self):
+        profile = self.profiles[0]
+        profile.refresh_from_db()
+        stamp = profile.personal_bot_updated_at
+        profile.personal_bot_username = '@renamed'
+        profile.save()
+        profile.refresh_from_db()
+        self.assertEqual(profile.personal_bot_updated_at, stamp)
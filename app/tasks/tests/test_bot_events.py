@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from users.models import User, UserProfile
+from tasks.services.bot_events import BOT_EVENT_NOTIFY, BOT_EVENT_PERSONAL_BOT
+from tasks.tasks import send_telegram_notification
+from tasks.tests.fake_bot_api import FakeBotAPIMixin
+
+
+@mock.patch('tasks.signals.publish_bot_event')
+class PersonalBotEventTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='u1', password='pass12345')
+        self.profile = UserProfile.objects.get(user=self.user)
+        self.profile.telegram_chat_id = '555'
+        self.profile.save()
+
+    def test_token_set_and_cleared_publish_event(self, publish):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.personal_bot_token = '123:abc'
+            self.profile.save()
+        publish.assert_called_once_with(BOT_EVENT_PERSONAL_BOT, chat_ids=['555'])
+
+        publish.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = UserProfile.objects.get(pk=self.profile.pk)
+            profile.personal_bot_token = None
+            profile.save()
+        publish.assert_called_once_with(BOT_EVENT_PERSONAL_BOT, chat_ids=['555'])
+
+    def test_unrelated_saves_do_not_publish(self, publish):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Иван'
+            self.user.save()
+            profile = UserProfile.objects.get(pk=self.profile.pk)
+            profile.telegram_chat_id = '777'
+            profile.save()
+        publish.assert_not_called()
+
+    def test_chat_change_with_personal_bot_notifies_both_chats(self, publish):
+        self.profile.personal_bot_token = '123:abc'
+        self.profile.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = UserProfile.objects.get(pk=self.profile.pk)
+            profile.telegram_chat_id = '777'
+            profile.save()
+        publish.assert_called_once_with(BOT_EVENT_PERSONAL_BOT, chat_ids=['555', '777'])
+
+
+class BotDeliveryTests(FakeBotAPIMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username='u1', password='pass12345')
+        self.user.profile.telegram_chat_id = '555'
+        self.user.profile.save()
+
+    @override_settings(TELEGRAM_DELIVERY='bot')
+    @mock.patch('tasks.tasks.publish_bot_event', return_value=True)
+    def test_notification_is_handed_to_bot_process(self, publish):
+        send_telegram_notification(self.user.id, 'hello')
+
+        publish.assert_called_once_with(BOT_EVENT_NOTIFY, chat_id='555', text='hello', personal=False)
+        self.assertEqual(self.bot_api.calls_for('sendMessage'), [])
+
+    @override_settings(TELEGRAM_DELIVERY='bot')
+    @mock.patch('tasks.tasks.TELEGRAM_BOT_TOKEN', 'system-token')
+    @mock.patch('tasks.tasks.reserve_send_slot', return_value=0)
+    @mock.patch('tasks.tasks.publish_bot_event', return_value=False)
+    def test_falls_back_to_direct_send_when_stream_unavailable(self, _publish, _reserve):
+        send_telegram_notification(self.user.id, 'hello')
+
+        self.assertEqual(len(self.bot_api.calls_for('sendMessage')), 1)
+
+    @override_settings(TELEGRAM_DELIVERY='bot')
+    @mock.patch('tasks.tasks.publish_bot_event', return_value=True)
+    def test_bot_delivery_respects_rate_limit(self, publish):
+        send_telegram_notification(self.user.id, 'first')
+        with mock.patch.object(send_telegram_notification, 'apply_async') as defer:
+            send_telegram_notification(self.user.id, 'second')
+
+        self.assertGreater(defer.call_args.kwargs['countdown'], 0)
+        publish.assert_called_once_with(BOT_EVENT_NOTIFY, chat_id='555', text='first', personal=False)
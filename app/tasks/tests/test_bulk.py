@@ -0,0 +1,121 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from tasks.models import Task, TaskAuditLog, TaskEvent, TaskStats, TeamList
+
+User = get_user_model()
+
+
+class TaskBulkApiTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.executor = User.objects.create_user(username='executor', password='pass12345')
+        self.other = User.objects.create_user(username='other', password='pass12345')
+        self.project = TeamList.objects.create(name='P1', created_by=self.owner)
+        self.target = TeamList.objects.create(name='P2', created_by=self.owner)
+        self.client.login(username='owner', password='pass12345')
+
+    def _tasks(self, count):
+        return [
+            Task.objects.create(title=f'T{i}', list=self.project, created_by=self.owner, assigned_to=self.executor)
+            for i in range(count)
+        ]
+
+    def _post(self, operations):
+        return self.client.post('/api/v1/tasks/bulk/', {'operations': operations}, format='json')
+
+    def test_bulk_applies_operations_with_status_sync(self):
+        done, moved, reassigned = self._tasks(3)
+        with self.captureOnCommitCallbacks(execute=True):
+            r = self._post([
+                {'id': done.id, 'action': 'complete'},
+                {'id': moved.id, 'action': 'move', 'list': self.target.id},
+                {'id': moved.id, 'action': 'status', 'status': 'in_progress'},
+                {'id': reassigned.id, 'action': 'assign', 'assigned_to': self.owner.id},
+            ])
+        self.assertEqual(r.status_code, 200)
+
+        done.refresh_from_db()
+        moved.refresh_from_db()
+        reassigned.refresh_from_db()
+        self.assertEqual((done.status, done.is_completed), (Task.Status.DONE, True))
+        self.assertIsNotNone(done.completed_at)
+        self.assertEqual((moved.list_id, moved.status), (self.target.id, Task.Status.IN_PROGRESS))
+        self.assertIsNotNone(moved.started_at)
+        self.assertEqual(reassigned.assigned_to_id, self.owner.id)
+
+        self.assertEqual(TaskAuditLog.objects.filter(actor=self.owner).count(), 4)
+        self.assertEqual(TaskEvent.objects.filter(kind=TaskEvent.Kind.UPDATED, processed_at__isnull=False).count(), 3)
+        executor_stats = TaskStats.objects.get(user=self.executor)
+        self.assertEqual((executor_stats.total, executor_stats.status_done), (2, 1))
+        self.assertEqual(TaskStats.objects.get(project=self.target).status_in_progress, 1)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def run(tasks):
+            with CaptureQueriesContext(connection) as queries:
+                r = self._post([{'id': task.id, 'action': 'status', 'status': 'review'} for task in tasks])
+            self.assertEqual(r.status_code, 200)
+            return len(queries)
+
+        self.assertEqual(run(self._tasks(2)), run(self._tasks(10)))
+
+    def test_each_task_updates_only_its_own_fields(self):
+        completed, reassigned = self._tasks(2)
+        with CaptureQueriesContext(connection) as queries:
+            r = self._post([
+                {'id': completed.id, 'action': 'status', 'status': 'done'},
+                {'id': reassigned.id, 'action': 'assign', 'assigned_to': self.owner.id},
+            ])
+        self.assertEqual(r.status_code, 200)
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "tasks_task"')]
+        assign_update, = [sql for sql in updates if '"assigned_to_id" = CASE' in sql]
+        self.assertNotIn('"status" = CASE', assign_update)
+        self.assertNotIn('"completed_at" = CASE', assign_update)
+
+    def test_non_object_body_is_rejected(self):
+        r = self.client.post('/api/v1/tasks/bulk/', [{'id': 1, 'action': 'complete'}], format='json')
+        self.assertEqual(r.status_code, 400)
+
+    def test_batch_rejected_entirely_on_any_error(self):
+        own, = self._tasks(1)
+        foreign_project = TeamList.objects.create(name='P3', created_by=self.other)
+        foreign = Task.objects.create(title='F', list=foreign_project, created_by=self.other)
+
+        r = self._post([
+            {'id': own.id, 'action': 'complete'},
+            {'id': foreign.id, 'action': 'complete'},
+            {'id': own.id, 'action': 'status', 'status': 'unknown'},
+        ])
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual([error['index'] for error in r.data['errors']], [1, 2])
+        own.refresh_from_db()
+        self.assertFalse(own.is_completed)
+        self.assertFalse(TaskAuditLog.objects.exists())
+
+    def test_one_telegram_message_per_recipient(self):
+        tasks = self._tasks(3)
+        with mock.patch('tasks.services.notifications.send_telegram_notification.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            r = self._post([
+                {'id': task.id, 'action': 'status', 'status': 'review'} for task in tasks
+            ])
+        self.assertEqual(r.status_code, 200)
+        delay.assert_called_once()
+        user_id, text = delay.call_args.args
+        self.assertEqual(user_id, self.executor.id)
+        self.assertIn('Изменено задач: 3', text)
+
+    def test_lost_dispatch_leaves_events_for_sweep(self):
+        tasks = self._tasks(2)
+        TaskEvent.objects.update(processed_at=self.project.created_at)
+        with mock.patch('tasks.services.bulk.dispatch_bulk_task_notifications.delay', side_effect=ConnectionError), \
+                self.captureOnCommitCallbacks(execute=True):
+            r = self._post([{'id': task.id, 'action': 'complete'} for task in tasks])
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(TaskEvent.objects.filter(processed_at__isnull=True).count(), 2)
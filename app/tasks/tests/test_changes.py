@@ -0,0 +1,102 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.models import User
+from tasks.models import ProjectMember, TaskEvent, TeamList, Task
+from tasks.tasks import purge_task_events
+
+
+class TaskChangesTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='u1', password='pass12345')
+        self.other = User.objects.create_user(username='u2', password='pass12345')
+        self.project = TeamList.objects.create(name='P1', created_by=self.other)
+        self.private = TeamList.objects.create(name='P2', created_by=self.other)
+        ProjectMember.objects.create(project=self.project, user=self.user)
+        self.task = Task.objects.create(title='T1', list=self.project, created_by=self.other)
+        self.client.login(username='u1', password='pass12345')
+
+    def changes(self, since=None):
+        params = {'since': since} if since else {}
+        r = self.client.get('/api/v1/tasks/changes/', params)
+        self.assertEqual(r.status_code, 200)
+        return r.data
+
+    def test_changes_since_token(self):
+        start = self.changes()
+        self.assertTrue(start['reset'])
+
+        created = Task.objects.create(title='T2', list=self.project, created_by=self.other)
+        self.task.title = 'T1 edited'
+        self.task.save()
+        Task.objects.create(title='Hidden', list=self.private, created_by=self.other)
+
+        data = self.changes(start['token'])
+        self.assertFalse(data['reset'])
+        self.assertCountEqual([t['title'] for t in data['changed']], ['T2', 'T1 edited'])
+
+        moved_id, deleted_id = created.id, self.task.id
+        created.list = self.private
+        created.save()
+        self.task.delete()
+
+        data = self.changes(data['token'])
+        self.assertEqual(data['changed'], [])
+        self.assertCountEqual(data['removed'], [moved_id, deleted_id])
+
+        data = self.changes(data['token'])
+        self.assertEqual((data['changed'], data['removed']), ([], []))
+
+    def test_membership_change_requests_reset(self):
+        token = self.changes()['token']
+        ProjectMember.objects.create(project=self.private, user=self.user)
+        self.assertTrue(self.changes(token)['reset'])
+
+    def test_invalid_token_requests_reset(self):
+        self.assertTrue(self.changes('garbage')['reset'])
+
+    def test_foreign_events_are_not_listed(self):
+        token = self.changes()['token']
+        hidden = Task.objects.create(title='Hidden', list=self.private, created_by=self.other)
+        hidden.title = 'Hidden edited'
+        hidden.save()
+        hidden_id = hidden.id
+        hidden.delete()
+        reassigned = Task.objects.create(title='Mine', list=self.private, created_by=self.other, assigned_to=self.user)
+        reassigned.assigned_to = self.other
+        reassigned.save()
+
+        data = self.changes(token)
+        self.assertNotIn(hidden_id, data['removed'])
+        self.assertEqual(data['removed'], [reassigned.id])
+        # Токен всё равно доходит до головы журнала
+        self.assertEqual(data['token'], self.changes()['token'])
+
+    def test_late_commit_is_not_skipped(self):
+        token = self.changes()['token']
+        late = Task.objects.create(title='Late', list=self.project, created_by=self.other)
+        early = Task.objects.create(title='Early', list=self.project, created_by=self.other)
+        # Событие late вставлено раньше (меньший id), но его транзакция коммитится позже
+        TaskEvent.objects.filter(task_id=late.id).update(txid=20)
+        TaskEvent.objects.filter(task_id=early.id).update(txid=10)
+
+        with mock.patch('tasks.services.changes._commit_horizon', return_value=20):
+            data = self.changes(token)
+        self.assertEqual([t['title'] for t in data['changed']], ['Early'])
+
+        with mock.patch('tasks.services.changes._commit_horizon', return_value=21):
+            data = self.changes(data['token'])
+        self.assertEqual([t['title'] for t in data['changed']], ['Late'])
+
+    def test_token_from_log_start_resets_after_purge(self):
+        start = self.changes()['token']
+        self.assertFalse(self.changes('0-0.' + start.split('.')[1])['reset'])
+
+        TaskEvent.objects.update(processed_at=timezone.now(), created_at=timezone.now() - timedelta(days=30))
+        purge_task_events()
+        self.assertTrue(self.changes('0-0.' + start.split('.')[1])['reset'])
@@ -0,0 +1,71 @@
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.test import TransactionTestCase, override_settings
+
+from users.models import User
+from tasks.consumers import TaskConsumer
+from tasks.models import ProjectMember, TeamList
+from tasks.services.notifications import group_send_many
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class TaskConsumerProjectGroupsTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='u1', password='pass12345')
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.project = TeamList.objects.create(name='P1', created_by=self.owner)
+        self.member = ProjectMember.objects.create(project=self.project, user=self.user)
+
+    async def _connect(self):
+        communicator = WebsocketCommunicator(TaskConsumer.as_asgi(), '/ws/tasks/')
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def test_member_receives_project_publish(self):
+        async def scenario():
+            communicator = await self._connect()
+            await get_channel_layer().group_send(
+                f'project_{self.project.id}',
+                {'type': 'task_update', 'message': {'id': 1}},
+            )
+            payload = await communicator.receive_json_from()
+            self.assertEqual(payload['task'], {'id': 1})
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
+
+    def test_membership_event_unsubscribes(self):
+        async def scenario():
+            communicator = await self._connect()
+            layer = get_channel_layer()
+            await layer.group_send(
+                f'user_{self.user.id}',
+                {'type': 'project_membership', 'project_id': self.project.id, 'active': False},
+            )
+            await communicator.receive_nothing(timeout=0.1)
+            await layer.group_send(
+                f'project_{self.project.id}',
+                {'type': 'task_update', 'message': {'id': 1}},
+            )
+            self.assertTrue(await communicator.receive_nothing(timeout=0.2))
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
+
+    def test_copies_of_one_delivery_are_dropped(self):
+        async def scenario():
+            communicator = await self._connect()
+            # Канал и в user_, и в project_: слой без пайплайна доставит копию на каждую группу
+            await sync_to_async(group_send_many)(
+                [f'project_{self.project.id}', f'user_{self.user.id}'],
+                {'type': 'task_update', 'message': {'id': 1}},
+            )
+            payload = await communicator.receive_json_from()
+            self.assertEqual(payload['task'], {'id': 1})
+            self.assertTrue(await communicator.receive_nothing(timeout=0.2))
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
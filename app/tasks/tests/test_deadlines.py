@@ -0,0 +1,87 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from users.models import User
+from tasks.models import TeamList, Task, TaskReminder
+from tasks.tasks import check_deadlines
+
+
+class CheckDeadlinesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='u1', password='pass12345')
+        self.other = User.objects.create_user(username='u2', password='pass12345')
+        self.project = TeamList.objects.create(name='P1', created_by=self.user)
+        now = timezone.now()
+        self.overdue = Task.objects.create(
+            title='Overdue', list=self.project, assigned_to=self.user, created_by=self.user,
+            due_date=now - timedelta(hours=2),
+        )
+        self.soon = Task.objects.create(
+            title='Soon', list=self.project, assigned_to=self.user, created_by=self.user,
+            due_date=now + timedelta(minutes=30),
+        )
+        self.old = Task.objects.create(
+            title='Old', list=self.project, assigned_to=self.other, created_by=self.user,
+            due_date=now - timedelta(days=3),
+        )
+        Task.objects.create(
+            title='Unassigned', list=self.project, created_by=self.user,
+            due_date=now - timedelta(hours=1),
+        )
+        Task.objects.create(
+            title='Later', list=self.project, assigned_to=self.user, created_by=self.user,
+            due_date=now + timedelta(days=2),
+        )
+
+    @mock.patch('tasks.tasks.send_telegram_notification.delay')
+    def test_one_digest_per_user(self, delay):
+        check_deadlines()
+
+        self.assertEqual(delay.call_count, 2)
+        messages = {call.args[0]: call.args[1] for call in delay.call_args_list}
+        self.assertIn("'Overdue' просрочена!", messages[self.user.id])
+        self.assertIn("'Soon' истекает через", messages[self.user.id])
+        self.assertIn("'Old' просрочена более суток!", messages[self.other.id])
+
+    @mock.patch('tasks.tasks.send_telegram_notification.delay')
+    def test_reminders_are_sent_once(self, delay):
+        check_deadlines()
+        delay.reset_mock()
+
+        check_deadlines()
+        delay.assert_not_called()
+
+        tiers = set(TaskReminder.objects.filter(task=self.old).values_list('tier', flat=True))
+        self.assertEqual(tiers, {
+            TaskReminder.Tier.DUE_SOON,
+            TaskReminder.Tier.OVERDUE,
+            TaskReminder.Tier.OVERDUE_DAY,
+        })
+
+    @mock.patch('tasks.tasks.send_telegram_notification.delay')
+    def test_next_tier_is_sent_after_deadline_passes(self, delay):
+        check_deadlines()
+        delay.reset_mock()
+
+        with mock.patch('tasks.tasks.timezone.now', return_value=timezone.now() + timedelta(hours=1)):
+            check_deadlines()
+
+        delay.assert_called_once()
+        self.assertIn("'Soon' просрочена!", delay.call_args.args[1])
+
+    @mock.patch('tasks.tasks.send_telegram_notification.delay')
+    def test_reminders_claimed_by_concurrent_run_are_not_sent(self, delay):
+        # Параллельный запуск записал напоминания уже после того, как этот прочитал журнал
+        TaskReminder.objects.create(task=self.overdue, tier=TaskReminder.Tier.OVERDUE, due_date=self.overdue.due_date)
+        TaskReminder.objects.create(task=self.old, tier=TaskReminder.Tier.OVERDUE_DAY, due_date=self.old.due_date)
+        with mock.patch.object(TaskReminder.objects, 'filter', return_value=TaskReminder.objects.none()):
+            check_deadlines()
+
+        delay.assert_called_once()
+        user_id, text = delay.call_args.args
+        self.assertEqual(user_id, self.user.id)
+        self.assertIn("'Soon' истекает через", text)
+        self.assertNotIn("'Overdue'", text)
@@ -0,0 +1,80 @@
+import asyncio
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from tasks.services.notifications import (
+    DIGEST_MAX_LINES, _supports_redis_group_send_many, deadline_digest, group_send_many,
+)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class GroupSendManyTests(TestCase):
+    def test_delivers_one_payload_to_every_group(self):
+        layer = get_channel_layer()
+        channels = []
+        for user_id in (1, 2, 3):
+            channel = async_to_sync(layer.new_channel)()
+            async_to_sync(layer.group_add)(f'user_{user_id}', channel)
+            channels.append(channel)
+
+        group_send_many(['user_1', 'user_2', 'user_3', 'user_1'], {'type': 'task_update', 'message': {'id': 7}})
+
+        for channel in channels:
+            received = async_to_sync(layer.receive)(channel)
+            self.assertEqual(received['message'], {'id': 7})
+
+    def test_empty_group_list_is_noop(self):
+        group_send_many([], {'type': 'task_update', 'message': {}})
+
+    def test_overlapping_groups_get_separate_copies_with_one_delivery_id(self):
+        layer = get_channel_layer()
+        self.assertFalse(_supports_redis_group_send_many(layer))
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)('user_1', channel)
+        async_to_sync(layer.group_add)('project_1', channel)
+
+        group_send_many(['user_1', 'project_1'], {'type': 'task_update', 'message': {'id': 7}})
+
+        first = async_to_sync(layer.receive)(channel)
+        second = async_to_sync(layer.receive)(channel)
+        self.assertEqual(first['delivery_id'], second['delivery_id'])
+
+
+@override_settings(CHANNEL_LAYERS={'default': {
+    'BACKEND': 'channels_redis.core.RedisChannelLayer',
+    'CONFIG': {'hosts': [settings.REDIS_URL], 'prefix': 'test_group_send_many'},
+}})
+class RedisGroupSendManyTests(TestCase):
+    def test_pipeline_delivers_once_per_channel(self):
+        async def scenario():
+            layer = get_channel_layer()
+            # Пайплайн зависит от внутренних методов channels_redis: обновление версии должно это показать
+            self.assertTrue(_supports_redis_group_send_many(layer))
+            shared, other = await layer.new_channel(), await layer.new_channel()
+            await layer.group_add('user_1', shared)
+            await layer.group_add('project_1', shared)
+            await layer.group_add('project_1', other)
+            try:
+                await asyncio.to_thread(
+                    group_send_many, ['user_1', 'project_1'], {'type': 'task_update', 'message': {'id': 7}},
+                )
+                self.assertEqual((await layer.receive(shared))['message'], {'id': 7})
+                self.assertEqual((await layer.receive(other))['message'], {'id': 7})
+                with self.assertRaises(asyncio.TimeoutError):
+                    await asyncio.wait_for(layer.receive(shared), timeout=0.2)
+            finally:
+                await layer.flush()
+
+        async_to_sync(scenario)()
+
+
+class DigestTests(TestCase):
+    def test_single_line_and_overflow(self):
+        self.assertEqual(deadline_digest(['T1']), '🔴 Крайний срок! T1')
+        lines = [f'T{i}' for i in range(DIGEST_MAX_LINES + 2)]
+        text = deadline_digest(lines)
+        self.assertEqual(text.count('• '), DIGEST_MAX_LINES)
+        self.assertTrue(text.endswith('… и ещё 2'))
@@ -0,0 +1,157 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from users.models import User
+from tasks.models import TeamList, Task, TaskEvent
+from tasks.tasks import TASK_EVENT_CLAIM_SECONDS, flush_task_notifications
+
+
+class TaskOutboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='u1', password='pass12345')
+        self.project = TeamList.objects.create(name='P1', created_by=self.user)
+
+    def test_save_records_event_and_schedules_on_commit(self):
+        with mock.patch('tasks.tasks.flush_task_notifications.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                task = Task.objects.create(
+                    title='T1',
+                    list=self.project,
+                    assigned_to=self.user,
+                    created_by=self.user,
+                )
+            delay.assert_not_called()
+
+            event = TaskEvent.objects.get(task_id=task.id)
+            self.assertEqual(event.kind, TaskEvent.Kind.CREATED)
+            self.assertEqual(event.list_id, self.project.id)
+            self.assertIsNone(event.processed_at)
+
+            for callback in callbacks:
+                callback()
+            delay.assert_called_once_with(task.id)
+
+    def test_failed_outbox_insert_rolls_back_task(self):
+        with mock.patch.object(TaskEvent, 'save', side_effect=DatabaseError('outbox down')):
+            with self.assertRaises(DatabaseError):
+                with transaction.atomic():
+                    Task.objects.create(title='T1', list=self.project, created_by=self.user)
+
+        self.assertFalse(Task.objects.filter(title='T1').exists())
+
+    def test_flush_is_processed_once(self):
+        task = Task.objects.create(
+            title='T1',
+            list=self.project,
+            assigned_to=self.user,
+            created_by=self.user,
+        )
+
+        with mock.patch('tasks.services.notifications.notify_task_events') as notify:
+            flush_task_notifications(task.id)
+            flush_task_notifications(task.id)
+
+        notify.assert_called_once()
+        self.assertFalse(TaskEvent.objects.filter(task_id=task.id, processed_at__isnull=True).exists())
+
+    def test_failed_dispatch_keeps_events_pending(self):
+        task = Task.objects.create(
+            title='T1',
+            list=self.project,
+            assigned_to=self.user,
+            created_by=self.user,
+        )
+
+        with mock.patch('tasks.services.notifications.notify_task_events', side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                flush_task_notifications(task.id)
+        # Захват снят — повтор не ждёт его истечения
+        self.assertTrue(TaskEvent.objects.filter(task_id=task.id, processed_at__isnull=True, claimed_at=None).exists())
+
+        with mock.patch('tasks.services.notifications.notify_task_events') as notify:
+            flush_task_notifications(task.id)
+        notify.assert_called_once()
+        self.assertFalse(TaskEvent.objects.filter(task_id=task.id, processed_at__isnull=True).exists())
+
+    def test_claimed_events_are_skipped_until_claim_expires(self):
+        task = Task.objects.create(
+            title='T1',
+            list=self.project,
+            assigned_to=self.user,
+            created_by=self.user,
+        )
+        # Другой воркер взял события и рассылает их
+        TaskEvent.objects.update(claimed_at=timezone.now())
+
+        with mock.patch('tasks.services.notifications.notify_task_events') as notify:
+            self.assertEqual(flush_task_notifications(task.id), "No pending events.")
+        notify.assert_not_called()
+
+        # Воркер упал посреди рассылки — захват истёк
+        TaskEvent.objects.update(claimed_at=timezone.now() - timedelta(seconds=TASK_EVENT_CLAIM_SECONDS + 1))
+        with mock.patch('tasks.services.notifications.notify_task_events') as notify:
+            flush_task_notifications(task.id)
+        notify.assert_called_once()
+        self.assertFalse(TaskEvent.objects.filter(task_id=task.id, processed_at__isnull=True).exists())
+
+
+@override_settings(TASK_NOTIFICATION_COALESCE_SECONDS=30)
+class TaskNotificationCoalescingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='u1', password='pass12345')
+        self.project = TeamList.objects.create(name='P1', created_by=self.user)
+        self.task = Task.objects.create(
+            title='T1',
+            list=self.project,
+            assigned_to=self.user,
+            created_by=self.user,
+        )
+        TaskEvent.objects.update(processed_at=self.task.created_at)
+
+    def _flush_messages(self):
+        with mock.patch('tasks.services.notifications.notify_channels') as notify_channels, \
+                mock.patch('tasks.services.notifications.send_telegram_notification.delay') as delay:
+            flush_task_notifications(self.task.id)
+        notify_channels.assert_called_once()
+        return [call.args[1] for call in delay.call_args_list]
+
+    def test_first_edit_is_immediate_and_rapid_edits_are_merged(self):
+        task = Task.objects.get(pk=self.task.pk)
+        with mock.patch('tasks.tasks.flush_task_notifications.delay') as delay, \
+                mock.patch('tasks.tasks.flush_task_notifications.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                task.title = 'T2'
+                task.save()
+            delay.assert_called_once_with(self.task.id)
+            apply_async.assert_not_called()
+            self.assertIn('название', self._flush_messages()[0])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                task.priority = Task.Priority.HIGH
+                task.save()
+                task.description = 'D'
+                task.save()
+            delay.assert_called_once()
+            apply_async.assert_called_once_with((self.task.id,), countdown=30)
+
+        [message] = self._flush_messages()
+        self.assertIn("'T2'", message)
+        self.assertNotIn('название', message)
+        self.assertIn('приоритет', message)
+
+    def test_save_without_changes_sends_no_telegram(self):
+        task = Task.objects.get(pk=self.task.pk)
+        task.save()
+
+        with mock.patch('tasks.services.notifications.notify_channels'), \
+                mock.patch('tasks.services.notifications.send_telegram_notification.delay') as delay:
+            flush_task_notifications(self.task.id)
+
+        delay.assert_not_called()
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users.models import User
+from tasks.models import TeamList, Task
+
+
+class TaskKeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='u1', password='pass12345')
+        self.project = TeamList.objects.create(name='P1', created_by=self.user)
+        now = timezone.now()
+        # Одинаковые сроки и пустые сроки проверяют разрешение «ничьих» и NULL
+        due_dates = [now, now, now + timedelta(days=1), None, None, now - timedelta(days=1), None]
+        self.tasks = [
+            Task.objects.create(
+                title=f'T{i}',
+                list=self.project,
+                assigned_to=self.user,
+                created_by=self.user,
+                due_date=due,
+            )
+            for i, due in enumerate(due_dates)
+        ]
+        self.client.login(username='u1', password='pass12345')
+
+    def walk(self, url):
+        ids = []
+        while url:
+            r = self.client.get(url)
+            self.assertEqual(r.status_code, 200)
+            ids.extend(task['id'] for task in r.data['results'])
+            url = r.data['next']
+        return ids
+
+    def test_pages_cover_all_tasks_in_model_order(self):
+        never = timezone.now() + timedelta(days=365)
+        expected = sorted(
+            self.tasks,
+            key=lambda t: (t.due_date or never, -t.created_at.timestamp(), t.id),
+        )
+        self.assertEqual(self.walk('/api/v1/tasks/?page_size=2'), [t.id for t in expected])
+
+    def test_custom_ordering(self):
+        ids = self.walk('/api/v1/tasks/?page_size=3&ordering=-updated_at')
+        self.assertCountEqual(ids, [t.id for t in self.tasks])
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_no_count_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get('/api/v1/tasks/?page_size=2')
+        self.assertEqual(r.status_code, 200)
+        self.assertFalse(any('COUNT(' in q['sql'].upper() for q in ctx.captured_queries))
+
+    def test_invalid_cursor(self):
+        r = self.client.get('/api/v1/tasks/?cursor=garbage')
+        self.assertEqual(r.status_code, 404)
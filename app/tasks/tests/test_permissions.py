@@ -0,0 +1,75 @@
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.test import TestCase
+
+from users.models import User
+from tasks.models import ProjectMember, TeamList
+from tasks.services.permissions import (
+    get_access_version, is_admin_user, user_can_access_project, user_is_project_manager,
+)
+
+
+class AccessSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.member = User.objects.create_user(username='member', password='pass12345')
+        self.project = TeamList.objects.create(name='P1', created_by=self.owner)
+
+    def fresh_member(self):
+        # Новый объект пользователя — как в следующем запросе
+        return User.objects.get(pk=self.member.pk)
+
+    def test_snapshot_is_cached_between_requests(self):
+        ProjectMember.objects.create(project=self.project, user=self.member)
+        self.assertTrue(user_can_access_project(self.fresh_member(), self.project))
+
+        member = self.fresh_member()
+        with self.assertNumQueries(0):
+            self.assertTrue(user_can_access_project(member, self.project))
+            self.assertFalse(user_is_project_manager(member, self.project))
+            self.assertFalse(is_admin_user(member))
+
+    def test_membership_changes_invalidate_snapshot(self):
+        self.assertFalse(user_can_access_project(self.fresh_member(), self.project))
+
+        ProjectMember.objects.create(project=self.project, user=self.member)
+        self.assertTrue(user_can_access_project(self.fresh_member(), self.project))
+
+        ProjectMember.objects.filter(project=self.project, user=self.member).update(
+            role=ProjectMember.Role.MANAGER
+        )
+        self.assertTrue(user_is_project_manager(self.fresh_member(), self.project))
+
+        ProjectMember.objects.filter(project=self.project, user=self.member).delete()
+        self.assertFalse(user_can_access_project(self.fresh_member(), self.project))
+
+    def test_request_memo_follows_own_membership_change(self):
+        member = self.fresh_member()
+        self.assertFalse(user_can_access_project(member, self.project))
+
+        # Тот же объект пользователя (тот же запрос) после вступления в проект
+        ProjectMember.objects.create(project=self.project, user=self.member)
+        self.assertTrue(user_can_access_project(member, self.project))
+
+        ProjectMember.objects.filter(project=self.project, user=self.member).delete()
+        self.assertFalse(user_can_access_project(member, self.project))
+
+    def test_snapshot_cached_before_commit_is_dropped(self):
+        member = ProjectMember.objects.create(project=self.project, user=self.member)
+        with self.captureOnCommitCallbacks(execute=True):
+            member.delete()
+            # Параллельный запрос собрал снимок по ещё не закоммиченному состоянию
+            key = f"access_snapshot:{self.member.pk}:{get_access_version(self.member.pk)}"
+            cache.set(key, {'in_admin_group': False, 'projects': {self.project.pk: member.role}})
+        self.assertFalse(user_can_access_project(self.fresh_member(), self.project))
+
+    def test_group_changes_invalidate_snapshot(self):
+        self.assertFalse(is_admin_user(self.fresh_member()))
+
+        admins = Group.objects.create(name='Admins')
+        self.member.groups.add(admins)
+        self.assertTrue(is_admin_user(self.fresh_member()))
+
+        admins.user_set.clear()
+        self.assertFalse(is_admin_user(self.fresh_member()))
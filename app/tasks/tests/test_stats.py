@@ -0,0 +1,137 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+from django.utils import timezone
+
+from users.models import User
+from tasks.models import ProjectMember, Task, TaskStats, TeamList
+from tasks.services.permissions import visible_tasks_q
+from tasks.services.stats import (
+    compute_counts, compute_scope_counts, get_visible_counts, rebuild_scope, refresh_overdue_counts,
+)
+
+
+class TaskStatsCounterTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.executor = User.objects.create_user(username='executor', password='pass12345')
+        self.project = TeamList.objects.create(name='P1', created_by=self.owner)
+
+    def assertCountersMatch(self, *scopes):
+        for scope in scopes:
+            kind, pk = scope
+            stats = TaskStats.objects.get(**{f'{kind}_id': pk})
+            expected = compute_scope_counts(scope)
+            expected.pop('overdue')
+            actual = {name: getattr(stats, name) for name in expected}
+            self.assertEqual(actual, expected, scope)
+
+    def test_counters_follow_task_changes(self):
+        task = Task.objects.create(title='T1', list=self.project, created_by=self.owner)
+        Task.objects.create(
+            title='T2', list=self.project, created_by=self.owner,
+            assigned_to=self.executor, priority=Task.Priority.HIGH,
+        )
+        stats = TaskStats.objects.get(user=self.owner)
+        self.assertEqual((stats.total, stats.status_new, stats.priority_high), (2, 2, 1))
+
+        task = Task.objects.get(pk=task.pk)
+        task.assigned_to = self.executor
+        task.status = Task.Status.DONE
+        task.save()
+        self.assertCountersMatch(('user', self.owner.pk), ('user', self.executor.pk), ('project', self.project.pk))
+        self.assertEqual(TaskStats.objects.get(user=self.executor).status_done, 1)
+
+        Task.objects.get(pk=task.pk).delete()
+        self.assertCountersMatch(('user', self.owner.pk), ('user', self.executor.pk), ('project', self.project.pk))
+
+    def test_visible_counts_from_rows_match_visible_tasks(self):
+        private = TeamList.objects.create(name='P2', created_by=self.owner)
+        empty = TeamList.objects.create(name='P3', created_by=self.owner)
+        ProjectMember.objects.create(project=self.project, user=self.executor)
+        ProjectMember.objects.create(project=empty, user=self.executor)
+        now = timezone.now()
+        # Своя задача в своём проекте (пересечение), чужая в проекте, своя вне проектов и недоступная
+        Task.objects.create(
+            title='T1', list=self.project, created_by=self.owner, assigned_to=self.executor,
+            priority=Task.Priority.HIGH, due_date=now - timedelta(hours=1),
+        )
+        Task.objects.create(title='T2', list=self.project, created_by=self.owner, status=Task.Status.DONE)
+        Task.objects.create(title='T3', list=private, created_by=self.owner, assigned_to=self.executor)
+        Task.objects.create(title='T4', list=private, created_by=self.owner)
+        refresh_overdue_counts()
+
+        counts = get_visible_counts(self.executor)
+        self.assertEqual(counts, compute_counts(visible_tasks_q(self.executor)))
+        self.assertEqual((counts['total'], counts['overdue']), (3, 1))
+        # Строка пустого проекта создана при первом обращении: дальше — строки и пересечение
+        with self.assertNumQueries(3):
+            self.assertEqual(get_visible_counts(self.executor), counts)
+
+    def test_project_delete_does_not_recreate_counters(self):
+        Task.objects.create(title='T1', list=self.project, created_by=self.owner, assigned_to=self.executor)
+        project_id = self.project.pk
+        self.project.delete()
+
+        self.assertFalse(TaskStats.objects.filter(project_id=project_id).exists())
+        self.assertEqual(TaskStats.objects.get(user=self.executor).total, 0)
+
+    def test_overdue_refresh_and_reconcile(self):
+        now = timezone.now()
+        Task.objects.create(title='T1', list=self.project, created_by=self.owner, due_date=now - timedelta(hours=1))
+        Task.objects.create(title='T2', list=self.project, created_by=self.owner, due_date=now + timedelta(hours=1))
+        # Сохранение задачи просрочку не двигает: она устаревает, пока её не пересчитают
+        TaskStats.objects.update(overdue=0)
+
+        refresh_overdue_counts()
+        self.assertEqual(TaskStats.objects.get(user=self.owner).overdue, 1)
+        self.assertEqual(TaskStats.objects.get(project=self.project).overdue, 1)
+
+        # Правки в обход save() (update) исправляет сверка
+        Task.objects.update(status=Task.Status.REVIEW)
+        call_command('reconcile_task_stats', stdout=StringIO())
+        stats = TaskStats.objects.get(user=self.owner)
+        self.assertEqual((stats.status_new, stats.status_review), (0, 2))
+
+    def test_concurrent_row_creation_keeps_this_transaction_delta(self):
+        Task.objects.create(title='T1', list=self.project, created_by=self.owner)
+        Task.objects.create(title='T2', list=self.project, created_by=self.owner)
+        # Строку создал параллельный запрос, не видевший вторую задачу этой транзакции
+        TaskStats.objects.filter(user=self.owner).update(total=1, status_new=1, priority_medium=1)
+
+        with mock.patch.object(TaskStats.objects, 'update_or_create', side_effect=IntegrityError):
+            rebuild_scope(('user', self.owner.pk), {'total': 1, 'status_new': 1, 'priority_medium': 1})
+        self.assertCountersMatch(('user', self.owner.pk))
+
+
+class TaskStatsApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bot_user', password='pass12345')
+        self.user.profile.telegram_chat_id = '123456'
+        self.user.profile.save()
+        self.project = TeamList.objects.create(name='P1', created_by=self.user)
+        Task.objects.create(title='T1', list=self.project, created_by=self.user)
+        Task.objects.create(title='T2', list=self.project, created_by=self.user, status=Task.Status.IN_PROGRESS)
+
+    def test_bot_stats_read_counters(self):
+        # Строка создаётся при первом изменении; удаляем, чтобы проверить пересчёт при чтении
+        TaskStats.objects.all().delete()
+
+        r = self.client.get('/api/bot/stats/', {'chat_id': '123456'})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()['total'], 2)
+        self.assertEqual(
+            r.json()['by_status'],
+            [{'status': 'new', 'count': 1}, {'status': 'in_progress', 'count': 1}],
+        )
+
+        # Дальше /stats отдаёт сохранённые счётчики, не считая задачи
+        TaskStats.objects.filter(user=self.user).update(total=99)
+        r = self.client.get('/api/bot/stats/', {'chat_id': '123456'})
+        self.assertEqual(r.json()['total'], 99)
@@ -0,0 +1,119 @@
+from unittest import mock
+
+from celery.exceptions import Retry
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from users.models import User
+from tasks.services.telegram import get_telegram_client, reserve_send_slot
+from tasks.tasks import send_telegram_notification
+from tasks.tests.fake_bot_api import FakeBotAPIMixin
+
+
+class TelegramClientTests(FakeBotAPIMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username='u1', password='pass12345')
+        self.user.profile.telegram_chat_id = '555'
+        self.user.profile.save()
+
+    @mock.patch('tasks.tasks.TELEGRAM_BOT_TOKEN', 'system-token')
+    @mock.patch('tasks.tasks.reserve_send_slot', return_value=0)
+    def test_system_notification_goes_through_shared_client(self, _reserve):
+        client = get_telegram_client()
+        send_telegram_notification(self.user.id, 'first')
+        send_telegram_notification(self.user.id, 'second')
+
+        self.assertIs(get_telegram_client(), client)
+        calls = self.bot_api.calls_for('sendMessage')
+        self.assertEqual([call['payload']['text'] for call in calls], ['first', 'second'])
+        self.assertEqual(calls[0]['token'], 'system-token')
+        self.assertEqual(calls[0]['payload']['chat_id'], '555')
+
+    def test_personal_bot_token_is_validated_via_get_me(self):
+        self.client.login(username='u1', password='pass12345')
+        r = self.client.post('/api/v1/tasks/personal-bot/', {'token': '123:abc'}, format='json')
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()['username'], '@fake_bot')
+        self.assertEqual(self.bot_api.calls_for('getMe')[0]['token'], '123:abc')
+
+
+class TelegramRateLimitTests(FakeBotAPIMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = User.objects.create_user(username='u1', password='pass12345')
+        self.user.profile.telegram_chat_id = '555'
+        self.user.profile.save()
+
+    def test_one_message_per_chat_per_interval(self):
+        with mock.patch('tasks.services.telegram.time.time', return_value=1000.0):
+            self.assertEqual(reserve_send_slot('token', '1'), 0)
+            self.assertEqual(reserve_send_slot('token', '1'), 1.0)
+            # Другой чат ждёт только интервала токена (за отложенным сообщением), не паузы чата '1'
+            self.assertAlmostEqual(reserve_send_slot('token', '2'), 0.068)
+            self.assertEqual(reserve_send_slot('other-token', '1'), 0)
+
+    @override_settings(TELEGRAM_RATE_PER_SECOND=2)
+    def test_per_token_rate(self):
+        with mock.patch('tasks.services.telegram.time.time', return_value=1000.25):
+            self.assertEqual(reserve_send_slot('token', '1'), 0)
+            self.assertEqual(reserve_send_slot('token', '2'), 0)
+            # Пачка в пределах лимита — сразу, дальше равномерно по 1/TELEGRAM_RATE_PER_SECOND
+            self.assertAlmostEqual(reserve_send_slot('token', '3'), 0.5)
+            self.assertAlmostEqual(reserve_send_slot('token', '4'), 1.0)
+
+    @override_settings(TELEGRAM_RATE_PER_SECOND=2)
+    def test_chat_delayed_messages_count_against_token_at_their_slot(self):
+        with mock.patch('tasks.services.telegram.time.time', return_value=1000.0):
+            busy = [reserve_send_slot('token', '1') for _ in range(3)]
+        self.assertEqual(busy, [0, 1.0, 2.0])
+
+        # К моменту третьего сообщения занятого чата: вместе с ним — не больше пачки токена
+        with mock.patch('tasks.services.telegram.time.time', return_value=1002.0):
+            fresh = [reserve_send_slot('token', chat_id) for chat_id in ('2', '3', '4')]
+        self.assertEqual(fresh, [0, 0.5, 1.0])
+
+    def test_competing_senders_get_staggered_slots(self):
+        with mock.patch('tasks.services.telegram.time.time', return_value=1000.0):
+            delays = [reserve_send_slot('token', '1') for _ in range(3)]
+        self.assertEqual(delays, [0, 1.0, 2.0])
+
+    @mock.patch('tasks.tasks.TELEGRAM_BOT_TOKEN', 'system-token')
+    def test_pacing_deferral_does_not_use_retries(self):
+        reserve_send_slot('system-token', '555')
+        with mock.patch.object(send_telegram_notification, 'apply_async') as defer, \
+                mock.patch.object(send_telegram_notification, 'retry') as retry:
+            send_telegram_notification(self.user.id, 'hello')
+
+        retry.assert_not_called()
+        self.assertAlmostEqual(defer.call_args.kwargs['countdown'], 1.0, places=1)
+        self.assertEqual(defer.call_args.args[1], {'prefer_personal_bot': False, 'slot_reserved': True})
+
+        send_telegram_notification(self.user.id, 'hello', slot_reserved=True)
+        self.assertEqual(len(self.bot_api.calls_for('sendMessage')), 1)
+
+    @mock.patch('tasks.tasks.TELEGRAM_BOT_TOKEN', 'system-token')
+    def test_429_schedules_retry_at_server_delay(self):
+        self.bot_api.enqueue('sendMessage', 429, {
+            'ok': False,
+            'error_code': 429,
+            'parameters': {'retry_after': 7},
+        })
+        with mock.patch.object(send_telegram_notification, 'retry', side_effect=Retry()) as retry:
+            with self.assertRaises(Retry):
+                send_telegram_notification(self.user.id, 'hello')
+
+        self.assertEqual(retry.call_args.kwargs['countdown'], 7)
+        self.assertGreater(reserve_send_slot('system-token', '999'), 6)
+
+    @mock.patch('tasks.tasks.TELEGRAM_BOT_TOKEN', 'system-token')
+    def test_personal_bot_is_used_when_preferred(self):
+        self.user.profile.personal_bot_token = 'personal-token'
+        self.user.profile.save()
+
+        send_telegram_notification(self.user.id, 'hello', prefer_personal_bot=True)
+
+        self.assertEqual(self.bot_api.calls_for('sendMessage')[0]['token'], 'personal-token')
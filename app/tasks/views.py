@@ -5,29 +5,58 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from rest_framework.throttling import ScopedRateThrottle
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import APIException, PermissionDenied
 from django.db import models
 import uuid
 from django.db.models import Q
 from django.utils import timezone
-from datetime import datetime, time
-
-from .models import Client, ProjectMember, Task, TaskComment, TeamList, TaskAuditLog
-from .serializers import ProjectSerializer, TaskCommentSerializer, TaskSerializer, TaskAuditLogSerializer
+from django.utils.dateparse import parse_datetime
+from datetime import datetime, time, timedelta
+
+from .pagination import KeysetPagination, RosterPagination
+from .models import Client, ProjectMember, Task, TaskComment, TaskDailyRollup, TeamList, TaskAuditLog
+from .serializers import (
+    ProjectSerializer,
+    TaskAuditLogSerializer,
+    TaskCommentSerializer,
+    TaskSerializer,
+    UserProfileSerializer,
+)
 from .services.permissions import (
     is_admin_user,
+    visible_projects_q,
+    visible_tasks_q,
     user_can_access_project,
     user_is_project_manager,
     can_edit_task,
 )
+from .services.analytics import analytics_period, daily_series, project_summaries, summarize
 from .services.audit import log_task_action
+from .services.bulk import BulkOperationError, apply_bulk_operations
+from .services.changes import task_changes
+from .services.stats import (
+    counts_payload,
+    get_project_stats,
+    get_task_stats,
+    get_visible_counts,
+    stats_payload,
+)
+from .services.bot_cache import BOT_PROJECTS, BOT_TASKS, bot_list_cache_key, bot_list_cache_ttl
+from .services.etags import (
+    combine_etags,
+    conditional_response,
+    forward_inner_etag,
+    make_etag,
+    task_list_etag,
+)
+from .services.telegram import get_me
 from users.models import UserProfile
 from users.models import TelegramLoginToken
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.core.cache import cache
-import httpx
 
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
@@ -42,14 +71,11 @@ class TaskFrontendView(LoginRequiredMixin, TemplateView):
 
 class TaskViewSet(viewsets.ModelViewSet):
     serializer_class = TaskSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user = self.request.user
-        qs = Task.objects.filter(
-            models.Q(assigned_to=user)
-            | models.Q(created_by=user)
-            | models.Q(list__members__user=user, list__members__is_active=True)
-        ).select_related('list', 'assigned_to').distinct()
+        qs = Task.objects.filter(visible_tasks_q(user)).select_related('list', 'assigned_to')
 
         status_param = self.request.query_params.get('status')
         list_param = self.request.query_params.get('list')
@@ -73,6 +99,22 @@ class TaskViewSet(viewsets.ModelViewSet):
 
         return qs
 
+    def list(self, request, *args, **kwargs):
+        """Список с ETag по версии данных пользователя (сбрасывается сигналами, см. services.etags)."""
+        queryset = self.filter_queryset(self.get_queryset())
+        etag = task_list_etag(request.user, request.query_params)
+
+        def build_data():
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(self.get_serializer(page, many=True).data).data
+
+        return conditional_response(request, etag, build_data)
+
+    def retrieve(self, request, *args, **kwargs):
+        task = self.get_object()
+        etag = make_etag('task', task.pk, task.updated_at, task.list.updated_at, task.assigned_to_id)
+        return conditional_response(request, etag, lambda: self.get_serializer(task).data)
+
     def perform_create(self, serializer):
         project = serializer.validated_data.get('list')
         if project and not user_can_access_project(self.request.user, project):
@@ -115,6 +157,24 @@ class TaskViewSet(viewsets.ModelViewSet):
         log_task_action(task, request.user, TaskAuditLog.Action.UNCOMPLETED)
         return Response(TaskSerializer(task).data, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Массовые операции: {"operations": [{"id": 1, "action": "status", "status": "done"}, ...]}.
+
+        action: status, assign (assigned_to), move (list), complete, uncomplete. Пачка применяется
+        целиком в одной транзакции; при ошибке в любой операции — 400 со списком ошибок.
+        """
+        if not isinstance(request.data, dict):
+            return Response(
+                {"errors": [{'index': None, 'error': "Body must be an object with operations"}]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            tasks = apply_bulk_operations(request.user, request.data.get('operations'))
+        except BulkOperationError as exc:
+            return Response({"errors": exc.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': TaskSerializer(tasks, many=True).data}, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['get'])
     def audit(self, request, pk=None):
         task = get_object_or_404(Task, pk=pk)
@@ -125,19 +185,52 @@ class TaskViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        user = request.user
-        qs = Task.objects.filter(
-            models.Q(assigned_to=user)
-            | models.Q(created_by=user)
-            | models.Q(list__members__user=user, list__members__is_active=True)
-        ).distinct()
-
-        by_status = qs.values('status').annotate(count=models.Count('id'))
+        """Статистика видимых задач (как в списке); ?project=<id> — счётчики TaskStats проекта.
+
+        Без проекта — из строк TaskStats проектов пользователя и его собственной (за вычетом
+        пересечения), как и в Bot API, без агрегата по всем видимым задачам.
+        """
+        project_id = request.query_params.get('project')
+        if not project_id:
+            return Response(counts_payload(get_visible_counts(request.user)), status=status.HTTP_200_OK)
+        if not project_id.isdigit():
+            return Response({"error": "Invalid project"}, status=status.HTTP_400_BAD_REQUEST)
+        project = get_object_or_404(TeamList, pk=project_id)
+        if not user_can_access_project(request.user, project):
+            return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+        return Response(stats_payload(get_project_stats(project)), status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """Аналитика из дневных сводок: ?project=<id> — по проекту, без него — по своим задачам; ?days=30."""
+        since, until = analytics_period(request.query_params.get('days'))
+        project_id = request.query_params.get('project')
+        if project_id:
+            if not project_id.isdigit():
+                return Response({"error": "Invalid project"}, status=status.HTTP_400_BAD_REQUEST)
+            project = get_object_or_404(TeamList, pk=project_id)
+            if not user_can_access_project(request.user, project):
+                return Response({"detail": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+            rollups = TaskDailyRollup.objects.filter(project=project, day__gte=since)
+        else:
+            rollups = TaskDailyRollup.objects.filter(assignee=request.user, day__gte=since)
         return Response({
-            'total': qs.count(),
-            'by_status': list(by_status),
+            'from': since.isoformat(),
+            'to': until.isoformat(),
+            **summarize(rollups),
+            'daily': daily_series(rollups),
         }, status=status.HTTP_200_OK)
-    
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """Изменения задач после токена ?since= (без него — текущий токен и reset)."""
+        data = task_changes(
+            request.user,
+            request.query_params.get('since'),
+            lambda tasks: TaskSerializer(tasks, many=True).data,
+        )
+        return Response(data, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get', 'post', 'delete'], url_path='personal-bot')
     def personal_bot(self, request):
         """Управление личным ботом пользователя"""
@@ -167,10 +260,7 @@ class TaskViewSet(viewsets.ModelViewSet):
 
             # Валидация токена через Telegram API, чтобы не было ситуации "личный бот сохранён, но не работает".
             try:
-                r = httpx.get(
-                    f"https://api.telegram.org/bot{token}/getMe",
-                    timeout=5,
-                )
+                r = get_me(token)
                 data = r.json() if r.headers.get('content-type', '').startswith('application/json') else {}
                 if r.status_code != 200 or not data.get('ok'):
                     return Response({
@@ -227,6 +317,12 @@ class TaskBotAPIView(viewsets.ViewSet):
     throttle_classes = [ScopedRateThrottle]
     throttle_scope = 'bot'
 
+    def _paginated(self, request, queryset, serializer_class, paginator_class=KeysetPagination):
+        """Страница по курсору: {next, next_cursor, results} (см. KeysetPagination)."""
+        paginator = paginator_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(serializer_class(page, many=True).data).data
+
     def _get_profile(self, chat_id: str) -> UserProfile | None:
         if not chat_id:
             return None
@@ -249,6 +345,61 @@ class TaskBotAPIView(viewsets.ViewSet):
             "is_admin": is_admin_user(profile.user),
         })
 
+    # include= для session -> действие, чей ответ вкладывается в payload
+    SESSION_PAYLOADS = {
+        'tasks': 'get_user_tasks',
+        'today': 'today',
+        'projects': 'projects',
+        'stats': 'stats',
+        'analytics': 'analytics',
+        'project': 'project_detail',
+        'task': 'task_detail',
+    }
+
+    @action(detail=False, methods=['get'], url_path='session')
+    def session(self, request):
+        """Всё, что нужно боту для команды, одним запросом: привязка, роль, личный бот и данные.
+
+        ?include=<tasks|today|projects|stats|analytics|project|task> добавляет payload (и payload_status) —
+        ответ соответствующего endpoint с теми же параметрами (cursor, project_id, task_id...).
+        """
+        chat_id = request.query_params.get('chat_id')
+        include = request.query_params.get('include')
+        if include and include not in self.SESSION_PAYLOADS:
+            return Response({"error": "Unknown include"}, status=status.HTTP_400_BAD_REQUEST)
+
+        profile = self._get_profile(chat_id)
+        if not profile:
+            return Response({"linked": False})
+
+        data = {
+            "linked": True,
+            "username": profile.user.username,
+            "is_admin": is_admin_user(profile.user),
+            "personal_bot": bool(profile.personal_bot_token),
+        }
+        if not include:
+            return Response(data)
+
+        # ETag сессии = состояние чата + ETag данных: вложенный endpoint сам ответит 304 без сериализации
+        session_etag = make_etag('session', sorted(data.items()))
+        forward_inner_etag(request, session_etag)
+        try:
+            response = getattr(self, self.SESSION_PAYLOADS[include])(request)
+        except (Http404, APIException) as exc:
+            # Ошибка данных (нет проекта/задачи) не отменяет остальную сессию
+            response = self.handle_exception(exc)
+
+        payload_etag = response.get('ETag') if response.status_code in (200, 304) else None
+        if response.status_code == status.HTTP_304_NOT_MODIFIED:
+            result = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            result = Response({**data, "payload_status": response.status_code, "payload": response.data})
+        if payload_etag:
+            result['ETag'] = combine_etags(session_etag, payload_etag)
+            result['Cache-Control'] = 'private, no-cache'
+        return result
+
     @action(detail=False, methods=['post'], url_path='web-login-token')
     def web_login_token(self, request):
         """Выдать одноразовую ссылку входа в веб по chat_id (для команды /login в Telegram)."""
@@ -285,21 +436,24 @@ class TaskBotAPIView(viewsets.ViewSet):
     def get_user_tasks(self, request):
         chat_id = request.query_params.get('chat_id')
         try:
-            cache_key = f"bot_tasks:{chat_id}"
-            cached = cache.get(cache_key)
-            if cached is not None:
-                return Response(cached)
-
             profile = UserProfile.objects.get(telegram_chat_id=chat_id)
-        
-            tasks = Task.objects.filter(
-                models.Q(assigned_to=profile.user) | models.Q(created_by=profile.user),
-                is_completed=False
-            ).select_related('list', 'assigned_to')
-        
-            serializer = TaskSerializer(tasks, many=True)
-            cache.set(cache_key, serializer.data, timeout=15)
-            return Response(serializer.data)
+
+            # Ключ кэша несёт версию данных пользователя и запрос — он же служит ETag
+            cache_key = bot_list_cache_key(BOT_TASKS, profile.user_id, request.query_params)
+
+            def build_data():
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    return cached
+                tasks = Task.objects.filter(
+                    models.Q(assigned_to_id=profile.user_id) | models.Q(created_by_id=profile.user_id),
+                    is_completed=False
+                ).select_related('list', 'assigned_to')
+                data = self._paginated(request, tasks, TaskSerializer)
+                cache.set(cache_key, data, timeout=bot_list_cache_ttl())
+                return data
+
+            return conditional_response(request, make_etag(cache_key), build_data)
         except UserProfile.DoesNotExist:
             return Response({"error": "User not linked"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -311,31 +465,35 @@ class TaskBotAPIView(viewsets.ViewSet):
         if not profile:
             return Response({"error": "User not linked"}, status=status.HTTP_404_NOT_FOUND)
 
-        cache_key = f"bot_projects:{chat_id}"
-        cached = cache.get(cache_key)
-        if cached is not None:
-            return Response(cached)
+        cache_key = bot_list_cache_key(BOT_PROJECTS, profile.user_id, request.query_params)
 
-        user = profile.user
-        qs = TeamList.objects.select_related('client', 'created_by').filter(
-            Q(created_by=user) | Q(members__user=user, members__is_active=True)
-        ).distinct().order_by('-updated_at')
-
-        status_filter = request.query_params.get('status')
-        q_param = request.query_params.get('q')
-        ordering_param = request.query_params.get('ordering')
-        if status_filter:
-            qs = qs.filter(status=status_filter)
-        if q_param:
-            qs = qs.filter(Q(name__icontains=q_param) | Q(description__icontains=q_param))
-        if ordering_param:
-            allowed = {'updated_at', '-updated_at', 'deadline', '-deadline'}
-            if ordering_param in allowed:
-                qs = qs.order_by(ordering_param)
-
-        serializer = ProjectSerializer(qs, many=True)
-        cache.set(cache_key, serializer.data, timeout=15)
-        return Response(serializer.data)
+        def build_data():
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+            user = profile.user
+            qs = TeamList.objects.select_related('client', 'created_by').filter(
+                visible_projects_q(user)
+            ).order_by('-updated_at')
+
+            status_filter = request.query_params.get('status')
+            q_param = request.query_params.get('q')
+            ordering_param = request.query_params.get('ordering')
+            if status_filter:
+                qs = qs.filter(status=status_filter)
+            if q_param:
+                qs = qs.filter(Q(name__icontains=q_param) | Q(description__icontains=q_param))
+            if ordering_param:
+                allowed = {'updated_at', '-updated_at', 'deadline', '-deadline'}
+                if ordering_param in allowed:
+                    qs = qs.order_by(ordering_param)
+
+            data = self._paginated(request, qs, ProjectSerializer)
+            cache.set(cache_key, data, timeout=bot_list_cache_ttl())
+            return data
+
+        return conditional_response(request, make_etag(cache_key), build_data)
 
     @action(detail=False, methods=['get'], url_path='project')
     def project_detail(self, request):
@@ -347,12 +505,15 @@ class TaskBotAPIView(viewsets.ViewSet):
         if not project_id:
             return Response({"error": "Missing project_id"}, status=status.HTTP_400_BAD_REQUEST)
 
-        project = get_object_or_404(TeamList, pk=project_id)
+        project = get_object_or_404(TeamList.objects.select_related('client'), pk=project_id)
         if not user_can_access_project(profile.user, project):
             return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
 
-        serializer = ProjectSerializer(project)
-        return Response(serializer.data)
+        etag = make_etag(
+            'project', project.pk, project.updated_at,
+            project.client_id, project.client.updated_at if project.client else None,
+        )
+        return conditional_response(request, etag, lambda: ProjectSerializer(project).data)
 
     @action(detail=False, methods=['post'], url_path='project-set-status')
     def project_set_status(self, request):
@@ -392,10 +553,22 @@ class TaskBotAPIView(viewsets.ViewSet):
         if not user_can_access_project(profile.user, task.list):
             return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
 
-        task_data = TaskSerializer(task).data
-        comments = TaskComment.objects.filter(task=task).select_related('author')[:20]
-        comments_data = TaskCommentSerializer(comments, many=True).data
-        return Response({"task": task_data, "comments": comments_data})
+        comments_state = TaskComment.objects.filter(task=task).aggregate(
+            last_id=models.Max('id'),
+            total=models.Count('id'),
+        )
+        etag = make_etag(
+            'bot_task', task.pk, task.updated_at, task.list.updated_at, task.assigned_to_id,
+            comments_state['last_id'], comments_state['total'],
+        )
+
+        def build_data():
+            task_data = TaskSerializer(task).data
+            comments = TaskComment.objects.filter(task=task).select_related('author')[:20]
+            comments_data = TaskCommentSerializer(comments, many=True).data
+            return {"task": task_data, "comments": comments_data}
+
+        return conditional_response(request, etag, build_data)
 
     @action(detail=False, methods=['post'], url_path='task-set-status')
     def task_set_status(self, request):
@@ -462,14 +635,24 @@ class TaskBotAPIView(viewsets.ViewSet):
         if not profile:
             return Response({"error": "User not linked"}, status=status.HTTP_404_NOT_FOUND)
 
+        return Response(stats_payload(get_task_stats(profile.user)), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='analytics')
+    def analytics(self, request):
+        """Аналитика для Telegram: свои завершённые задачи и итоги по доступным проектам (?days=30)."""
+        chat_id = request.query_params.get('chat_id')
+        profile = self._get_profile(chat_id)
+        if not profile:
+            return Response({"error": "User not linked"}, status=status.HTTP_404_NOT_FOUND)
+
         user = profile.user
-        qs = Task.objects.filter(
-            Q(assigned_to=user) | Q(created_by=user)
-        ).distinct()
-        by_status = qs.values('status').annotate(count=models.Count('id'))
+        since, until = analytics_period(request.query_params.get('days'))
+        project_ids = TeamList.objects.filter(visible_projects_q(user)).values('id')
         return Response({
-            'total': qs.count(),
-            'by_status': list(by_status),
+            'from': since.isoformat(),
+            'to': until.isoformat(),
+            'own': summarize(TaskDailyRollup.objects.filter(assignee=user, day__gte=since)),
+            'projects': project_summaries(project_ids, since)[:10],
         }, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['get'], url_path='today')
@@ -491,7 +674,7 @@ class TaskBotAPIView(viewsets.ViewSet):
             due_date__range=(start, end),
         ).select_related('list', 'assigned_to')
 
-        return Response(TaskSerializer(tasks, many=True).data)
+        return Response(self._paginated(request, tasks, TaskSerializer))
 
     @action(detail=False, methods=['post'], url_path='admin-create-project')
     def admin_create_project(self, request):
@@ -650,9 +833,38 @@ class TaskBotAPIView(viewsets.ViewSet):
         except UserProfile.DoesNotExist:
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
     
+    @action(detail=False, methods=['get'], url_path='personal-bots')
+    def personal_bots(self, request):
+        """Реестр личных ботов постранично (курсор) — для запуска и инкрементального обновления в боте.
+
+        Без updated_since — все настроенные личные боты (заданы токен и chat_id). С updated_since —
+        профили, у которых токен или chat_id менялись с этого момента, включая отключённые
+        (personal_bot_token = null — бота нужно остановить). next_updated_since — значение для
+        следующего обновления (с запасом на транзакции, закоммиченные позже сохранения).
+        """
+        next_since = timezone.now() - timedelta(seconds=getattr(settings, 'TASK_CHANGES_SETTLE_SECONDS', 5))
+        profiles = UserProfile.objects.select_related('user')
+        raw_since = request.query_params.get('updated_since')
+        if raw_since:
+            since = parse_datetime(raw_since)
+            if since is None:
+                return Response({"error": "Invalid updated_since"}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            profiles = profiles.filter(personal_bot_updated_at__gte=since).order_by('personal_bot_updated_at', 'id')
+        else:
+            profiles = profiles.filter(
+                personal_bot_token__isnull=False,
+                telegram_chat_id__isnull=False,
+            ).order_by('id')
+
+        data = self._paginated(request, profiles, UserProfileSerializer, paginator_class=RosterPagination)
+        data['next_updated_since'] = next_since.isoformat()
+        return Response(data)
+
     @action(detail=False, methods=['get'], url_path='get-users-with-personal-bots')
     def get_users_with_personal_bots(self, request):
-        """Получить пользователей с настроенными личными ботами"""
+        """Получить пользователей с настроенными личными ботами (одним списком; см. personal-bots)"""
         try:
             profiles = UserProfile.objects.filter(
                 personal_bot_token__isnull=False,
@@ -691,7 +903,7 @@ class TaskBotAPIView(viewsets.ViewSet):
             
             task.is_completed = True
             task.save(update_fields=['is_completed'])
-            self._log_task_action(task, profile.user, TaskAuditLog.Action.COMPLETED)
+            log_task_action(task, profile.user, TaskAuditLog.Action.COMPLETED)
             
             return Response({"status": "Task completed"}, status=status.HTTP_200_OK)
         except UserProfile.DoesNotExist:
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_telegramlogintoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='personal_bot_updated_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Личный бот изменён'),
+        ),
+    ]
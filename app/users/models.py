@@ -35,6 +35,13 @@ class UserProfile(models.Model):
         null=True, 
         verbose_name=_('Username личного бота')
     )
+    # Когда менялись токен личного бота или chat_id — для инкрементального обновления реестра в боте
+    personal_bot_updated_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        db_index=True,
+        verbose_name=_('Личный бот изменён'),
+    )
     
     # --- ДОБАВЛЕНИЕ РУССКИХ НАЗВАНИЙ ДЛЯ АДМИНКИ ---
     class Meta:
@@ -45,6 +52,28 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"Профиль: {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_bot_binding()
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_bot_binding', (None, None))
+        if loaded != (self.telegram_chat_id, self.personal_bot_token):
+            self.personal_bot_updated_at = timezone.now()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'personal_bot_updated_at'}
+        super().save(*args, **kwargs)
+
+    def remember_bot_binding(self):
+        # Для сигнала: процесс бота узнаёт о смене личного бота без перезапуска
+        self._loaded_bot_binding = (
+            self.__dict__.get('telegram_chat_id'),
+            self.__dict__.get('personal_bot_token'),
+        )
+
 
 class TelegramLoginToken(models.Model):
     """Одноразовый токен для быстрого входа в веб через Telegram."""
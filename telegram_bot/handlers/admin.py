@@ -7,15 +7,16 @@ from config import (
     API_PROJECT_SET_STATUS,
 )
 from http_client import http_client
-from services.auth import ensure_linked, is_admin, parse_status_token
+from services.auth import parse_status_token, require_session
 
 logger = logging.getLogger(__name__)
 
 
-async def handle_admin_new_project(message: types.Message, chat_id: str, raw: str):
-    if not await ensure_linked(message):
+async def handle_admin_new_project(message: types.Message, chat_id: str, raw: str, session: dict | None = None):
+    session = await require_session(message, chat_id, session=session)
+    if session is None:
         return
-    if not await is_admin(chat_id):
+    if not session.get('is_admin'):
         await message.answer("❌ Недостаточно прав.")
         return
 
@@ -46,10 +47,11 @@ async def handle_admin_new_project(message: types.Message, chat_id: str, raw: st
         await message.answer("❌ Ошибка соединения. Попробуйте позже.")
 
 
-async def handle_admin_new_task(message: types.Message, chat_id: str, raw: str):
-    if not await ensure_linked(message):
+async def handle_admin_new_task(message: types.Message, chat_id: str, raw: str, session: dict | None = None):
+    session = await require_session(message, chat_id, session=session)
+    if session is None:
         return
-    if not await is_admin(chat_id):
+    if not session.get('is_admin'):
         await message.answer("❌ Недостаточно прав.")
         return
 
@@ -81,10 +83,11 @@ async def handle_admin_new_task(message: types.Message, chat_id: str, raw: str):
         await message.answer("❌ Ошибка соединения. Попробуйте позже.")
 
 
-async def handle_admin_project_status(message: types.Message, chat_id: str, project_id: str, status_token: str):
-    if not await ensure_linked(message):
+async def handle_admin_project_status(message: types.Message, chat_id: str, project_id: str, status_token: str, session: dict | None = None):
+    session = await require_session(message, chat_id, session=session)
+    if session is None:
         return
-    if not await is_admin(chat_id):
+    if not session.get('is_admin'):
         await message.answer("❌ Недостаточно прав.")
         return
 
@@ -5,13 +5,13 @@ import httpx
 
 from config import API_LINK_ACCOUNT, API_WEB_LOGIN_TOKEN, API_CLEAR_PERSONAL_BOT
 from http_client import http_client
-from services.auth import ensure_linked, get_user_bot_token
+from services.auth import ensure_linked, get_user_bot_token, invalidate_chat
 
 logger = logging.getLogger(__name__)
 
 
-async def handle_login_link(message: types.Message, chat_id: str) -> None:
-    if not await ensure_linked(message):
+async def handle_login_link(message: types.Message, chat_id: str, session: dict | None = None) -> None:
+    if not await ensure_linked(message, session=session):
         return
     try:
         r = await http_client.post(API_WEB_LOGIN_TOKEN, json={'chat_id': str(chat_id)})
@@ -45,6 +45,7 @@ async def handle_personal_off(message: types.Message, chat_id: str) -> None:
     try:
         r = await http_client.post(API_CLEAR_PERSONAL_BOT, json={'chat_id': str(chat_id)})
         if r.status_code == 200:
+            invalidate_chat(chat_id)
             await message.answer("✅ Личный бот отключён. Теперь можно пользоваться системным ботом.")
         else:
             await message.answer("❌ Не удалось отключить личного бота. Попробуйте позже.")
@@ -63,12 +64,13 @@ async def handle_account_linking(message: types.Message, token: str, chat_id: st
         
         if response.status_code == 200:
             username = response.json().get('username', 'пользователь')
-            
+            invalidate_chat(chat_id)
+
             personal_token = await get_user_bot_token(chat_id)
             if personal_token:
                 # локальный импорт, чтобы избежать циклов
-                from services.bot_manager import create_personal_bot
-                await create_personal_bot(personal_token, chat_id)
+                from services.bot_manager import sync_personal_bot
+                await sync_personal_bot(chat_id)
                 await message.answer(
                     f"✅ Аккаунт успешно привязан! Добро пожаловать, {username}.\n\n"
                     f"🤖 Ваш личный бот активирован! Теперь используйте его для управления задачами."
@@ -6,11 +6,13 @@ from .tasks import (
     handle_help_command,
     handle_today_command,
     handle_stats_command,
+    handle_analytics_command,
     handle_projects_command,
     handle_project_command,
     handle_task_command,
     handle_comment_command,
     handle_complete_task,
+    handle_more_callback,
     handle_task_status_callback,
     handle_project_status_callback,
 )
@@ -41,6 +43,12 @@ async def register_personal_bot_handlers(dp: Dispatcher, user_chat_id: str):
     async def personal_stats_handler(message: types.Message) -> None:
         await handle_stats_command(message, user_chat_id)
 
+    @dp.message(Command('analytics'))
+    async def personal_analytics_handler(message: types.Message) -> None:
+        parts = message.text.split(maxsplit=1)
+        days = parts[1].strip() if len(parts) > 1 and parts[1].strip().isdigit() else None
+        await handle_analytics_command(message, user_chat_id, days)
+
     @dp.message(Command('projects'))
     async def personal_projects_handler(message: types.Message) -> None:
         await handle_projects_command(message, user_chat_id)
@@ -120,3 +128,7 @@ async def register_personal_bot_handlers(dp: Dispatcher, user_chat_id: str):
     async def personal_project_status_cb_handler(callback: types.CallbackQuery):
         _, project_id, st = callback.data.split('_', 2)
         await handle_project_status_callback(callback, user_chat_id, project_id, st)
+
+    @dp.callback_query(F.data.startswith("more_"))
+    async def personal_more_handler(callback: types.CallbackQuery):
+        await handle_more_callback(callback, user_chat_id)
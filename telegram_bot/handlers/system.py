@@ -6,11 +6,13 @@ from .tasks import (
     handle_help_command,
     handle_today_command,
     handle_stats_command,
+    handle_analytics_command,
     handle_projects_command,
     handle_project_command,
     handle_task_command,
     handle_comment_command,
     handle_complete_task,
+    handle_more_callback,
     handle_task_status_callback,
     handle_project_status_callback,
 )
@@ -24,11 +26,15 @@ from .linking import (
     handle_login_link,
     handle_personal_off,
 )
-from services.auth import get_user_bot_token
+from services.auth import get_session, has_personal_bot
 
 
 async def register_system_bot_handlers(dp: Dispatcher):
-    """Регистрируем хэндлеры для системного бота"""
+    """Регистрируем хэндлеры для системного бота
+
+    Сессия (привязка, личный бот, роль и данные команды) запрашивается один раз и передаётся
+    в общий обработчик — без цепочки запросов к API на каждую команду.
+    """
 
     @dp.message(CommandStart())
     async def system_command_start_handler(message: types.Message) -> None:
@@ -51,20 +57,20 @@ async def register_system_bot_handlers(dp: Dispatcher):
     @dp.message(Command('help'))
     async def system_help_handler(message: types.Message) -> None:
         chat_id = str(message.chat.id)
-        personal_token = await get_user_bot_token(chat_id)
-        if personal_token:
+        session = await get_session(chat_id)
+        if await has_personal_bot(chat_id, session):
             await message.answer("🤖 Используйте вашего личного бота для работы с задачами/проектами.")
             return
-        await handle_help_command(message, chat_id)
+        await handle_help_command(message, chat_id, session=session)
 
     @dp.message(Command('login'))
     async def system_login_handler(message: types.Message) -> None:
         chat_id = str(message.chat.id)
-        personal_token = await get_user_bot_token(chat_id)
-        if personal_token:
+        session = await get_session(chat_id)
+        if await has_personal_bot(chat_id, session):
             await message.answer("🤖 Используйте вашего личного бота.")
             return
-        await handle_login_link(message, chat_id)
+        await handle_login_link(message, chat_id, session=session)
 
     @dp.message(Command('personal_off'))
     async def system_personal_off_handler(message: types.Message) -> None:
@@ -74,29 +80,40 @@ async def register_system_bot_handlers(dp: Dispatcher):
     @dp.message(Command('today'))
     async def system_today_handler(message: types.Message) -> None:
         chat_id = str(message.chat.id)
-        personal_token = await get_user_bot_token(chat_id)
-        if personal_token:
+        session = await get_session(chat_id, include='today')
+        if await has_personal_bot(chat_id, session):
             await message.answer("🤖 Используйте вашего личного бота.")
             return
-        await handle_today_command(message, chat_id)
+        await handle_today_command(message, chat_id, session=session)
 
     @dp.message(Command('stats'))
     async def system_stats_handler(message: types.Message) -> None:
         chat_id = str(message.chat.id)
-        personal_token = await get_user_bot_token(chat_id)
-        if personal_token:
+        session = await get_session(chat_id, include='stats')
+        if await has_personal_bot(chat_id, session):
             await message.answer("🤖 Используйте вашего личного бота.")
             return
-        await handle_stats_command(message, chat_id)
+        await handle_stats_command(message, chat_id, session=session)
+
+    @dp.message(Command('analytics'))
+    async def system_analytics_handler(message: types.Message) -> None:
+        chat_id = str(message.chat.id)
+        parts = message.text.split(maxsplit=1)
+        days = parts[1].strip() if len(parts) > 1 and parts[1].strip().isdigit() else None
+        session = await get_session(chat_id, include='analytics', days=days)
+        if await has_personal_bot(chat_id, session):
+            await message.answer("🤖 Используйте вашего личного бота.")
+            return
+        await handle_analytics_command(message, chat_id, days, session=session)
 
     @dp.message(Command('projects'))
     async def system_projects_handler(message: types.Message) -> None:
         chat_id = str(message.chat.id)
-        personal_token = await get_user_bot_token(chat_id)
-        if personal_token:
+        session = await get_session(chat_id, include='projects')
+        if await has_personal_bot(chat_id, session):
             await message.answer("🤖 Используйте вашего личного бота.")
             return
-        await handle_projects_command(message, chat_id)
+        await handle_projects_command(message, chat_id, session=session)
 
     @dp.message(Command('project'))
     async def system_project_handler(message: types.Message) -> None:
@@ -105,11 +122,11 @@ async def register_system_bot_handlers(dp: Dispatcher):
         if len(parts) < 2:
             await message.answer("Формат: /project <id>")
             return
-        personal_token = await get_user_bot_token(chat_id)
-        if personal_token:
+        session = await get_session(chat_id, include='project', project_id=parts[1].strip())
+        if await has_personal_bot(chat_id, session):
             await message.answer("🤖 Используйте вашего личного бота.")
             return
-        await handle_project_command(message, chat_id, parts[1].strip())
+        await handle_project_command(message, chat_id, parts[1].strip(), session=session)
 
     @dp.message(Command('task'))
     async def system_task_handler(message: types.Message) -> None:
@@ -118,11 +135,11 @@ async def register_system_bot_handlers(dp: Dispatcher):
         if len(parts) < 2:
             await message.answer("Формат: /task <id>")
             return
-        personal_token = await get_user_bot_token(chat_id)
-        if personal_token:
+        session = await get_session(chat_id, include='task', task_id=parts[1].strip())
+        if await has_personal_bot(chat_id, session):
             await message.answer("🤖 Используйте вашего личного бота.")
             return
-        await handle_task_command(message, chat_id, parts[1].strip())
+        await handle_task_command(message, chat_id, parts[1].strip(), session=session)
 
     @dp.message(Command('comment'))
     async def system_comment_handler(message: types.Message) -> None:
@@ -131,31 +148,31 @@ async def register_system_bot_handlers(dp: Dispatcher):
         if len(parts) < 3:
             await message.answer("Формат: /comment <task_id> <текст>")
             return
-        personal_token = await get_user_bot_token(chat_id)
-        if personal_token:
+        session = await get_session(chat_id)
+        if await has_personal_bot(chat_id, session):
             await message.answer("🤖 Используйте вашего личного бота.")
             return
-        await handle_comment_command(message, chat_id, parts[1].strip(), parts[2].strip())
+        await handle_comment_command(message, chat_id, parts[1].strip(), parts[2].strip(), session=session)
 
     @dp.message(Command('new_project'))
     async def system_new_project_handler(message: types.Message) -> None:
         chat_id = str(message.chat.id)
         raw = message.text[len('/new_project'):].strip()
-        personal_token = await get_user_bot_token(chat_id)
-        if personal_token:
+        session = await get_session(chat_id)
+        if await has_personal_bot(chat_id, session):
             await message.answer("🤖 Используйте вашего личного бота.")
             return
-        await handle_admin_new_project(message, chat_id, raw)
+        await handle_admin_new_project(message, chat_id, raw, session=session)
 
     @dp.message(Command('new_task'))
     async def system_new_task_handler(message: types.Message) -> None:
         chat_id = str(message.chat.id)
         raw = message.text[len('/new_task'):].strip()
-        personal_token = await get_user_bot_token(chat_id)
-        if personal_token:
+        session = await get_session(chat_id)
+        if await has_personal_bot(chat_id, session):
             await message.answer("🤖 Используйте вашего личного бота.")
             return
-        await handle_admin_new_task(message, chat_id, raw)
+        await handle_admin_new_task(message, chat_id, raw, session=session)
 
     @dp.message(Command('project_status'))
     async def system_project_status_handler(message: types.Message) -> None:
@@ -164,30 +181,30 @@ async def register_system_bot_handlers(dp: Dispatcher):
         if len(parts) < 3:
             await message.answer("Формат: /project_status <project_id> <статус>")
             return
-        personal_token = await get_user_bot_token(chat_id)
-        if personal_token:
+        session = await get_session(chat_id)
+        if await has_personal_bot(chat_id, session):
             await message.answer("🤖 Используйте вашего личного бота.")
             return
-        await handle_admin_project_status(message, chat_id, parts[1].strip(), parts[2].strip())
+        await handle_admin_project_status(message, chat_id, parts[1].strip(), parts[2].strip(), session=session)
 
     @dp.message(Command('tasks'))
     async def system_tasks_handler(message: types.Message) -> None:
         chat_id = str(message.chat.id)
-        personal_token = await get_user_bot_token(chat_id)
-        if personal_token:
+        session = await get_session(chat_id, include='tasks')
+        if await has_personal_bot(chat_id, session):
             await message.answer(
                 "🤖 У вас настроен личный бот!\n\n"
                 "Для управления задачами используйте вашего личного бота. "
                 "Системный бот используется только для привязки аккаунта."
             )
             return
-        await handle_tasks_command(message, chat_id)
+        await handle_tasks_command(message, chat_id, session=session)
 
     @dp.callback_query(F.data.startswith("complete_"))
     async def system_complete_handler(callback: types.CallbackQuery):
         chat_id = str(callback.message.chat.id)
-        personal_token = await get_user_bot_token(chat_id)
-        if personal_token:
+        session = await get_session(chat_id)
+        if await has_personal_bot(chat_id, session):
             await callback.answer("❌ Используйте вашего личного бота для управления задачами.", show_alert=True)
             return
         await handle_complete_task(callback, chat_id)
@@ -217,3 +234,12 @@ async def register_system_bot_handlers(dp: Dispatcher):
         chat_id = str(callback.message.chat.id)
         _, project_id, st = callback.data.split('_', 2)
         await handle_project_status_callback(callback, chat_id, project_id, st)
+
+    @dp.callback_query(F.data.startswith("more_"))
+    async def system_more_handler(callback: types.CallbackQuery):
+        chat_id = str(callback.message.chat.id)
+        session = await get_session(chat_id)
+        if await has_personal_bot(chat_id, session):
+            await callback.answer("🤖 Используйте вашего личного бота.", show_alert=True)
+            return
+        await handle_more_callback(callback, chat_id)
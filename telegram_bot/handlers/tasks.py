@@ -1,44 +1,81 @@
 import logging
 import html
+import os
+import secrets
 from aiogram import types
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 import httpx
+from redis.exceptions import RedisError
 
 from config import (
-    API_GET_TASKS,
     API_COMPLETE_TASK,
-    API_TODAY,
-    API_PROJECTS,
-    API_PROJECT_DETAIL,
-    API_TASK_DETAIL,
     API_TASK_SET_STATUS,
     API_PROJECT_SET_STATUS,
     API_TASK_COMMENT,
-    API_TASK_STATS,
 )
 from http_client import http_client
-from services.auth import ensure_linked, is_admin
+from services.auth import require_session
+from services.redis_client import get_redis
 
 logger = logging.getLogger(__name__)
 
+# Курсоры API длиннее лимита callback_data (64 байта) — храним в Redis под коротким ключом:
+# кнопка работает на любом воркере (webhook, шардирование), после перезапуска и повторно
+PAGE_CURSOR_KEY = 'taskflow:page-cursor:{key}'
+PAGE_CURSOR_TTL = int(os.getenv('BOT_PAGE_CURSOR_TTL', '86400'))
 
-async def handle_tasks_command(message: types.Message, chat_id: str):
-    """Общий обработчик команды /tasks"""
+
+async def _remember_cursor(cursor: str) -> str | None:
+    key = secrets.token_hex(8)
     try:
-        response = await http_client.get(API_GET_TASKS, params={"chat_id": str(chat_id)})
-        
-        if response.status_code == 404:
-            await message.answer("❌ Ваш аккаунт не привязан. Используйте токен из веб-приложения, чтобы привязать его.")
+        await get_redis().set(PAGE_CURSOR_KEY.format(key=key), cursor, ex=PAGE_CURSOR_TTL)
+    except RedisError as e:
+        logger.warning("Не удалось сохранить курсор страницы: %s", e)
+        return None
+    return key
+
+
+async def _load_cursor(key: str) -> str | None:
+    try:
+        return await get_redis().get(PAGE_CURSOR_KEY.format(key=key))
+    except RedisError as e:
+        logger.warning("Не удалось прочитать курсор страницы: %s", e)
+        return None
+
+
+async def _add_more_button(builder: InlineKeyboardBuilder, kind: str, page: dict) -> bool:
+    next_cursor = page.get('next_cursor')
+    if not next_cursor:
+        return False
+    key = await _remember_cursor(next_cursor)
+    if key is None:
+        # Без Redis следующую страницу не открыть — показываем текущую без кнопки
+        return False
+    builder.button(text="⬇️ Показать ещё", callback_data=f"more_{kind}_{key}")
+    return True
+
+
+async def handle_tasks_command(
+    message: types.Message, chat_id: str, cursor: str | None = None, session: dict | None = None,
+):
+    """Общий обработчик команды /tasks (постранично, следующая страница — кнопкой)"""
+    session = await require_session(message, chat_id, include='tasks', session=session, cursor=cursor)
+    if session is None:
+        return
+    try:
+        if session.get('payload_status') != 200:
+            await message.answer("❌ Не удалось получить задачи.")
             return
 
-        tasks = response.json()
+        page = session['payload']
+        tasks = page.get('results') or []
         
         if not tasks:
-            await message.answer("🎉 У вас нет активных задач!")
+            await message.answer("🎉 У вас нет активных задач!" if not cursor else "Больше задач нет.")
             return
 
         builder = InlineKeyboardBuilder()
-        text = "🎯 Ваши текущие задачи:\n\n"
+        text = "🎯 Ваши текущие задачи:\n\n" if not cursor else "🎯 Ещё задачи:\n\n"
         
         for task in tasks:
             due_date = f"Срок: {task['due_date'].split('T')[0]}" if task.get('due_date') else "Срок: Не установлен"
@@ -54,12 +91,13 @@ async def handle_tasks_command(message: types.Message, chat_id: str):
             builder.button(text=f"📌 Открыть #{task['id']}", callback_data=f"task_{task['id']}")
             builder.button(text=f"✅ Выполнить #{task['id']}", callback_data=f"complete_{task['id']}")
             
+        await _add_more_button(builder, 'tasks', page)
         builder.adjust(1)
         
         await message.answer(text, reply_markup=builder.as_markup(), parse_mode='HTML')
 
-    except httpx.HTTPError as e:
-        logger.error("HTTP error in tasks command: %s", e)
+    except (httpx.HTTPError, KeyError) as e:
+        logger.error("Error in /tasks: %s", e)
         await message.answer("❌ Ошибка соединения с сервером.")
 
 
@@ -87,16 +125,38 @@ async def handle_complete_task(callback: types.CallbackQuery, chat_id: str):
         await callback.answer("❌ Ошибка соединения с сервером.", show_alert=True)
 
 
-async def handle_help_command(message: types.Message, chat_id: str):
-    if not await ensure_linked(message):
+async def handle_more_callback(callback: types.CallbackQuery, chat_id: str):
+    """Кнопка «Показать ещё»: следующая страница /tasks, /today или /projects."""
+    _, kind, key = callback.data.split('_', 2)
+    cursor = await _load_cursor(key)
+    if not cursor:
+        await callback.answer("Список устарел, запросите его заново.", show_alert=True)
+        return
+    handlers = {
+        'tasks': handle_tasks_command,
+        'today': handle_today_command,
+        'projects': handle_projects_command,
+    }
+    handler = handlers.get(kind)
+    if handler is None:
+        await callback.answer()
+        return
+    await handler(callback.message, chat_id, cursor=cursor)
+    await callback.answer()
+
+
+async def handle_help_command(message: types.Message, chat_id: str, session: dict | None = None):
+    session = await require_session(message, chat_id, session=session)
+    if session is None:
         return
 
-    admin_flag = await is_admin(chat_id)
+    admin_flag = session.get('is_admin')
     base = (
         "Команды:\n"
         "• /tasks — мои задачи\n"
         "• /today — задачи на сегодня\n"
         "• /stats — статистика задач\n"
+        "• /analytics [дней] — завершённые задачи, время цикла и точность оценок\n"
         "• /task <id> — карточка задачи\n"
         "• /comment <task_id> <текст> — комментарий к задаче\n"
         "• /projects — мои проекты\n"
@@ -113,17 +173,20 @@ async def handle_help_command(message: types.Message, chat_id: str):
     await message.answer(base)
 
 
-async def handle_today_command(message: types.Message, chat_id: str):
-    if not await ensure_linked(message):
+async def handle_today_command(
+    message: types.Message, chat_id: str, cursor: str | None = None, session: dict | None = None,
+):
+    session = await require_session(message, chat_id, include='today', session=session, cursor=cursor)
+    if session is None:
         return
     try:
-        r = await http_client.get(API_TODAY, params={'chat_id': str(chat_id)})
-        if r.status_code != 200:
+        if session.get('payload_status') != 200:
             await message.answer("❌ Не удалось получить задачи на сегодня.")
             return
-        tasks = r.json()
+        page = session['payload']
+        tasks = page.get('results') or []
         if not tasks:
-            await message.answer("🎉 На сегодня задач нет!")
+            await message.answer("🎉 На сегодня задач нет!" if not cursor else "Больше задач нет.")
             return
         text = "🗓 Задачи на сегодня:\n\n"
         for t in tasks:
@@ -131,33 +194,41 @@ async def handle_today_command(message: types.Message, chat_id: str):
             due_date = t.get('due_date')
             due = due_date.split('T')[0] if due_date else '—'
             text += f"#{t['id']} • {t['title']} • {status_display} • {due} (проект: {t.get('list_name')})\n"
-        await message.answer(text)
+        builder = InlineKeyboardBuilder()
+        if await _add_more_button(builder, 'today', page):
+            await message.answer(text, reply_markup=builder.as_markup())
+        else:
+            await message.answer(text)
     except Exception as e:
         logger.error("Error in /today: %s", e)
         await message.answer("❌ Ошибка соединения с сервером.")
 
 
-async def handle_projects_command(message: types.Message, chat_id: str):
-    if not await ensure_linked(message):
+async def handle_projects_command(
+    message: types.Message, chat_id: str, cursor: str | None = None, session: dict | None = None,
+):
+    session = await require_session(message, chat_id, include='projects', session=session, cursor=cursor)
+    if session is None:
         return
     try:
-        r = await http_client.get(API_PROJECTS, params={'chat_id': str(chat_id)})
-        if r.status_code != 200:
+        if session.get('payload_status') != 200:
             await message.answer("❌ Не удалось получить проекты.")
             return
-        projects = r.json()
+        page = session['payload']
+        projects = page.get('results') or []
         if not projects:
-            await message.answer("Проектов пока нет.")
+            await message.answer("Проектов пока нет." if not cursor else "Больше проектов нет.")
             return
 
         builder = InlineKeyboardBuilder()
         text = "📁 Ваши проекты:\n\n"
-        for p in projects[:20]:
+        for p in projects:
             status_display = p.get('status_display') or p.get('status')
             client = (p.get('client') or {}).get('name') if p.get('client') else None
             client_text = f" • {client}" if client else ""
             text += f"#{p['id']} • {p['name']} • {status_display}{client_text}\n"
             builder.button(text=f"📌 Проект #{p['id']}", callback_data=f"proj_{p['id']}")
+        await _add_more_button(builder, 'projects', page)
         builder.adjust(1)
         await message.answer(text, reply_markup=builder.as_markup())
     except Exception as e:
@@ -165,35 +236,74 @@ async def handle_projects_command(message: types.Message, chat_id: str):
         await message.answer("❌ Ошибка соединения с сервером.")
 
 
-async def handle_stats_command(message: types.Message, chat_id: str):
-    if not await ensure_linked(message):
+def _analytics_line(data: dict) -> str:
+    parts = [f"завершено {data.get('completed') or 0}"]
+    if data.get('cycle_time_avg_hours') is not None:
+        parts.append(f"цикл ~{data['cycle_time_avg_hours']} ч")
+    if data.get('estimate_ratio') is not None:
+        parts.append(f"факт/оценка {data['estimate_ratio']}")
+    return ", ".join(parts)
+
+
+async def handle_analytics_command(
+    message: types.Message, chat_id: str, days: str | None = None, session: dict | None = None,
+):
+    session = await require_session(message, chat_id, include='analytics', session=session, days=days)
+    if session is None:
+        return
+    try:
+        if session.get('payload_status') != 200:
+            await message.answer("❌ Не удалось получить аналитику.")
+            return
+        data = session['payload']
+        lines = [
+            f"📈 Аналитика с {data.get('from')} по {data.get('to')}",
+            f"Мои задачи: {_analytics_line(data.get('own') or {})}",
+        ]
+        projects = data.get('projects') or []
+        if projects:
+            lines.append("\nПроекты:")
+            for item in projects:
+                lines.append(f"• {item.get('project_name')}: {_analytics_line(item)}")
+        await message.answer("\n".join(lines))
+    except Exception as e:
+        logger.error("Error in /analytics: %s", e)
+        await message.answer("❌ Ошибка соединения с сервером.")
+
+
+async def handle_stats_command(message: types.Message, chat_id: str, session: dict | None = None):
+    session = await require_session(message, chat_id, include='stats', session=session)
+    if session is None:
         return
     try:
-        r = await http_client.get(API_TASK_STATS, params={'chat_id': str(chat_id)})
-        if r.status_code != 200:
+        if session.get('payload_status') != 200:
             await message.answer("❌ Не удалось получить статистику.")
             return
-        data = r.json()
+        data = session['payload']
         total = data.get('total', 0)
         by_status = data.get('by_status') or []
         lines = [f"📊 Всего задач: {total}"]
         for item in by_status:
             lines.append(f"• {item.get('status')}: {item.get('count')}")
+        if data.get('overdue'):
+            lines.append(f"⏰ Просрочено: {data['overdue']}")
         await message.answer("\n".join(lines))
     except Exception as e:
         logger.error("Error in /stats: %s", e)
         await message.answer("❌ Ошибка соединения с сервером.")
 
 
-async def handle_project_command(message: types.Message, chat_id: str, project_id: str):
-    if not await ensure_linked(message):
+async def handle_project_command(
+    message: types.Message, chat_id: str, project_id: str, session: dict | None = None,
+):
+    session = await require_session(message, chat_id, include='project', session=session, project_id=project_id)
+    if session is None:
         return
     try:
-        r = await http_client.get(API_PROJECT_DETAIL, params={'chat_id': str(chat_id), 'project_id': str(project_id)})
-        if r.status_code != 200:
+        if session.get('payload_status') != 200:
             await message.answer("❌ Проект не найден или нет доступа.")
             return
-        p = r.json()
+        p = session['payload']
         status_display = p.get('status_display') or p.get('status')
         source_display = p.get('source_display') or p.get('source')
         client = (p.get('client') or {}).get('name') if p.get('client') else '—'
@@ -208,7 +318,7 @@ async def handle_project_command(message: types.Message, chat_id: str, project_i
         )
 
         builder = InlineKeyboardBuilder()
-        if await is_admin(chat_id):
+        if session.get('is_admin'):
             builder.button(text="🟦 Переписка", callback_data=f"pstatus_{p['id']}_negotiation")
             builder.button(text="🟨 В разработке", callback_data=f"pstatus_{p['id']}_development")
             builder.button(text="🟥 Не принят", callback_data=f"pstatus_{p['id']}_rejected")
@@ -222,15 +332,17 @@ async def handle_project_command(message: types.Message, chat_id: str, project_i
         await message.answer("❌ Ошибка соединения с сервером.")
 
 
-async def handle_task_command(message: types.Message, chat_id: str, task_id: str):
-    if not await ensure_linked(message):
+async def handle_task_command(
+    message: types.Message, chat_id: str, task_id: str, session: dict | None = None,
+):
+    session = await require_session(message, chat_id, include='task', session=session, task_id=task_id)
+    if session is None:
         return
     try:
-        r = await http_client.get(API_TASK_DETAIL, params={'chat_id': str(chat_id), 'task_id': str(task_id)})
-        if r.status_code != 200:
+        if session.get('payload_status') != 200:
             await message.answer("❌ Задача не найдена или нет доступа.")
             return
-        payload = r.json()
+        payload = session['payload']
         t = payload.get('task') or {}
         comments = payload.get('comments') or []
 
@@ -262,8 +374,10 @@ async def handle_task_command(message: types.Message, chat_id: str, task_id: str
         await message.answer("❌ Ошибка соединения с сервером.")
 
 
-async def handle_comment_command(message: types.Message, chat_id: str, task_id: str, text: str):
-    if not await ensure_linked(message):
+async def handle_comment_command(
+    message: types.Message, chat_id: str, task_id: str, text: str, session: dict | None = None,
+):
+    if await require_session(message, chat_id, session=session) is None:
         return
     try:
         r = await http_client.post(API_TASK_COMMENT, json={'chat_id': str(chat_id), 'task_id': str(task_id), 'text': str(text)})
@@ -1,3 +1,36 @@
+from collections import OrderedDict
+
 import httpx
 
 http_client = httpx.AsyncClient(timeout=10.0)
+
+# Последние ответы GET с ETag: при 304 тело берётся отсюда, сервер не сериализует данные заново
+_etag_cache: OrderedDict = OrderedDict()
+_ETAG_CACHE_MAX = 500
+
+
+async def conditional_get(url: str, params: dict | None = None) -> httpx.Response:
+    """GET с If-None-Match; ответ 304 превращается в 200 с телом из локального кэша."""
+    key = (url, tuple(sorted((params or {}).items())))
+    cached = _etag_cache.get(key)
+    headers = {'If-None-Match': cached[0]} if cached else None
+
+    response = await http_client.get(url, params=params, headers=headers)
+    if response.status_code == 304 and cached:
+        _etag_cache.move_to_end(key)
+        return httpx.Response(
+            200,
+            content=cached[1],
+            headers={'Content-Type': 'application/json', 'ETag': cached[0]},
+            request=response.request,
+        )
+
+    etag = response.headers.get('ETag')
+    if response.status_code == 200 and etag:
+        _etag_cache[key] = (etag, response.content)
+        _etag_cache.move_to_end(key)
+        while len(_etag_cache) > _ETAG_CACHE_MAX:
+            _etag_cache.popitem(last=False)
+    else:
+        _etag_cache.pop(key, None)
+    return response
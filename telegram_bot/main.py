@@ -3,10 +3,15 @@ import logging
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiohttp import web
 
 from config import SYSTEM_BOT_TOKEN
 from handlers.system import register_system_bot_handlers
-from services.bot_manager import initialize_existing_personal_bots
+from services import sharding
+from services.bot_manager import initialize_existing_personal_bots, run_roster_refresh, run_sharded_bots
+from services.events import run_bot_events_listener
+from services.health import BOT_HEALTH_HOST, BOT_HEALTH_PORT, add_health_routes
+from services.webhook import WEBHOOK_PORT, attach_bot, create_webhook_app, start_http_server, webhook_mode
 from http_client import http_client
 
 logging.basicConfig(level=logging.INFO)
@@ -22,17 +27,54 @@ async def main() -> None:
 
     if not SYSTEM_BOT_TOKEN:
         raise RuntimeError("SYSTEM_BOT_TOKEN is not set")
+    if sharding.SHARDING_ENABLED and not sharding.WORKER_ID_STABLE:
+        # Иначе после каждого рестарта — новая группа событий с '$': пропущенные за простой события теряются
+        raise RuntimeError("BOT_WORKER_ID must be set (stable per worker) when BOT_SHARDING=True")
 
     auto_system_bot = Bot(token=SYSTEM_BOT_TOKEN, default=DefaultBotProperties(parse_mode=None))
     system_dp = Dispatcher()
 
     await register_system_bot_handlers(system_dp)
 
-    logger.info("Initializing existing personal bots...")
-    await initialize_existing_personal_bots()
+    runners = []
+    if webhook_mode():
+        # Один HTTP-сервер на все боты процесса (маршрут по bot_id) + /health; поднимаем до setWebhook.
+        # Сервер публичный, поэтому /health здесь — только сводка по статусам
+        app = create_webhook_app()
+        add_health_routes(app)
+        runners.append(await start_http_server(app, WEBHOOK_PORT))
+    if BOT_HEALTH_PORT:
+        # Подробности по ботам (chat_id, ошибки) — на отдельном внутреннем порту
+        app = web.Application()
+        add_health_routes(app, detailed=True)
+        runners.append(await start_http_server(app, BOT_HEALTH_PORT, BOT_HEALTH_HOST))
 
-    logger.info("Starting system bot...")
-    await system_dp.start_polling(auto_system_bot)
+    if not sharding.SHARDING_ENABLED:
+        logger.info("Initializing existing personal bots...")
+        await initialize_existing_personal_bots()
+
+    # События от Django (новые/отключённые личные боты, уведомления) — без перезапуска контейнера
+    events_listener = asyncio.create_task(run_bot_events_listener(auto_system_bot))
+    roster_refresh = None if sharding.SHARDING_ENABLED else asyncio.create_task(run_roster_refresh())
+
+    try:
+        if sharding.SHARDING_ENABLED:
+            # Воркер запускает только свою долю личных ботов (и системного, если он выпал ему)
+            logger.info("Starting bot worker %s (sharded)...", sharding.WORKER_ID)
+            await run_sharded_bots(auto_system_bot, system_dp)
+        elif webhook_mode():
+            logger.info("Starting system bot (webhook)...")
+            await attach_bot(auto_system_bot, system_dp)
+            await asyncio.Event().wait()
+        else:
+            logger.info("Starting system bot...")
+            await system_dp.start_polling(auto_system_bot)
+    finally:
+        events_listener.cancel()
+        if roster_refresh is not None:
+            roster_refresh.cancel()
+        for runner in runners:
+            await runner.cleanup()
 
 
 if __name__ == "__main__":
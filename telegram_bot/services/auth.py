@@ -3,11 +3,21 @@ from typing import Optional
 
 from aiogram import types
 
-from config import API_ME, API_GET_USER_BOT_TOKEN
-from http_client import http_client
+from config import API_GET_USER_BOT_TOKEN, DJANGO_API_BASE_URL
+from http_client import conditional_get, http_client
+from services.cache import AsyncTTLCache
 
 logger = logging.getLogger(__name__)
 
+API_SESSION = f"{DJANGO_API_BASE_URL}/api/bot/session/"
+NOT_LINKED_TEXT = "❌ Аккаунт не привязан. Откройте веб-приложение и привяжите через /start <токен>."
+
+# Привязка/роль/личный бот чата меняются редко: держим их в памяти, сбрасываем после
+# /personal_off и привязки аккаунта, остальные изменения подхватываются по TTL
+SESSION_CACHE_TTL = 60
+_session_cache = AsyncTTLCache(maxsize=10000, ttl=SESSION_CACHE_TTL)
+_bot_token_cache = AsyncTTLCache(maxsize=10000, ttl=SESSION_CACHE_TTL)
+
 
 def parse_status_token(token: str) -> str:
     t = (token or '').strip().lower()
@@ -40,31 +50,102 @@ def parse_status_token(token: str) -> str:
     return mapping.get(t, t)
 
 
-async def is_admin(chat_id: str) -> bool:
+def invalidate_chat(chat_id: str) -> None:
+    """Сбросить закэшированные сессию и токен личного бота чата (после изменения привязки)."""
+    _session_cache.invalidate(str(chat_id))
+    _bot_token_cache.invalidate(str(chat_id))
+
+
+async def get_session(chat_id: str, include: Optional[str] = None, **params) -> Optional[dict]:
+    """Привязка, роль, флаг личного бота и (include=...) данные команды — одним запросом к API.
+
+    Без include ответ берётся из кэша; запрос с данными обновляет кэш заодно.
+    None — ошибка соединения.
+    """
+    chat_id = str(chat_id)
+    if not include:
+        return await _session_cache.get_or_load(chat_id, lambda: _fetch_session(chat_id))
+
+    session = await _fetch_session(chat_id, include, **params)
+    if session is not None:
+        _session_cache.set(chat_id, {
+            key: value for key, value in session.items() if key not in ('payload', 'payload_status')
+        })
+    return session
+
+
+async def _fetch_session(chat_id: str, include: Optional[str] = None, **params) -> Optional[dict]:
+    query = {'chat_id': chat_id}
+    if include:
+        query['include'] = include
+    query.update({key: str(value) for key, value in params.items() if value is not None})
     try:
-        r = await http_client.get(API_ME, params={'chat_id': str(chat_id)})
+        # Сессия с данными отдаётся с ETag: при 304 тело берётся из локального кэша
+        r = await conditional_get(API_SESSION, params=query)
         if r.status_code == 200:
-            return bool(r.json().get('is_admin'))
+            return r.json()
+        logger.error("Session request failed for %s: %s", chat_id, r.status_code)
     except Exception as e:
-        logger.error("Error checking admin role: %s", e)
-    return False
+        logger.error("Error getting session for %s: %s", chat_id, e)
+    return None
+
 
+async def require_session(
+    message: types.Message,
+    chat_id: str,
+    include: Optional[str] = None,
+    session: Optional[dict] = None,
+    **params,
+) -> Optional[dict]:
+    """Сессия привязанного чата (запрашивается, если не передана или в ней нет нужных данных).
 
-async def ensure_linked(message: types.Message) -> bool:
+    None — пользователю уже отправлено сообщение об ошибке или отсутствии привязки.
+    """
+    if session is None or (include and 'payload' not in session):
+        session = await get_session(chat_id, include=include, **params)
+    if session is None:
+        await message.answer("❌ Ошибка соединения с сервером.")
+        return None
+    if not session.get('linked'):
+        await message.answer(NOT_LINKED_TEXT)
+        return None
+    return session
+
+
+async def is_admin(chat_id: str, session: Optional[dict] = None) -> bool:
+    if session is None:
+        session = await get_session(chat_id)
+    return bool(session and session.get('is_admin'))
+
+
+async def ensure_linked(message: types.Message, session: Optional[dict] = None) -> bool:
     """Проверка привязки аккаунта для команд (кроме /start)."""
-    chat_id = str(message.chat.id)
-    try:
-        r = await http_client.get(API_ME, params={'chat_id': chat_id})
-        if r.status_code == 200 and r.json().get('linked'):
-            return True
-    except Exception:
-        pass
-    await message.answer("❌ Аккаунт не привязан. Откройте веб-приложение и привяжите через /start <токен>.")
+    if session is None:
+        session = await get_session(str(message.chat.id))
+    if session and session.get('linked'):
+        return True
+    await message.answer(NOT_LINKED_TEXT)
     return False
 
 
+async def has_personal_bot(chat_id: str, session: Optional[dict] = None) -> bool:
+    if session is None:
+        session = await get_session(chat_id)
+    return bool(session and session.get('personal_bot'))
+
+
 async def get_user_bot_token(chat_id: str) -> Optional[str]:
-    """Получить токен личного бота пользователя из Django API"""
+    """Получить токен личного бота пользователя из Django API (с кэшированием)"""
+    chat_id = str(chat_id)
+    token = await _bot_token_cache.get_or_load(chat_id, lambda: fetch_user_bot_token(chat_id))
+    return token or None
+
+
+async def fetch_user_bot_token(chat_id: str) -> Optional[str]:
+    """Токен личного бота без кэша: '' — личного бота нет, None — ошибка запроса.
+
+    404 — к чату больше не привязан пользователь (перепривязка): личного бота у чата нет.
+    """
     try:
         response = await http_client.get(
             API_GET_USER_BOT_TOKEN,
@@ -72,7 +153,10 @@ async def get_user_bot_token(chat_id: str) -> Optional[str]:
         )
         if response.status_code == 200:
             data = response.json()
-            return data.get('personal_bot_token')
+            return data.get('personal_bot_token') or ''
+        if response.status_code == 404:
+            return ''
+        logger.error("User bot token request failed for %s: %s", chat_id, response.status_code)
     except Exception as e:
         logger.error("Error getting user bot token for %s: %s", chat_id, e)
     return None
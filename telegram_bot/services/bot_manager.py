@@ -1,18 +1,38 @@
 import asyncio
 import logging
+import os
+import random
+import time
 from typing import Dict
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.exceptions import TelegramUnauthorizedError
 
 from config import DJANGO_API_BASE_URL
 from http_client import http_client
 from handlers.personal import register_personal_bot_handlers
+from services import sharding
+from services.auth import fetch_user_bot_token, invalidate_chat
+from services.webhook import attach_bot, detach_bot, webhook_mode
 
 logger = logging.getLogger(__name__)
 
 personal_bots: Dict[str, Bot] = {}
 dispatchers: Dict[str, Dispatcher] = {}
+# Все личные боты (chat_id -> токен), не только запущенные здесь: из API и событий Django
+roster: Dict[str, str] = {}
+# Состояние каждого запущенного бота для /health: starting / running / backoff / failed
+bot_health: Dict[str, dict] = {}
+_supervisors: Dict[str, asyncio.Task] = {}
+
+# Одновременные запуски (getMe/setWebhook): сотни ботов стартуют параллельно, но без всплеска запросов
+BOT_STARTUP_CONCURRENCY = int(os.getenv('BOT_STARTUP_CONCURRENCY', '20'))
+BOT_RESTART_BASE_DELAY = 1.0
+BOT_RESTART_MAX_DELAY = 300.0
+# Бот, проработавший дольше, считается восстановившимся: задержка начинается заново
+BOT_STABLE_AFTER = 60.0
+_startup_semaphore = asyncio.Semaphore(BOT_STARTUP_CONCURRENCY)
 
 
 async def create_personal_bot(token: str, chat_id: str) -> None:
@@ -26,50 +46,283 @@ async def create_personal_bot(token: str, chat_id: str) -> None:
         personal_bots[chat_id] = bot
         dispatchers[chat_id] = dp
 
-        asyncio.create_task(run_personal_bot_polling(dp, bot, chat_id))
+        _supervisors[chat_id] = asyncio.create_task(supervise_personal_bot(dp, bot, chat_id))
         logger.info("Personal bot started for user %s", chat_id)
     except Exception as e:
         logger.error("Error creating personal bot for %s: %s", chat_id, e)
 
 
-async def run_personal_bot_polling(dp: Dispatcher, bot: Bot, chat_id: str) -> None:
-    """Запуск polling для личного бота"""
+def restart_delay(failures: int) -> float:
+    """Экспоненциальная задержка перезапуска с джиттером (боты, упавшие вместе, не рестартуют разом)."""
+    cap = min(BOT_RESTART_MAX_DELAY, BOT_RESTART_BASE_DELAY * 2 ** (failures - 1))
+    return cap / 2 + random.uniform(0, cap / 2)
+
+
+def _set_health(chat_id: str, state: str, error: Exception | None = None, **extra) -> None:
+    health = bot_health.setdefault(chat_id, {'restarts': 0})
+    health.pop('retry_in', None)
+    health.update(state=state, since=time.time(), last_error=repr(error) if error else health.get('last_error'), **extra)
+
+
+async def supervise_personal_bot(dp: Dispatcher, bot: Bot, chat_id: str) -> None:
+    """Держит личного бота запущенным: после сбоя — перезапуск с экспоненциальной задержкой.
+
+    Выходит при штатной остановке (stop_personal_bot) или отозванном токене (ждём новый из Django).
+    """
+    loop = asyncio.get_running_loop()
+    failures = 0
+    bot_health.pop(chat_id, None)
+    _set_health(chat_id, 'starting')
+    # Бот мог быть уже заменён новым (смена токена) — работаем, только пока он наш
+    while personal_bots.get(chat_id) is bot:
+        started_at = loop.time()
+        try:
+            async with _startup_semaphore:
+                if webhook_mode():
+                    await attach_bot(bot, dp)
+                else:
+                    await bot.me()
+            _set_health(chat_id, 'running')
+            if webhook_mode():
+                return
+            await dp.start_polling(bot, handle_signals=False, close_bot_session=False)
+            return
+        except TelegramUnauthorizedError as e:
+            logger.error("Personal bot token for %s is revoked: %s", chat_id, e)
+            _set_health(chat_id, 'failed', e)
+            return
+        except Exception as e:
+            failures = 1 if loop.time() - started_at > BOT_STABLE_AFTER else failures + 1
+            delay = restart_delay(failures)
+            bot_health[chat_id]['restarts'] += 1
+            _set_health(chat_id, 'backoff', e, retry_in=round(delay, 1))
+            logger.warning("Personal bot for %s failed (%s), restarting in %.1fs", chat_id, e, delay)
+            await asyncio.sleep(delay)
+
+
+async def stop_personal_bot(chat_id: str) -> None:
+    """Остановить polling личного бота и закрыть его HTTP-сессию"""
+    bot = personal_bots.pop(chat_id, None)
+    dp = dispatchers.pop(chat_id, None)
+    supervisor = _supervisors.pop(chat_id, None)
+    bot_health.pop(chat_id, None)
+    polling = False
+    if webhook_mode():
+        if bot is not None:
+            await detach_bot(bot)
+    elif dp is not None:
+        try:
+            await dp.stop_polling()
+            polling = True
+        except RuntimeError:
+            # polling уже остановлен (или бот ждёт перезапуска)
+            pass
+    if supervisor is not None and not supervisor.done():
+        # Даём polling завершиться штатно; бот в ожидании перезапуска (или запуска) отменяем сразу
+        if polling:
+            await asyncio.wait({supervisor}, timeout=5)
+        supervisor.cancel()
+    if bot is not None:
+        await bot.session.close()
+        logger.info("Personal bot stopped for user %s", chat_id)
+    await sharding.release(chat_id)
+
+
+async def sync_personal_bot(chat_id: str) -> None:
+    """Привести личного бота чата к состоянию в Django: запустить, перезапустить с новым токеном или остановить"""
+    invalidate_chat(chat_id)
+    token = await fetch_user_bot_token(chat_id)
+    if token is None:
+        logger.warning("Could not refresh personal bot for %s", chat_id)
+        return
+    if token:
+        roster[chat_id] = token
+    else:
+        roster.pop(chat_id, None)
+    await _apply_personal_bot(chat_id, token)
+
+
+async def _apply_personal_bot(chat_id: str, token: str | None) -> None:
+    current = personal_bots.get(chat_id)
+    if current is not None and current.token == token:
+        return
+    if current is not None:
+        await stop_personal_bot(chat_id)
+    # При шардировании бота запускает только воркер-владелец chat_id (под арендой)
+    if token and await sharding.claim(chat_id):
+        await create_personal_bot(token, chat_id)
+
+
+ROSTER_PAGE_SIZE = 500
+ROSTER_REFRESH_INTERVAL = 60
+# Полная сверка реже: инкремент не видит смену chat_id у профиля (старый чат остаётся в реестре)
+ROSTER_FULL_REFRESH_INTERVAL = 600
+_roster_since: str | None = None
+_roster_full_at = 0.0
+
+
+async def _get_with_backoff(url: str, params: dict, attempts: int = 5):
+    for attempt in range(1, attempts + 1):
+        try:
+            return await http_client.get(url, params=params)
+        except Exception as e:
+            if attempt == attempts:
+                logger.error("Request to %s failed: %s", url, e)
+                return None
+            await asyncio.sleep(restart_delay(attempt))
+
+
+async def fetch_personal_bot_roster(updated_since: str | None = None) -> tuple[Dict[str, str | None], str] | None:
+    """Реестр личных ботов постранично: chat_id -> токен (None — бот отключён) и метка следующего обновления.
+
+    Без updated_since — все настроенные боты, иначе только изменившиеся с этого момента. None — ошибка.
+    """
+    url = f"{DJANGO_API_BASE_URL}/api/bot/personal-bots/"
+    params = {'page_size': ROSTER_PAGE_SIZE}
+    if updated_since:
+        params['updated_since'] = updated_since
+    entries: Dict[str, str | None] = {}
+    next_since = None
+    while True:
+        response = await _get_with_backoff(url, params)
+        if response is None or response.status_code != 200:
+            logger.warning("Failed to get personal bots roster: %s", getattr(response, 'status_code', None))
+            return None
+        page = response.json()
+        # Метка с первой страницы: изменения во время обхода придут в следующем обновлении
+        next_since = next_since or page.get('next_updated_since')
+        for user in page.get('results') or []:
+            if user.get('telegram_chat_id'):
+                entries[str(user['telegram_chat_id'])] = user.get('personal_bot_token') or None
+        if not page.get('next_cursor'):
+            return entries, next_since
+        params['cursor'] = page['next_cursor']
+
+
+async def refresh_roster() -> set[str] | None:
+    """Обновляет roster (полностью раз в ROSTER_FULL_REFRESH_INTERVAL, иначе по изменениям).
+
+    Возвращает chat_id, у которых изменился токен; None — реестр получить не удалось.
+    """
+    global _roster_since, _roster_full_at
+    now = asyncio.get_running_loop().time()
+    full = _roster_since is None or now - _roster_full_at > ROSTER_FULL_REFRESH_INTERVAL
+    result = await fetch_personal_bot_roster(None if full else _roster_since)
+    if result is None:
+        return None
+    entries, next_since = result
+
+    before = dict(roster)
+    if full:
+        roster.clear()
+        _roster_full_at = now
+    for chat_id, token in entries.items():
+        if token:
+            roster[chat_id] = token
+        else:
+            roster.pop(chat_id, None)
+    _roster_since = next_since
+    return {chat_id for chat_id in before.keys() | roster.keys() if before.get(chat_id) != roster.get(chat_id)}
+
+
+async def initialize_existing_personal_bots() -> None:
+    """Запускаем личных ботов для уже привязанных пользователей при старте
+
+    Запуск не ждёт сети: getMe/setWebhook выполняют супервизоры параллельно (не больше
+    BOT_STARTUP_CONCURRENCY одновременно).
+    """
     try:
-        await dp.start_polling(bot)
+        if await refresh_roster() is None:
+            return
+        logger.info("Found %s users with personal bots", len(roster))
+        for chat_id, token in list(roster.items()):
+            logger.info("Starting personal bot for user %s", chat_id)
+            await create_personal_bot(token, chat_id)
     except Exception as e:
-        logger.error("Personal bot polling failed for %s: %s", chat_id, e)
-        personal_bots.pop(chat_id, None)
-        dispatchers.pop(chat_id, None)
+        logger.error("Error initializing personal bots: %s", e)
 
 
-async def initialize_existing_personal_bots() -> None:
-    """Запускаем личных ботов для уже привязанных пользователей при старте"""
+async def run_roster_refresh() -> None:
+    """Страховка к событиям Django: периодически сверяет запущенных личных ботов с реестром."""
+    while True:
+        await asyncio.sleep(ROSTER_REFRESH_INTERVAL)
+        try:
+            for chat_id in await refresh_roster() or ():
+                await _apply_personal_bot(chat_id, roster.get(chat_id))
+        except Exception as e:
+            logger.error("Roster refresh failed: %s", e)
+
+
+async def _start_system_bot(bot: Bot, dp: Dispatcher) -> asyncio.Task | None:
+    if webhook_mode():
+        await attach_bot(bot, dp)
+        return None
+    return asyncio.create_task(dp.start_polling(bot, handle_signals=False))
+
+
+async def _stop_system_bot(bot: Bot, dp: Dispatcher) -> None:
+    if webhook_mode():
+        await detach_bot(bot)
+        return
     try:
-        users_url = f"{DJANGO_API_BASE_URL}/api/bot/get-users-with-personal-bots/"
+        await dp.stop_polling()
+    except RuntimeError:
+        pass
 
-        response = None
-        last_exc: Exception | None = None
-        for _ in range(5):
+
+async def run_sharded_bots(system_bot: Bot, system_dp: Dispatcher) -> None:
+    """Режим шардирования: держит запущенными ровно «свои» боты (личные и, если выпал, системный).
+
+    Каждые HEARTBEAT_INTERVAL секунд: heartbeat, остановка ботов, ушедших к другим воркерам или
+    потерявших аренду, запуск новых своих (по списку из API, обновляемому раз в минуту).
+    """
+    roster_loaded_at = 0.0
+    system_running = False
+    system_task: asyncio.Task | None = None
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
             try:
-                response = await http_client.get(users_url)
-                last_exc = None
-                break
-            except Exception as e:
-                last_exc = e
-                await asyncio.sleep(1)
-
-        if response is None:
-            raise last_exc or RuntimeError('Failed to fetch users with personal bots')
-
-        if response.status_code == 200:
-            users = response.json()
-            logger.info("Found %s users with personal bots", len(users))
-            for user in users:
-                if user.get('personal_bot_token') and user.get('telegram_chat_id'):
-                    logger.info("Starting personal bot for user %s", user.get('username'))
-                    await create_personal_bot(user['personal_bot_token'], user['telegram_chat_id'])
-        else:
-            logger.warning("Failed to get users with personal bots: %s", response.status_code)
+                await sharding.heartbeat()
+                if loop.time() - roster_loaded_at > ROSTER_REFRESH_INTERVAL:
+                    if await refresh_roster() is not None:
+                        roster_loaded_at = loop.time()
+                if system_task is not None and system_task.done():
+                    # polling системного бота упал — аренда ещё наша, перезапустим ниже
+                    system_running, system_task = False, None
 
-    except Exception as e:
-        logger.error("Error initializing personal bots: %s", e)
+                held = list(personal_bots)
+                if system_running:
+                    held.append(sharding.SYSTEM_BOT_KEY)
+                renewed = dict(zip(held, await sharding.renew(held)))
+
+                if system_running and not (renewed[sharding.SYSTEM_BOT_KEY] and sharding.owns(sharding.SYSTEM_BOT_KEY)):
+                    await _stop_system_bot(system_bot, system_dp)
+                    await sharding.release(sharding.SYSTEM_BOT_KEY)
+                    system_running = False
+                    logger.info("System bot handed over to another worker")
+                elif not system_running and await sharding.claim(sharding.SYSTEM_BOT_KEY):
+                    system_task = await _start_system_bot(system_bot, system_dp)
+                    system_running = True
+                    logger.info("System bot started on worker %s", sharding.WORKER_ID)
+
+                for chat_id in held:
+                    if chat_id == sharding.SYSTEM_BOT_KEY:
+                        continue
+                    if not renewed[chat_id] or not sharding.owns(chat_id) or chat_id not in roster:
+                        await stop_personal_bot(chat_id)
+
+                for chat_id, token in list(roster.items()):
+                    if chat_id not in personal_bots and await sharding.claim(chat_id):
+                        await create_personal_bot(token, chat_id)
+            except Exception as e:
+                logger.error("Shard rebalance failed: %s", e)
+            await asyncio.sleep(sharding.HEARTBEAT_INTERVAL)
+    finally:
+        # Корректная остановка: отдаём боты другим воркерам сразу, не дожидаясь истечения аренд
+        for chat_id in list(personal_bots):
+            await stop_personal_bot(chat_id)
+        if system_running:
+            await _stop_system_bot(system_bot, system_dp)
+            await sharding.release(sharding.SYSTEM_BOT_KEY)
+        await sharding.leave()
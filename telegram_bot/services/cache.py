@@ -0,0 +1,75 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+_MISSING = object()
+
+
+class AsyncTTLCache:
+    """LRU-кэш с TTL для результатов асинхронных загрузок (in-process).
+
+    Одновременные промахи по одному ключу делят один запрос (single-flight).
+    invalidate() отбрасывает и значение, и результат загрузки, начатой до сброса.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._pending: dict[Hashable, asyncio.Future] = {}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+        self._pending.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._pending.clear()
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        cache_if: Callable[[Any], bool] = lambda value: value is not None,
+    ) -> Any:
+        """Значение из кэша или результат loader(); в кэш попадает только то, что прошло cache_if."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(loader())
+            self._pending[key] = future
+            future.add_done_callback(lambda done: self._store(key, done, cache_if))
+        # shield: отмена одного ожидающего не отменяет общий запрос для остальных
+        return await asyncio.shield(future)
+
+    def _store(self, key: Hashable, future: asyncio.Future, cache_if: Callable[[Any], bool]) -> None:
+        if self._pending.get(key) is not future:
+            # Ключ сброшен во время загрузки — результат мог устареть
+            return
+        del self._pending[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        value = future.result()
+        if cache_if(value):
+            self.set(key, value)
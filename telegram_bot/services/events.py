@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+from collections import defaultdict
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from services import bot_manager, sharding
+from services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+BOT_EVENTS_STREAM = os.getenv('BOT_EVENTS_STREAM', 'taskflow:bot-events')
+BOT_EVENTS_GROUP = 'telegram-bot'
+BOT_EVENTS_BATCH = 100
+# Неотправленные сообщения остаются неподтверждёнными и повторяются не чаще раза в интервал
+BOT_EVENTS_RETRY_INTERVAL = float(os.getenv('BOT_EVENTS_RETRY_INTERVAL', '30'))
+BOT_EVENTS_MAX_DELIVERIES = int(os.getenv('BOT_EVENTS_MAX_DELIVERIES', '5'))
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def _join_messages(messages: list[tuple[str, str]]) -> list[tuple[list[str], str]]:
+    """Склеивает сообщения одному чату в минимум отправок (с учётом лимита длины Telegram).
+
+    messages — (id события, текст); в каждой отправке — id вошедших в неё событий.
+    """
+    chunks: list[tuple[list[str], str]] = []
+    for entry_id, text in messages:
+        if chunks and len(chunks[-1][1]) + 2 + len(text) <= TELEGRAM_MESSAGE_LIMIT:
+            chunks[-1][0].append(entry_id)
+            chunks[-1] = (chunks[-1][0], f"{chunks[-1][1]}\n\n{text}")
+        else:
+            chunks.append(([entry_id], text))
+    return chunks
+
+
+def _delivers(chat_id: str, lease_holder: str | None) -> bool:
+    """Отправляет ли этот воркер сообщения чата при шардировании.
+
+    Решает аренда личного бота, а не хэш: при переезде бота новый владелец по хэшу ещё не запустил
+    его, и сообщения ушли бы от системного бота. Чаты без аренды (нет личного бота) — по хэшу.
+    """
+    if lease_holder is not None:
+        return lease_holder == sharding.WORKER_ID
+    return sharding.owns(chat_id)
+
+
+async def handle_events(system_bot: Bot, entries: list) -> set[str]:
+    """Обрабатывает пачку событий: сначала смена личных ботов, затем склеенные сообщения по чатам.
+
+    Возвращает id событий, сообщения которых отправить не удалось: их не подтверждают, и они
+    уходят повторно (см. run_bot_events_listener). После 429 бот в этой пачке больше не пишет.
+    """
+    chats_to_sync: set[str] = set()
+    outgoing: dict[tuple[str, bool], list[tuple[str, str]]] = defaultdict(list)
+    for entry_id, fields in entries:
+        try:
+            data = json.loads(fields.get('data') or '{}')
+        except ValueError:
+            logger.warning("Malformed bot event: %s", fields)
+            continue
+        event_type = fields.get('type')
+        if event_type == 'personal_bot':
+            chats_to_sync.update(str(chat_id) for chat_id in data.get('chat_ids') or [])
+        elif event_type == 'notify' and data.get('chat_id') and data.get('text'):
+            outgoing[(str(data['chat_id']), bool(data.get('personal')))].append((entry_id, data['text']))
+
+    for chat_id in sorted(chats_to_sync):
+        await bot_manager.sync_personal_bot(chat_id)
+
+    if sharding.SHARDING_ENABLED and outgoing:
+        holders = await sharding.lease_holders(sorted({chat_id for chat_id, _ in outgoing}))
+        outgoing = {
+            (chat_id, personal): messages
+            for (chat_id, personal), messages in outgoing.items()
+            if _delivers(chat_id, holders.get(chat_id))
+        }
+
+    failed: set[str] = set()
+    throttled: set[int] = set()
+    for (chat_id, personal), messages in outgoing.items():
+        bot = (bot_manager.personal_bots.get(chat_id) if personal else None) or system_bot
+        for entry_ids, text in _join_messages(messages):
+            if bot.id in throttled:
+                failed.update(entry_ids)
+                continue
+            try:
+                await bot.send_message(chat_id, text)
+            except TelegramRetryAfter as e:
+                logger.warning("Flood control for bot %s, retry after %ss", bot.id, e.retry_after)
+                throttled.add(bot.id)
+                failed.update(entry_ids)
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Чат заблокировал бота или не существует — повтор не поможет
+                logger.error("Notification to %s rejected: %s", chat_id, e)
+            except Exception as e:
+                logger.error("Failed to deliver notification to %s: %s", chat_id, e)
+                failed.update(entry_ids)
+    return failed
+
+
+async def _claim_retries(client, group: str, consumer: str) -> list:
+    """Забирает неподтверждённые события группы, пролежавшие дольше BOT_EVENTS_RETRY_INTERVAL
+    (свои неотправленные и оставшиеся от упавших потребителей). Исчерпавшие попытки подтверждаются
+    с записью в лог, чтобы не повторяться бесконечно."""
+    idle = int(BOT_EVENTS_RETRY_INTERVAL * 1000)
+    pending = await client.xpending_range(
+        BOT_EVENTS_STREAM, group, min='-', max='+', count=BOT_EVENTS_BATCH, idle=idle,
+    )
+    exhausted = [item['message_id'] for item in pending if item['times_delivered'] >= BOT_EVENTS_MAX_DELIVERIES]
+    if exhausted:
+        logger.error("Dropping %s bot events after %s delivery attempts: %s", len(exhausted), BOT_EVENTS_MAX_DELIVERIES, exhausted)
+        await client.xack(BOT_EVENTS_STREAM, group, *exhausted)
+    retry = [item['message_id'] for item in pending if item['times_delivered'] < BOT_EVENTS_MAX_DELIVERIES]
+    if not retry:
+        return []
+    return await client.xclaim(BOT_EVENTS_STREAM, group, consumer, min_idle_time=idle, message_ids=retry)
+
+
+async def run_bot_events_listener(system_bot: Bot) -> None:
+    """Читает события Django из Redis Stream (consumer group) и применяет их без перезапуска бота.
+
+    После рестарта сначала дочитываются свои неподтверждённые события, затем новые. Подтверждаются
+    только доставленные; неотправленные раз в BOT_EVENTS_RETRY_INTERVAL забираются повторно (до
+    BOT_EVENTS_MAX_DELIVERIES попыток). При ошибках Redis — переподключение с паузой.
+    """
+    from redis.exceptions import ResponseError
+
+    consumer = os.getenv('BOT_EVENTS_CONSUMER') or socket.gethostname()
+    # При шардировании каждому воркеру нужны все события (своя группа), иначе — одна общая группа
+    group = f"{BOT_EVENTS_GROUP}:{sharding.WORKER_ID}" if sharding.SHARDING_ENABLED else BOT_EVENTS_GROUP
+    client = get_redis()
+    group_ready = False
+    backlog = True
+    loop = asyncio.get_running_loop()
+    next_retry_at = loop.time() + BOT_EVENTS_RETRY_INTERVAL
+    while True:
+        try:
+            if not group_ready:
+                try:
+                    await client.xgroup_create(BOT_EVENTS_STREAM, group, id='$', mkstream=True)
+                except ResponseError as e:
+                    if 'BUSYGROUP' not in str(e):
+                        raise
+                group_ready = True
+
+            if backlog:
+                streams = await client.xreadgroup(
+                    group, consumer, {BOT_EVENTS_STREAM: '0'}, count=BOT_EVENTS_BATCH,
+                )
+                entries = streams[0][1] if streams else []
+                # Неотправленные из backlog остаются в PENDING — дальше их повторяет _claim_retries
+                backlog = False
+            elif loop.time() >= next_retry_at:
+                entries = await _claim_retries(client, group, consumer)
+                next_retry_at = loop.time() + BOT_EVENTS_RETRY_INTERVAL
+            else:
+                streams = await client.xreadgroup(
+                    group, consumer, {BOT_EVENTS_STREAM: '>'}, count=BOT_EVENTS_BATCH, block=5000,
+                )
+                entries = streams[0][1] if streams else []
+            # xclaim возвращает (id, None) для событий, удалённых из потока по MAXLEN
+            entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+            if not entries:
+                continue
+            failed = await handle_events(system_bot, entries)
+            delivered = [entry_id for entry_id, _ in entries if entry_id not in failed]
+            if delivered:
+                await client.xack(BOT_EVENTS_STREAM, group, *delivered)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Bot events listener error: %s", e)
+            # Неподтверждённые события перечитаем после переподключения
+            group_ready = False
+            backlog = True
+            await asyncio.sleep(5)
@@ -0,0 +1,38 @@
+import os
+from collections import Counter
+
+from aiohttp import web
+
+from services import bot_manager, sharding
+from services.webhook import WEBHOOK_HOST
+
+# Внутренний порт с подробным /health (chat_id и ошибки каждого бота) — наружу его не публикуют.
+# На публичном сервере webhook /health отдаёт только сводку по статусам
+BOT_HEALTH_PORT = int(os.getenv('BOT_HEALTH_PORT', '0'))
+BOT_HEALTH_HOST = os.getenv('BOT_HEALTH_HOST', WEBHOOK_HOST)
+
+
+def health_summary() -> dict:
+    """Сводка по статусам личных ботов процесса (без chat_id и текстов ошибок)."""
+    return {'states': dict(Counter(health['state'] for health in bot_manager.bot_health.values()))}
+
+
+def health_snapshot() -> dict:
+    """Подробное состояние: сводка, воркер и детали по каждому chat_id (только для внутреннего порта)."""
+    return {
+        'worker': sharding.WORKER_ID,
+        **health_summary(),
+        'bots': bot_manager.bot_health,
+    }
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response(health_summary())
+
+
+async def handle_health_details(request: web.Request) -> web.Response:
+    return web.json_response(health_snapshot())
+
+
+def add_health_routes(app: web.Application, detailed: bool = False) -> None:
+    app.router.add_get('/health', handle_health_details if detailed else handle_health)
@@ -0,0 +1,15 @@
+import os
+
+REDIS_URL = os.getenv('REDIS_URL', 'redis://redis:6379/0')
+
+_client = None
+
+
+def get_redis():
+    """Общий для процесса асинхронный клиент Redis (поток событий, шардирование ботов)."""
+    global _client
+    if _client is None:
+        import redis.asyncio as aioredis
+
+        _client = aioredis.from_url(REDIS_URL, decode_responses=True)
+    return _client
@@ -0,0 +1,124 @@
+import hashlib
+import logging
+import os
+import socket
+import time
+from typing import Iterable, Optional
+
+from services.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# BOT_SHARDING=True: несколько процессов бота делят личных ботов по chat_id (rendezvous hashing).
+# Живые воркеры — zset с heartbeat; бот запускается только под арендой (lease) в Redis, поэтому
+# при смене состава два воркера не опрашивают один токен, а боты упавшего воркера забирают остальные.
+SHARDING_ENABLED = os.getenv('BOT_SHARDING', 'False') == 'True'
+# При шардировании id должен переживать рестарт: по нему же названа группа потока событий воркера
+WORKER_ID_STABLE = bool(os.getenv('BOT_WORKER_ID'))
+WORKER_ID = os.getenv('BOT_WORKER_ID') or f"{socket.gethostname()}:{os.getpid()}"
+HEARTBEAT_INTERVAL = float(os.getenv('BOT_SHARD_HEARTBEAT', '5'))
+WORKER_TTL = HEARTBEAT_INTERVAL * 3
+LEASE_TTL = HEARTBEAT_INTERVAL * 6
+
+WORKERS_KEY = 'taskflow:bot-workers'
+LEASE_KEY = 'taskflow:bot-lease:{key}'
+SYSTEM_BOT_KEY = 'system'
+
+# Продление/снятие только своих аренд
+_RENEW_SCRIPT = """
+local held = {}
+for i, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[1] then
+        redis.call('PEXPIRE', key, ARGV[2])
+        held[i] = 1
+    else
+        held[i] = 0
+    end
+end
+return held
+"""
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_workers: list[str] = [WORKER_ID]
+
+
+def shard_owner(key: str, workers: Iterable[str]) -> Optional[str]:
+    """Владелец ключа среди воркеров (rendezvous hashing: при уходе воркера переезжают только его ключи)."""
+    return max(
+        workers,
+        key=lambda worker: hashlib.md5(f"{worker}:{key}".encode()).hexdigest(),
+        default=None,
+    )
+
+
+def owns(key: str) -> bool:
+    """Принадлежит ли ключ (chat_id или SYSTEM_BOT_KEY) этому воркеру по последнему heartbeat."""
+    if not SHARDING_ENABLED:
+        return True
+    return shard_owner(key, _workers) == WORKER_ID
+
+
+def _lease_key(key: str) -> str:
+    return LEASE_KEY.format(key=key)
+
+
+async def heartbeat() -> list[str]:
+    """Отмечает воркер живым, вычищает пропавших и возвращает текущий состав."""
+    global _workers
+    client = get_redis()
+    now = time.time()
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.zadd(WORKERS_KEY, {WORKER_ID: now})
+        pipe.zremrangebyscore(WORKERS_KEY, '-inf', now - WORKER_TTL)
+        pipe.zrange(WORKERS_KEY, 0, -1)
+        *_, workers = await pipe.execute()
+    _workers = sorted(workers) or [WORKER_ID]
+    return _workers
+
+
+async def leave() -> None:
+    """Корректный выход: ключи сразу переходят к другим воркерам (аренды снимает вызывающий)."""
+    global _workers
+    await get_redis().zrem(WORKERS_KEY, WORKER_ID)
+    _workers = [WORKER_ID]
+
+
+async def claim(key: str) -> bool:
+    """Ключ наш по хэшу и аренда получена (или уже наша). Без шардирования — всегда True."""
+    if not SHARDING_ENABLED:
+        return True
+    if not owns(key):
+        return False
+    client = get_redis()
+    if await client.set(_lease_key(key), WORKER_ID, nx=True, px=int(LEASE_TTL * 1000)):
+        return True
+    return bool((await renew([key]))[0])
+
+
+async def renew(keys: list[str]) -> list[bool]:
+    """Продлевает аренды; False — аренда потеряна (истекла или занята другим воркером)."""
+    if not keys:
+        return []
+    script = get_redis().register_script(_RENEW_SCRIPT)
+    held = await script(keys=[_lease_key(key) for key in keys], args=[WORKER_ID, int(LEASE_TTL * 1000)])
+    return [bool(value) for value in held]
+
+
+async def lease_holders(keys: list[str]) -> dict[str, Optional[str]]:
+    """Текущие держатели аренд ключей (None — ключ сейчас никто не держит)."""
+    if not keys:
+        return {}
+    holders = await get_redis().mget([_lease_key(key) for key in keys])
+    return dict(zip(keys, holders))
+
+
+async def release(key: str) -> None:
+    if not SHARDING_ENABLED:
+        return
+    script = get_redis().register_script(_RELEASE_SCRIPT)
+    await script(keys=[_lease_key(key)], args=[WORKER_ID])
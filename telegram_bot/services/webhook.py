@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+from typing import Dict, Tuple
+
+from aiogram import Bot, Dispatcher, types
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# BOT_MODE=webhook: все боты процесса получают обновления через один HTTP-сервер
+# (/webhook/<bot_id>) вместо отдельного long polling на каждого бота
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL', '').rstrip('/')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8081'))
+WEBHOOK_PATH = '/webhook/{bot_id}'
+
+# bot_id (числовой id из токена) -> (бот, диспетчер)
+webhook_routes: Dict[str, Tuple[Bot, Dispatcher]] = {}
+_background_tasks: set = set()
+
+
+def webhook_mode() -> bool:
+    return BOT_MODE == 'webhook'
+
+
+def webhook_secret(bot_id: str) -> str:
+    # Свой secret_token на каждого бота: утечка одного не открывает остальные
+    return hmac.new(WEBHOOK_SECRET.encode(), str(bot_id).encode(), hashlib.sha256).hexdigest()
+
+
+async def attach_bot(bot: Bot, dp: Dispatcher) -> None:
+    """Добавить бота в маршрутизацию и зарегистрировать webhook в Bot API (setWebhook)."""
+    if not WEBHOOK_BASE_URL or not WEBHOOK_SECRET:
+        raise RuntimeError("WEBHOOK_BASE_URL and WEBHOOK_SECRET must be set in webhook mode")
+    bot_id = str(bot.id)
+    webhook_routes[bot_id] = (bot, dp)
+    await bot.set_webhook(
+        url=WEBHOOK_BASE_URL + WEBHOOK_PATH.format(bot_id=bot_id),
+        secret_token=webhook_secret(bot_id),
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+
+
+async def detach_bot(bot: Bot) -> None:
+    """Убрать бота из маршрутизации и снять webhook (deleteWebhook)."""
+    bot_id = str(bot.id)
+    if webhook_routes.get(bot_id, (None,))[0] is bot:
+        webhook_routes.pop(bot_id, None)
+    try:
+        await bot.delete_webhook()
+    except Exception as e:
+        # Токен мог быть отозван — для остановки это не важно
+        logger.warning("deleteWebhook failed for bot %s: %s", bot_id, e)
+
+
+async def handle_webhook(request: web.Request) -> web.Response:
+    bot_id = request.match_info['bot_id']
+    route = webhook_routes.get(bot_id)
+    if route is None:
+        return web.Response(status=404)
+    received = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not hmac.compare_digest(received, webhook_secret(bot_id)):
+        return web.Response(status=403)
+
+    bot, dp = route
+    try:
+        update = types.Update.model_validate(await request.json(), context={'bot': bot})
+    except ValueError:
+        return web.Response(status=400)
+    # Отвечаем Telegram сразу, обработка — в фоне (иначе медленный хэндлер задерживает доставку)
+    task = asyncio.create_task(dp.feed_update(bot, update))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return web.Response()
+
+
+def create_webhook_app() -> web.Application:
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handle_webhook)
+    return app
+
+
+async def start_http_server(app: web.Application, port: int = WEBHOOK_PORT, host: str = WEBHOOK_HOST) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Bot HTTP server listening on %s:%s", host, port)
+    return runner
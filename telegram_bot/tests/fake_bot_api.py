@@ -0,0 +1,78 @@
+"""Локальный фейковый Telegram Bot API для тестов бота (aiohttp-сервер в цикле теста)."""
+
+import json
+import re
+from collections import defaultdict, deque
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+_PATH_RE = re.compile(r'^/bot(?P<token>[^/]+)/(?P<method>\w+)$')
+
+
+class FakeBotAPI:
+    """Записывает вызовы Bot API и отвечает `ok`; для метода можно поставить в очередь свой ответ."""
+
+    def __init__(self):
+        self.calls = []
+        self._responses = defaultdict(deque)
+        app = web.Application()
+        app.router.add_post('/{path:.*}', self._handle)
+        self._server = TestServer(app)
+
+    @property
+    def base_url(self) -> str:
+        return str(self._server.make_url('')).rstrip('/')
+
+    async def start(self) -> 'FakeBotAPI':
+        await self._server.start_server()
+        return self
+
+    async def stop(self) -> None:
+        await self._server.close()
+
+    def enqueue(self, method: str, status: int, body: dict) -> None:
+        self._responses[method].append((status, body))
+
+    def calls_for(self, method: str):
+        return [call for call in self.calls if call['method'] == method]
+
+    def make_bot(self, token: str) -> Bot:
+        """Бот aiogram, который ходит в этот сервер вместо api.telegram.org."""
+        session = AiohttpSession(api=TelegramAPIServer.from_base(self.base_url))
+        return Bot(token=token, session=session, default=DefaultBotProperties(parse_mode=None))
+
+    def _respond(self, token: str, method: str, payload: dict):
+        self.calls.append({'token': token, 'method': method, 'payload': payload})
+        if self._responses[method]:
+            return self._responses[method].popleft()
+        if method == 'getMe':
+            bot_id = int(token.split(':', 1)[0])
+            return 200, {'ok': True, 'result': {
+                'id': bot_id, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot',
+            }}
+        if method == 'sendMessage':
+            return 200, {'ok': True, 'result': {
+                'message_id': len(self.calls), 'date': 0,
+                'chat': {'id': int(payload.get('chat_id', 0)), 'type': 'private'},
+                'text': payload.get('text', ''),
+            }}
+        return 200, {'ok': True, 'result': True}
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        match = _PATH_RE.match(request.path)
+        if not match:
+            return web.json_response({'ok': False, 'description': 'Not Found'}, status=404)
+        # aiogram шлёт параметры формой; вложенные объекты — строками JSON
+        payload = {}
+        for key, value in (await request.post()).items():
+            try:
+                payload[key] = json.loads(value)
+            except (TypeError, ValueError):
+                payload[key] = value
+        status, body = self._respond(match['token'], match['method'], payload)
+        return web.json_response(body, status=status)
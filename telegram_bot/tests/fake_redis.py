@@ -0,0 +1,114 @@
+"""Минимальный асинхронный Redis в памяти для тестов бота (часы задаёт тест)."""
+
+from services import sharding
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+class FakeRedis:
+    """Команды, которыми пользуется services.sharding: zset воркеров, аренды с PX и их скрипты."""
+
+    def __init__(self, clock: FakeClock):
+        self.clock = clock
+        self.zsets: dict[str, dict[str, float]] = {}
+        self._values: dict[str, tuple[str, float | None]] = {}
+
+    # Строки с истечением
+    def _get(self, key: str):
+        value, expires_at = self._values.get(key, (None, None))
+        if expires_at is not None and expires_at <= self.clock.now:
+            self._values.pop(key, None)
+            return None
+        return value
+
+    def _set(self, key: str, value: str, px: int | None = None) -> None:
+        self._values[key] = (value, self.clock.now + px / 1000 if px else None)
+
+    async def get(self, key: str):
+        return self._get(key)
+
+    async def mget(self, keys):
+        return [self._get(key) for key in keys]
+
+    async def set(self, key: str, value: str, nx: bool = False, px: int | None = None, ex: int | None = None):
+        if nx and self._get(key) is not None:
+            return None
+        self._set(key, value, ex * 1000 if ex else px)
+        return True
+
+    # Сортированные множества
+    async def zadd(self, key: str, mapping: dict):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    async def zrem(self, key: str, member: str):
+        self.zsets.get(key, {}).pop(member, None)
+
+    async def zremrangebyscore(self, key: str, low, high):
+        zset = self.zsets.get(key, {})
+        high = float(high)
+        for member in [member for member, score in zset.items() if score <= high]:
+            del zset[member]
+
+    async def zrange(self, key: str, start: int, end: int):
+        return [member for member, _ in sorted(self.zsets.get(key, {}).items(), key=lambda item: item[1])]
+
+    def pipeline(self, transaction: bool = True):
+        return _FakePipeline(self)
+
+    # Lua-скрипты аренд — их эквиваленты на Python
+    def register_script(self, script: str):
+        implementations = {
+            sharding._RENEW_SCRIPT: self._renew,
+            sharding._RELEASE_SCRIPT: self._release,
+        }
+        implementation = implementations[script]
+
+        async def run(keys, args):
+            return implementation(keys, args)
+
+        return run
+
+    def _renew(self, keys, args):
+        worker_id, px = args
+        held = []
+        for key in keys:
+            if self._get(key) == worker_id:
+                self._set(key, worker_id, px)
+                held.append(1)
+            else:
+                held.append(0)
+        return held
+
+    def _release(self, keys, args):
+        if self._get(keys[0]) == args[0]:
+            self._values.pop(keys[0], None)
+            return 1
+        return 0
+
+
+class _FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self._redis = redis
+        self._commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._commands.append(getattr(self._redis, name)(*args, **kwargs))
+        return queue
+
+    async def execute(self):
+        results = [await command for command in self._commands]
+        self._commands = []
+        return results
@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+
+import httpx
+from aiogram import Bot, Dispatcher
+
+from services import auth, bot_manager
+
+
+def _response(status: int, body: dict) -> httpx.Response:
+    return httpx.Response(status, json=body, request=httpx.Request('GET', auth.API_GET_USER_BOT_TOKEN))
+
+
+class SyncPersonalBotTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        bot_manager.roster.clear()
+        bot_manager.personal_bots.clear()
+        bot_manager.dispatchers.clear()
+        self.addCleanup(bot_manager.roster.clear)
+
+    def _running_bot(self, chat_id: str, token: str) -> Bot:
+        bot = Bot(token=token)
+        bot_manager.roster[chat_id] = token
+        bot_manager.personal_bots[chat_id] = bot
+        bot_manager.dispatchers[chat_id] = Dispatcher()
+        return bot
+
+    async def test_relinked_chat_stops_its_personal_bot(self):
+        self._running_bot('100', '42:old')
+        # Пользователь перепривязал Telegram: старый chat_id в Django больше не найден
+        get = mock.AsyncMock(return_value=_response(404, {'error': 'User not found'}))
+        with mock.patch.object(auth.http_client, 'get', get):
+            await bot_manager.sync_personal_bot('100')
+
+        self.assertNotIn('100', bot_manager.personal_bots)
+        self.assertNotIn('100', bot_manager.roster)
+
+    async def test_request_error_keeps_running_bot(self):
+        bot = self._running_bot('100', '42:old')
+        for result in (_response(502, {}), httpx.ConnectError('down')):
+            get = mock.AsyncMock(side_effect=[result])
+            with mock.patch.object(auth.http_client, 'get', get):
+                await bot_manager.sync_personal_bot('100')
+
+            self.assertIs(bot_manager.personal_bots['100'], bot)
+            self.assertEqual(bot_manager.roster['100'], '42:old')
+        await bot.session.close()
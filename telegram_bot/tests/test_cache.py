@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from services.cache import AsyncTTLCache
+
+
+class AsyncTTLCacheTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch('services.cache.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_value_expires_after_ttl(self):
+        cache = AsyncTTLCache(ttl=10)
+        cache.set('a', 1)
+        self.now += 9.9
+        self.assertEqual(cache.get('a'), 1)
+        self.now += 0.1
+        self.assertIsNone(cache.get('a'))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = AsyncTTLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+
+    async def test_concurrent_misses_share_one_load(self):
+        cache = AsyncTTLCache()
+        release = asyncio.Event()
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return 'value'
+
+        waiters = [asyncio.create_task(cache.get_or_load('a', loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        self.assertEqual(await asyncio.gather(*waiters), ['value'] * 3)
+        self.assertEqual(calls, 1)
+        self.assertEqual(await cache.get_or_load('a', loader), 'value')
+        self.assertEqual(calls, 1)
+
+    async def test_invalidate_during_load_drops_its_result(self):
+        cache = AsyncTTLCache()
+        release = asyncio.Event()
+
+        async def stale_loader():
+            await release.wait()
+            return 'stale'
+
+        async def fresh_loader():
+            return 'fresh'
+
+        waiter = asyncio.create_task(cache.get_or_load('a', stale_loader))
+        await asyncio.sleep(0)
+        cache.invalidate('a')
+        release.set()
+        # Начатый до сброса запрос получает свой ответ, но в кэш он не попадает
+        self.assertEqual(await waiter, 'stale')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(await cache.get_or_load('a', fresh_loader), 'fresh')
+        self.assertEqual(cache.get('a'), 'fresh')
+
+    async def test_loader_error_is_not_cached(self):
+        cache = AsyncTTLCache()
+        results = [RuntimeError('down'), 'value']
+
+        async def loader():
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        with self.assertRaises(RuntimeError):
+            await cache.get_or_load('a', loader)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(await cache.get_or_load('a', loader), 'value')
+
+    async def test_rejected_value_is_not_cached(self):
+        cache = AsyncTTLCache()
+        self.assertIsNone(await cache.get_or_load('a', mock.AsyncMock(return_value=None)))
+        self.assertEqual(await cache.get_or_load('a', mock.AsyncMock(return_value=1)), 1)
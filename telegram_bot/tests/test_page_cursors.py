@@ -0,0 +1,45 @@
+import unittest
+from unittest import mock
+
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from handlers import tasks as task_handlers
+from tests.fake_redis import FakeClock, FakeRedis
+
+
+class PageCursorTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.redis = FakeRedis(self.clock)
+        patcher = mock.patch.object(task_handlers, 'get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def _more_callback(self, kind: str, cursor: str) -> mock.Mock:
+        builder = InlineKeyboardBuilder()
+        self.assertTrue(await task_handlers._add_more_button(builder, kind, {'next_cursor': cursor}))
+        callback = mock.Mock()
+        callback.data = builder.as_markup().inline_keyboard[0][0].callback_data
+        callback.answer = mock.AsyncMock()
+        self.assertLessEqual(len(callback.data.encode()), 64)
+        return callback
+
+    async def test_button_opens_next_page_repeatedly(self):
+        callback = await self._more_callback('tasks', 'c' * 120)
+        handler = mock.AsyncMock()
+        with mock.patch.object(task_handlers, 'handle_tasks_command', handler):
+            await task_handlers.handle_more_callback(callback, '100')
+            await task_handlers.handle_more_callback(callback, '100')
+
+        self.assertEqual(handler.await_count, 2)
+        self.assertEqual(handler.await_args.kwargs['cursor'], 'c' * 120)
+
+    async def test_expired_cursor_asks_to_reload(self):
+        callback = await self._more_callback('projects', 'cursor')
+        self.clock.now += task_handlers.PAGE_CURSOR_TTL
+        handler = mock.AsyncMock()
+        with mock.patch.object(task_handlers, 'handle_projects_command', handler):
+            await task_handlers.handle_more_callback(callback, '100')
+
+        handler.assert_not_awaited()
+        callback.answer.assert_awaited_once_with("Список устарел, запросите его заново.", show_alert=True)
@@ -0,0 +1,129 @@
+import unittest
+from unittest import mock
+
+from aiogram import Bot, Dispatcher
+
+from services import bot_manager, sharding
+from tests.fake_redis import FakeClock, FakeRedis
+
+CHAT_IDS = [str(100 + index) for index in range(200)]
+
+
+class Worker:
+    """Один процесс бота: свой WORKER_ID и свой последний состав воркеров."""
+
+    def __init__(self, worker_id: str):
+        self.worker_id = worker_id
+        self.workers = [worker_id]
+
+    async def __call__(self, func, *args):
+        with mock.patch.object(sharding, 'WORKER_ID', self.worker_id), \
+                mock.patch.object(sharding, '_workers', self.workers):
+            result = func(*args)
+            if hasattr(result, '__await__'):
+                result = await result
+            self.workers = sharding._workers
+        return result
+
+
+class ShardOwnerTests(unittest.TestCase):
+    def test_owner_is_stable_and_only_new_worker_takes_keys(self):
+        before = {chat_id: sharding.shard_owner(chat_id, ['a', 'b']) for chat_id in CHAT_IDS}
+        self.assertEqual(before, {chat_id: sharding.shard_owner(chat_id, ['b', 'a']) for chat_id in CHAT_IDS})
+        self.assertEqual(set(before.values()), {'a', 'b'})
+
+        after = {chat_id: sharding.shard_owner(chat_id, ['a', 'b', 'c']) for chat_id in CHAT_IDS}
+        moved = {chat_id for chat_id in CHAT_IDS if before[chat_id] != after[chat_id]}
+        self.assertTrue(moved)
+        self.assertEqual({after[chat_id] for chat_id in moved}, {'c'})
+
+    def test_leaving_worker_hands_over_only_its_keys(self):
+        before = {chat_id: sharding.shard_owner(chat_id, ['a', 'b', 'c']) for chat_id in CHAT_IDS}
+        after = {chat_id: sharding.shard_owner(chat_id, ['a', 'b']) for chat_id in CHAT_IDS}
+        for chat_id in CHAT_IDS:
+            if before[chat_id] != 'c':
+                self.assertEqual(after[chat_id], before[chat_id])
+
+
+class ShardLeaseTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.redis = FakeRedis(self.clock)
+        for patcher in (
+            mock.patch.object(sharding, 'SHARDING_ENABLED', True),
+            mock.patch.object(sharding, 'get_redis', return_value=self.redis),
+            mock.patch.object(sharding, 'time', self.clock),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.a, self.b = Worker('worker-a'), Worker('worker-b')
+
+    async def owned(self, worker: Worker) -> set[str]:
+        return {chat_id for chat_id in CHAT_IDS if await worker(sharding.owns, chat_id)}
+
+    async def test_heartbeat_splits_keys_and_rebalances_on_membership_change(self):
+        await self.a(sharding.heartbeat)
+        self.assertEqual(await self.owned(self.a), set(CHAT_IDS))
+
+        await self.b(sharding.heartbeat)
+        await self.a(sharding.heartbeat)
+        owned_a, owned_b = await self.owned(self.a), await self.owned(self.b)
+        self.assertEqual(owned_a | owned_b, set(CHAT_IDS))
+        self.assertFalse(owned_a & owned_b)
+
+        # b пропал без leave(): после WORKER_TTL его вычищает heartbeat оставшегося воркера
+        self.clock.now += sharding.WORKER_TTL + 1
+        self.assertEqual(await self.a(sharding.heartbeat), ['worker-a'])
+        self.assertEqual(await self.owned(self.a), set(CHAT_IDS))
+
+    async def test_leave_hands_keys_over_at_once(self):
+        await self.a(sharding.heartbeat)
+        await self.b(sharding.heartbeat)
+        await self.b(sharding.leave)
+
+        self.assertEqual(await self.a(sharding.heartbeat), ['worker-a'])
+
+    async def test_lease_blocks_new_owner_until_expiry(self):
+        await self.a(sharding.heartbeat)
+        chat_id = next(
+            chat_id for chat_id in CHAT_IDS
+            if sharding.shard_owner(chat_id, ['worker-a', 'worker-b']) == 'worker-b'
+        )
+        self.assertTrue(await self.a(sharding.claim, chat_id))
+
+        # b пришёл и стал владельцем по хэшу, но a ещё держит аренду — двух опросов одного токена нет
+        await self.b(sharding.heartbeat)
+        await self.a(sharding.heartbeat)
+        self.assertFalse(await self.a(sharding.owns, chat_id))
+        self.assertFalse(await self.b(sharding.claim, chat_id))
+        self.assertEqual(await self.b(sharding.lease_holders, [chat_id]), {chat_id: 'worker-a'})
+
+        # a завис и не продлевает аренду — после LEASE_TTL её забирает b, продление у a не проходит
+        self.clock.now += sharding.LEASE_TTL + 1
+        await self.b(sharding.heartbeat)
+        self.assertTrue(await self.b(sharding.claim, chat_id))
+        self.assertEqual(await self.a(sharding.renew, [chat_id]), [False])
+        self.assertEqual(await self.b(sharding.renew, [chat_id]), [True])
+
+    async def test_release_frees_only_own_lease(self):
+        await self.a(sharding.heartbeat)
+        chat_id = CHAT_IDS[0]
+        self.assertTrue(await self.a(sharding.claim, chat_id))
+
+        await self.b(sharding.release, chat_id)
+        self.assertEqual(await self.a(sharding.lease_holders, [chat_id]), {chat_id: 'worker-a'})
+
+        await self.a(sharding.release, chat_id)
+        self.assertEqual(await self.a(sharding.lease_holders, [chat_id]), {chat_id: None})
+
+    async def test_stopped_bot_releases_its_lease(self):
+        await self.a(sharding.heartbeat)
+        chat_id = CHAT_IDS[0]
+        self.assertTrue(await self.a(sharding.claim, chat_id))
+        bot_manager.personal_bots[chat_id] = Bot(token='42:token')
+        bot_manager.dispatchers[chat_id] = Dispatcher()
+
+        await self.a(bot_manager.stop_personal_bot, chat_id)
+
+        self.assertNotIn(chat_id, bot_manager.personal_bots)
+        self.assertEqual(await self.a(sharding.lease_holders, [chat_id]), {chat_id: None})
@@ -0,0 +1,115 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from aiogram.exceptions import TelegramUnauthorizedError
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from services import bot_manager, health
+
+
+def _bot(chat_id: str, me=None, polling=None):
+    """Личный бот с подменёнными getMe и polling, зарегистрированный как запущенный."""
+    bot, dp = mock.Mock(), mock.Mock()
+    bot.me = mock.AsyncMock(side_effect=me)
+    dp.start_polling = mock.AsyncMock(side_effect=polling)
+    bot_manager.personal_bots[chat_id] = bot
+    return bot, dp
+
+
+class SupervisorTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        for registry in (bot_manager.personal_bots, bot_manager.bot_health):
+            registry.clear()
+            self.addCleanup(registry.clear)
+
+    def test_restart_delay_is_jittered_exponential_and_capped(self):
+        for failures, cap in ((1, 1.0), (2, 2.0), (5, 16.0), (20, bot_manager.BOT_RESTART_MAX_DELAY)):
+            with mock.patch('services.bot_manager.random.uniform', side_effect=lambda low, high: low):
+                self.assertEqual(bot_manager.restart_delay(failures), cap / 2)
+            with mock.patch('services.bot_manager.random.uniform', side_effect=lambda low, high: high):
+                self.assertEqual(bot_manager.restart_delay(failures), cap)
+
+    async def test_backoff_resets_after_healthy_run(self):
+        loop = asyncio.get_running_loop()
+        now = [0.0]
+
+        async def polling(*args, **kwargs):
+            if dp.start_polling.await_count == 1:
+                # Первый запуск проработал дольше BOT_STABLE_AFTER и упал
+                now[0] += bot_manager.BOT_STABLE_AFTER + 1
+                raise ConnectionError('dropped')
+
+        bot, dp = _bot('100', me=[ConnectionError('down'), ConnectionError('down'), None, None], polling=polling)
+        delays = []
+        with mock.patch.object(loop, 'time', side_effect=lambda: now[0]), \
+                mock.patch('services.bot_manager.asyncio.sleep', mock.AsyncMock()), \
+                mock.patch('services.bot_manager.restart_delay', side_effect=lambda n: delays.append(n) or 0):
+            await bot_manager.supervise_personal_bot(dp, bot, '100')
+
+        # Два сбоя подряд — задержка растёт; после долгой работы отсчёт начинается заново
+        self.assertEqual(delays, [1, 2, 1])
+        self.assertEqual(bot_manager.bot_health['100']['state'], 'running')
+        self.assertEqual(bot_manager.bot_health['100']['restarts'], 3)
+        self.assertEqual(dp.start_polling.await_count, 2)
+
+    async def test_startup_concurrency_is_capped(self):
+        gate = asyncio.Event()
+        active, peak = [0], [0]
+
+        async def slow_me():
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await gate.wait()
+            active[0] -= 1
+
+        bots = [_bot(str(chat_id)) for chat_id in range(6)]
+        for bot, _ in bots:
+            bot.me.side_effect = slow_me
+        with mock.patch.object(bot_manager, '_startup_semaphore', asyncio.Semaphore(2)):
+            supervisors = [
+                asyncio.create_task(bot_manager.supervise_personal_bot(dp, bot, str(chat_id)))
+                for chat_id, (bot, dp) in enumerate(bots)
+            ]
+            for _ in range(5):
+                await asyncio.sleep(0)
+            self.assertEqual(peak[0], 2)
+            self.assertEqual(
+                sorted(health['state'] for health in bot_manager.bot_health.values()),
+                ['starting'] * 6,
+            )
+            gate.set()
+            await asyncio.gather(*supervisors)
+
+        self.assertEqual(peak[0], 2)
+        self.assertEqual({health['state'] for health in bot_manager.bot_health.values()}, {'running'})
+
+    async def test_health_reports_failing_bots(self):
+        revoked = TelegramUnauthorizedError(method=mock.Mock(), message='Unauthorized')
+        _bot('1', me=[revoked])
+        _bot('2', me=[ConnectionError('down')])
+        _bot('3')
+
+        async def give_up(delay):
+            # Бот остановили, пока он ждал перезапуска
+            bot_manager.personal_bots.pop('2', None)
+
+        with mock.patch('services.bot_manager.asyncio.sleep', side_effect=give_up):
+            for chat_id in ('1', '2', '3'):
+                bot = bot_manager.personal_bots[chat_id]
+                await bot_manager.supervise_personal_bot(mock.Mock(start_polling=mock.AsyncMock()), bot, chat_id)
+
+        public, internal = web.Application(), web.Application()
+        health.add_health_routes(public)
+        health.add_health_routes(internal, detailed=True)
+        for app, detailed in ((public, False), (internal, True)):
+            async with TestClient(TestServer(app)) as client:
+                data = await (await client.get('/health')).json()
+            self.assertEqual(data['states'], {'failed': 1, 'backoff': 1, 'running': 1})
+            if not detailed:
+                self.assertNotIn('bots', data)
+                continue
+            self.assertIn('Unauthorized', data['bots']['1']['last_error'])
+            self.assertEqual(data['bots']['2']['restarts'], 1)
+            self.assertIn('retry_in', data['bots']['2'])
@@ -0,0 +1,90 @@
+import asyncio
+from unittest import mock
+
+from aiogram import Dispatcher, types
+from aiohttp.test_utils import AioHTTPTestCase
+
+from services import webhook
+from tests.fake_bot_api import FakeBotAPI
+
+BOT_TOKEN = '123:secret-token'
+
+
+def _update(text: str) -> dict:
+    return {
+        'update_id': 1,
+        'message': {
+            'message_id': 1,
+            'date': 0,
+            'chat': {'id': 555, 'type': 'private'},
+            'from': {'id': 555, 'is_bot': False, 'first_name': 'U'},
+            'text': text,
+        },
+    }
+
+
+class WebhookReceiverTests(AioHTTPTestCase):
+    async def get_application(self):
+        return webhook.create_webhook_app()
+
+    async def asyncSetUp(self):
+        for name, value in (('WEBHOOK_BASE_URL', 'https://bots.example'), ('WEBHOOK_SECRET', 'shared')):
+            patcher = mock.patch.object(webhook, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        await super().asyncSetUp()
+        self.bot_api = await FakeBotAPI().start()
+        self.bot = self.bot_api.make_bot(BOT_TOKEN)
+        self.received = []
+        self.dp = Dispatcher()
+
+        @self.dp.message()
+        async def record(message: types.Message) -> None:
+            self.received.append(message.text)
+
+        await webhook.attach_bot(self.bot, self.dp)
+
+    async def asyncTearDown(self):
+        await webhook.detach_bot(self.bot)
+        await self.bot.session.close()
+        await self.bot_api.stop()
+        await super().asyncTearDown()
+
+    async def _post(self, bot_id: str, secret: str | None):
+        headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret is not None else {}
+        response = await self.client.post(f'/webhook/{bot_id}', json=_update('hello'), headers=headers)
+        # Обработка идёт в фоне после ответа Telegram
+        await asyncio.gather(*webhook._background_tasks)
+        return response
+
+    async def test_attach_registers_webhook_with_per_bot_secret(self):
+        [call] = self.bot_api.calls_for('setWebhook')
+        self.assertEqual(call['token'], BOT_TOKEN)
+        self.assertEqual(call['payload']['url'], 'https://bots.example/webhook/123')
+        self.assertEqual(call['payload']['secret_token'], webhook.webhook_secret('123'))
+        self.assertNotEqual(webhook.webhook_secret('123'), webhook.webhook_secret('124'))
+
+    async def test_valid_secret_dispatches_to_bot(self):
+        response = await self._post('123', webhook.webhook_secret('123'))
+
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.received, ['hello'])
+
+    async def test_wrong_secret_is_rejected(self):
+        for secret in (webhook.webhook_secret('124'), None):
+            response = await self._post('123', secret)
+            self.assertEqual(response.status, 403)
+        self.assertEqual(self.received, [])
+
+    async def test_unknown_bot_id_is_not_found(self):
+        response = await self._post('999', webhook.webhook_secret('999'))
+
+        self.assertEqual(response.status, 404)
+        self.assertEqual(self.received, [])
+
+    async def test_detached_bot_stops_receiving(self):
+        await webhook.detach_bot(self.bot)
+
+        response = await self._post('123', webhook.webhook_secret('123'))
+        self.assertEqual(response.status, 404)
+        self.assertEqual(len(self.bot_api.calls_for('deleteWebhook')), 1)